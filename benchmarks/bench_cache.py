@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import oecd_http
+from dataset_store import DatasetSink, read_dataset, write_dataset
+from fetch_oecd_agencies import get_dataflows
+from harvest_oecd_data import harvest_dataflows
+from mock_oecd_api import start_mock_server
+
+# Function to harvest every mock dataflow into a folder and report the traffic the server saw
+def run_harvest(server, folder, stream, workers):
+    requests_before, bytes_before = server.request_count, server.bytes_sent
+    start_time = time.perf_counter()
+    dataflows = get_dataflows(url=f"{server.api_root}/dataflow/ALL")
+    save_dataset = lambda df, df_name, dataflow=None: write_dataset(df, df_name, folder)
+    make_sink = (lambda df_name, dataflow=None: DatasetSink(df_name, folder)) if stream else None
+    harvest_dataflows(dataflows, save_dataset, max_workers=workers, base_url=f"{server.api_root}/data", make_sink=make_sink)
+    return {"seconds": time.perf_counter() - start_time,
+            "requests": server.request_count - requests_before,
+            "bytes": server.bytes_sent - bytes_before}
+
+# Function to read every dataset of a folder, to check that cached runs store the same data
+def read_folder(folder):
+    return {f: read_dataset(os.path.join(folder, f)) for f in sorted(os.listdir(folder)) if f.endswith('.parquet')}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare cold, warm and revalidating harvests through the response cache.")
+    parser.add_argument("--dataflows", type=int, default=10)
+    parser.add_argument("--cardinality", type=int, default=12)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds the mock server waits before answering")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--stream", action="store_true", help="Harvest in streaming mode")
+    args = parser.parse_args()
+
+    server = start_mock_server(n_dataflows=args.dataflows, latency=args.latency, cardinality=args.cardinality, n_years=args.years)
+    results = []
+    with tempfile.TemporaryDirectory() as cache_folder:
+        # No cache, cold cache, warm cache, then a warm cache whose entries are all stale (revalidated)
+        for label, ttl in [("no cache", None), ("cold cache", 3600), ("warm cache", 3600), ("revalidate", 0)]:
+            oecd_http.response_cache = None
+            cache = oecd_http.enable_response_cache(cache_folder, ttl=ttl) if ttl is not None else None
+            with tempfile.TemporaryDirectory() as folder:
+                stats = run_harvest(server, folder, args.stream, args.workers)
+                datasets = read_folder(folder)
+            stats["cache"] = cache.stats() if cache is not None else None
+            results.append((label, stats, datasets))
+    oecd_http.response_cache = None
+    server.shutdown()
+
+    baseline = results[0][2]
+    print(f"\n{'run':>12} {'seconds':>8} {'requests':>9} {'MB sent':>8} {'hit ratio':>10} {'MB saved':>9} {'MB on disk':>11} {'same data':>10}")
+    for label, stats, datasets in results:
+        cache_stats = stats["cache"] or {}
+        same = datasets.keys() == baseline.keys() and all(datasets[f].equals(baseline[f]) for f in baseline)
+        print(f"{label:>12} {stats['seconds']:>8.2f} {stats['requests']:>9} {stats['bytes'] / 1e6:>8.2f} "
+              f"{cache_stats.get('hit_ratio', 0):>10.0%} {cache_stats.get('bytes_saved', 0) / 1e6:>9.2f} "
+              f"{cache_stats.get('stored_bytes', 0) / 1e6:>11.2f} {str(same):>10}")
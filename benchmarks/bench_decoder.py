@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from fetch_oecd_data import decode_series
+from mock_oecd_api import make_sdmx_json
+
+# Per-observation loop that get_oecd_data used before decode_series, kept as the baseline
+def decode_series_loop(dimensions, time_period, observations):
+    dimension_columns = {dim['id']: [] for dim in dimensions}
+    dimension_columns['Observation Value'] = []
+
+    for obs_key, obs_value in observations.items():
+        if isinstance(obs_value, list) and len(obs_value) > 0:
+            observation_value = obs_value[0]
+        elif isinstance(obs_value, dict) and 'observations' in obs_value:
+            observation_value = obs_value.get('observations')
+        else:
+            observation_value = obs_value
+
+        observation_values = {}
+        for i, obs in observation_value.items():
+            observation_year = time_period[0]['values'][int(i)]['id']
+            observation_values[observation_year] = obs[0]
+
+        obs_zero_check_sum = 0
+        for i, obs_zero_check in observation_values.items():
+            obs_zero_check_sum = obs_zero_check_sum + obs_zero_check
+
+        if not obs_zero_check_sum == 0:
+            key_parts = obs_key.split(':')
+            for i, part in enumerate(key_parts):
+                if i < len(dimensions):
+                    dimension_id = dimensions[i]['id']
+                    value_info = dimensions[i].get('values', [])
+                    dimension_value = value_info[int(part)]['name'] if value_info and int(part) < len(value_info) else part
+                    dimension_columns[dimension_id].append(dimension_value)
+            dimension_columns['Observation Value'].append(observation_values.copy())
+
+    return pd.DataFrame(dimension_columns)
+
+# Function to time one decoder on the payload and return the elapsed seconds and result
+def time_decoder(decoder, structure, series):
+    start_time = time.perf_counter()
+    df = decoder(structure['dimensions']['series'], structure['dimensions']['observation'], series)
+    return time.perf_counter() - start_time, df
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare decode_series against the per-observation loop.")
+    parser.add_argument("--dimensions", type=int, default=4)
+    parser.add_argument("--cardinality", type=int, default=14)
+    parser.add_argument("--years", type=int, default=52)
+    parser.add_argument("--sparsity", type=float, default=0.1)
+    args = parser.parse_args()
+
+    payload = make_sdmx_json("Benchmark", n_dimensions=args.dimensions, cardinality=args.cardinality,
+                             n_years=args.years, sparsity=args.sparsity)
+    structure = payload['data']['structure']
+    series = payload['data']['dataSets'][0]['series']
+    n_observations = sum(len(s['observations']) for s in series.values())
+    print(f"Synthetic payload: {len(series)} series, {n_observations} observations")
+
+    loop_seconds, loop_df = time_decoder(decode_series_loop, structure, series)
+    vector_seconds, vector_df = time_decoder(decode_series, structure, series)
+    # The vectorized decoder returns the dimensions as categoricals; their values must be identical
+    pd.testing.assert_frame_equal(loop_df, vector_df.astype(loop_df.dtypes.to_dict()))
+
+    print(f"Per-observation loop: {loop_seconds:.2f}s")
+    print(f"Vectorized decoder:   {vector_seconds:.2f}s ({loop_seconds / vector_seconds:.1f}x faster)")
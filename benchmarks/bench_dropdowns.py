@@ -0,0 +1,38 @@
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import best_time, make_long_frame
+from dataset_index import IndexedDataset
+
+# Function to name the dimensions of a dataset with one high-cardinality dimension and two small ones
+def dropdown_dimensions(cardinality):
+    return {'REF_AREA': [f"Area {j:06d} region" for j in range(cardinality)],
+            'MEASURE': [f"Measure {j}" for j in range(20)],
+            'SEX': ['Female', 'Male', 'Total']}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the dropdown payload of eager and searched options, and measure the search latency.")
+    parser.add_argument("--cardinalities", type=int, nargs="+", default=[100, 5000, 50000])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=100, help="Options returned per search")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'values':>8} {'eager KB':>9} {'searched KB':>12} {'search':>10} {'ms':>7} {'ms filtered':>12} {'matches':>8}")
+    for cardinality in args.cardinalities:
+        dataset = IndexedDataset(make_long_frame(args.rows, dropdown_dimensions(cardinality)))
+        values = [str(v) for v in dataset.df['REF_AREA'].cat.categories]
+        eager_bytes = len(json.dumps([{'label': v, 'value': v} for v in values]))
+        selections = {'MEASURE': ['Measure 3'], 'SEX': ['Total']}
+        for search in ['', 'area 0001', 'region']:
+            seconds, (options, n_matches) = best_time(
+                lambda: dataset.search_values('REF_AREA', search, limit=args.limit), args.repeat)
+            filtered_seconds, _ = best_time(
+                lambda: dataset.search_values('REF_AREA', search, selections, (1990, 2010), limit=args.limit), args.repeat)
+            searched_bytes = len(json.dumps([{'label': v, 'value': v} for v in options]))
+            print(f"{cardinality:>8} {eager_bytes / 1e3:>9.1f} {searched_bytes / 1e3:>12.1f} {repr(search):>10} "
+                  f"{seconds * 1e3:>7.2f} {filtered_seconds * 1e3:>12.2f} {n_matches:>8}")
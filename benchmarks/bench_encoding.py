@@ -0,0 +1,46 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_index import IndexedDataset
+from dataset_store import read_dataset, write_dataset
+from fetch_oecd_data import decode_payload
+from mock_oecd_api import make_sdmx_json
+
+# Function to time a call, returning the seconds and its result
+def timed(function):
+    start_time = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start_time, result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare dictionary-encoded (categorical) dimension columns with "
+                                                 "plain name columns in memory, on disk and when the dashboard loads them.")
+    parser.add_argument("--dimensions", type=int, default=4)
+    parser.add_argument("--cardinalities", type=int, nargs="+", default=[8, 16])
+    parser.add_argument("--years", type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'columns':>12} {'memory MB':>10} {'Parquet MB':>11} {'write s':>8} {'read s':>7} {'index s':>8}")
+    for cardinality in args.cardinalities:
+        payload = json.dumps(make_sdmx_json("Encoding", args.dimensions, cardinality, args.years, sparsity=0.1))
+        encoded = decode_payload(json.loads(payload), long_format=True)[0]
+        dimension_ids = [col for col in encoded.columns if col not in ['Year', 'Value']]
+        # The names repeated on every row, as the decoders produced them before
+        plain = encoded.astype({dim_id: object for dim_id in dimension_ids})
+
+        with tempfile.TemporaryDirectory() as folder:
+            for label, df in [("names", plain), ("categorical", encoded)]:
+                write_seconds, file_path = timed(lambda: write_dataset(df, label, folder))
+                read_seconds, stored = timed(lambda: read_dataset(file_path))
+                if label == "names":
+                    # Read back as plain names too, as they were stored before
+                    stored = stored.astype({dim_id: object for dim_id in dimension_ids})
+                index_seconds, _ = timed(lambda: IndexedDataset(stored))
+                print(f"{len(df):>10} {label:>12} {df.memory_usage(index=True, deep=True).sum() / 1e6:>10.1f} "
+                      f"{os.path.getsize(file_path) / 1e6:>11.2f} {write_seconds:>8.2f} {read_seconds:>7.2f} {index_seconds:>8.2f}")
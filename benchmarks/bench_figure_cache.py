@@ -0,0 +1,56 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_folder)
+
+import numpy as np
+from bench_serving import random_payload
+from common import make_long_frame
+from dataset_store import write_dataset
+
+# Function to send update_graph requests through the Flask test client and return their latencies
+def run_views(client, payloads):
+    latencies = []
+    for payload in payloads:
+        start_time = time.perf_counter()
+        response = client.post('/_dash-update-component', json=payload)
+        latencies.append(time.perf_counter() - start_time)
+        assert response.status_code == 200, response.status_code
+    return latencies
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure update_graph requests with cold and warm figure caches, "
+                                                 "and check that a changed dataset invalidates its entries.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--views", type=int, default=20, help="Distinct views, each requested once per run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        file_path = write_dataset(make_long_frame(args.rows), "Figure cache dataset", data_folder)
+        os.environ['OECD_DASHBOARD_DATA_FOLDER'] = data_folder
+        import plot_dashboard_oecd_data as dashboard
+
+        client = dashboard.create_app().server.test_client()
+        rng = np.random.default_rng(0)
+        payloads = [random_payload(rng, [os.path.basename(file_path)]) for _ in range(args.views)]
+        run_views(client, payloads[:1])  # Load the dataset outside the timings
+
+        results = []
+        dashboard.figure_cache.clear()
+        dashboard.frame_cache.clear()
+        results.append(("cold", run_views(client, payloads)))
+        results.append(("warm", run_views(client, payloads)))
+        # Rewriting the dataset changes its version, so its cached views must be rebuilt
+        write_dataset(make_long_frame(args.rows, seed=1), "Figure cache dataset", data_folder)
+        results.append(("changed", run_views(client, payloads)))
+
+        print(f"\n{'run':>8} {'median ms':>10} {'max ms':>8}")
+        for label, latencies in results:
+            print(f"{label:>8} {statistics.median(latencies) * 1e3:>10.2f} {max(latencies) * 1e3:>8.2f}")
+        print(f"\nFigure cache: {dashboard.figure_cache.stats()}")
+        print(f"Frame cache: {dashboard.frame_cache.stats()}")
@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from common import best_time, make_long_frame, numbered_dimensions
+from dataset_index import IndexedDataset
+
+# Chained filtering that update_graph used before IndexedDataset, kept as the baseline
+def filter_chained(df, selections, year_range):
+    for col, selected_value in selections.items():
+        df = df[df[col].astype(str).isin([str(v).strip() for v in selected_value])]
+    return df[(df['Year'] >= year_range[0]) & (df['Year'] <= year_range[1])]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure filter latency against dataset size and active filters.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000, 4000000])
+    parser.add_argument("--dimensions", type=int, default=5)
+    parser.add_argument("--cardinality", type=int, default=30)
+    parser.add_argument("--values-per-filter", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    year_range = (1990, 2010)
+    print(f"{'rows':>9} {'filters':>8} {'matches':>9} {'chained ms':>11} {'indexed ms':>11} {'speedup':>8} {'index build s':>14}")
+    for n_rows in args.rows:
+        df = make_long_frame(n_rows, numbered_dimensions(args.dimensions, args.cardinality))
+        start_time = time.perf_counter()
+        dataset = IndexedDataset(df)
+        build_seconds = time.perf_counter() - start_time
+
+        for n_filters in range(args.dimensions + 1):
+            selections = {f"DIM_{d}": [f"Dimension {d} value {j}" for j in range(args.values_per_filter)]
+                          for d in range(n_filters)}
+            chained_seconds, chained_df = best_time(lambda: filter_chained(df, selections, year_range), args.repeat)
+            indexed_seconds, indexed_df = best_time(lambda: dataset.select(selections, year_range), args.repeat)
+
+            pd.testing.assert_frame_equal(chained_df, indexed_df.astype(chained_df.dtypes.to_dict()))
+            print(f"{n_rows:>9} {n_filters:>8} {len(indexed_df):>9} {chained_seconds * 1000:>11.1f} "
+                  f"{indexed_seconds * 1000:>11.1f} {chained_seconds / indexed_seconds:>7.1f}x {build_seconds:>14.2f}")
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from common import peak_rss, start_mock_process
+from dataset_store import read_dataset
+from fetch_oecd_data import data_formats, get_oecd_data
+from mock_oecd_api import mock_agency
+
+# Function to fetch the mock dataflow once in this process in one format, save it for the comparison
+# and print the stats as JSON
+def run_child(port, data_format, output_path):
+    start_time = time.perf_counter()
+    df, dimensions, name = get_oecd_data(mock_agency, "DF_MOCK_0", base_url=f"http://127.0.0.1:{port}/data",
+                                         long_format=True, data_format=data_format)
+    seconds = time.perf_counter() - start_time
+    peak = peak_rss()
+    df.to_parquet(output_path, index=False)
+    print(json.dumps({"seconds": seconds, "peak_rss": peak, "rows": len(df), "name": name,
+                      "frame_bytes": int(df.memory_usage(index=True, deep=True).sum())}))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare SDMX-JSON and SDMX-CSV ingestion of the same synthetic dataflow.")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[3, 4])
+    parser.add_argument("--cardinality", type=int, default=15)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--sparsity", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.port, args.child, args.output)
+        sys.exit()
+
+    print(f"{'rows':>10} {'format':>7} {'payload MB':>11} {'seconds':>8} {'peak RSS MB':>12} {'frame MB':>9} {'equal':>6}")
+    for n_dimensions in args.dimensions:
+        server = start_mock_process(args.port, dataflows=1, dimensions=n_dimensions, cardinality=args.cardinality,
+                                    years=args.years, sparsity=args.sparsity)
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                results = []
+                for data_format in ['json', 'csv']:
+                    # Generate the payload on the server before timing, and note its size without keeping it,
+                    # since a child process starts with the peak RSS of its parent on Linux
+                    with requests.get(f"http://127.0.0.1:{args.port}/data/{mock_agency},DF_MOCK_0/all",
+                                      headers={"Accept": data_formats[data_format]}, stream=True) as payload:
+                        payload_bytes = sum(len(chunk) for chunk in payload.iter_content(chunk_size=1024 * 1024))
+                    output_path = os.path.join(folder, data_format + ".parquet")
+                    # Every run gets a fresh process so the peak RSS belongs to that run only
+                    output = subprocess.run([sys.executable, __file__, "--child", data_format, "--port", str(args.port),
+                                             "--output", output_path], capture_output=True, text=True, check=True).stdout
+                    results.append((data_format, payload_bytes, output_path, json.loads(output.strip().splitlines()[-1])))
+
+                reference = read_dataset(results[0][2])
+                for data_format, payload_bytes, output_path, stats in results:
+                    same = read_dataset(output_path).astype(reference.dtypes.to_dict()).equals(reference)
+                    print(f"{stats['rows']:>10} {data_format:>7} {payload_bytes / 1e6:>11.1f} {stats['seconds']:>8.2f} "
+                          f"{stats['peak_rss'] / 1e6:>12.1f} {stats['frame_bytes'] / 1e6:>9.1f} {str(same):>6}")
+                del reference
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,34 @@
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Statement timed in each child process: one instrumented stage around a trivial body
+stage_statement = """
+with stage("bench") as timer:
+    timer.rows = 1
+"""
+
+# Function to measure the cost of one stage in a child process, where the OECD_DASHBOARD_METRICS switch
+# is read at import time; returns the nanoseconds per stage
+def stage_cost(metrics_enabled, number):
+    code = (f"import timeit\nfrom instrumentation import stage\n"
+            f"print(min(timeit.repeat({stage_statement!r}, globals=globals(), number={number}, repeat=5)) / {number})")
+    env = dict(os.environ, OECD_DASHBOARD_METRICS='1' if metrics_enabled else '0',
+               PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+    return float(output) * 1e9
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the overhead of an instrumented stage with the metrics on and off.")
+    parser.add_argument("--number", type=int, default=200000, help="Stages timed per repeat")
+    args = parser.parse_args()
+
+    baseline = min(timeit.repeat("rows = 1", number=args.number, repeat=5)) / args.number * 1e9
+    print(f"{'mode':>10} {'ns/stage':>9}")
+    print(f"{'no stage':>10} {baseline:>9.0f}")
+    for label, metrics_enabled in [("disabled", False), ("enabled", True)]:
+        print(f"{label:>10} {stage_cost(metrics_enabled, args.number):>9.0f}")
@@ -0,0 +1,71 @@
+import argparse
+import ast
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from dataset_store import read_legacy_csv
+from fetch_oecd_data import decode_series
+from mock_oecd_api import make_sdmx_json
+
+# Row-by-row loader that load_and_parse_data used before read_legacy_csv, kept as the baseline
+def load_legacy_csv_loop(file_path):
+    df = pd.read_csv(file_path)
+
+    def parse_observation_values(row):
+        try:
+            observations = ast.literal_eval(row['Observation Value'])
+            obs_df = pd.DataFrame(list(observations.items()), columns=['Year', 'Value'])
+            for col in row.index:
+                if col != 'Observation Value':
+                    obs_df[col] = row[col]
+            return obs_df
+        except (ValueError, SyntaxError):
+            return pd.DataFrame()
+
+    parsed_df = pd.concat(df.apply(parse_observation_values, axis=1).tolist(), ignore_index=True)
+    parsed_df['Year'] = parsed_df['Year'].astype(int)
+    parsed_df['Value'] = pd.to_numeric(parsed_df['Value'], errors='coerce')
+    return parsed_df
+
+# Function to write a legacy CSV generated from a synthetic payload, with a few malformed rows
+def write_legacy_csv(file_path, n_dimensions, cardinality, n_years, malformed_rows):
+    payload = make_sdmx_json("Benchmark", n_dimensions=n_dimensions, cardinality=cardinality, n_years=n_years, sparsity=0.2)
+    structure = payload['data']['structure']['dimensions']
+    df = decode_series(structure['series'], structure['observation'], payload['data']['dataSets'][0]['series'])
+    for i in range(malformed_rows):
+        df.at[i * 7, 'Observation Value'] = "{'2001': 1.5, '2002'"
+    df.to_csv(file_path, index=False)
+    return len(df)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare read_legacy_csv with the row-by-row literal_eval loader.")
+    parser.add_argument("--dimensions", type=int, default=3)
+    parser.add_argument("--cardinalities", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--malformed-rows", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'series':>8} {'rows':>9} {'loop s':>8} {'vectorized s':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for cardinality in args.cardinalities:
+            file_path = os.path.join(folder, f"benchmark_{cardinality}.csv")
+            n_series = write_legacy_csv(file_path, args.dimensions, cardinality, args.years, args.malformed_rows)
+
+            start_time = time.perf_counter()
+            loop_df = load_legacy_csv_loop(file_path)
+            loop_seconds = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            vector_df = read_legacy_csv(file_path)
+            vector_seconds = time.perf_counter() - start_time
+
+            # The vectorized loader returns the dimensions as categoricals; their values must be identical
+            pd.testing.assert_frame_equal(loop_df, vector_df.astype(loop_df.dtypes.to_dict()))
+            assert len(vector_df.attrs['malformed_rows']) == args.malformed_rows
+            print(f"{n_series:>8} {len(vector_df):>9} {loop_seconds:>8.2f} {vector_seconds:>13.2f} "
+                  f"{loop_seconds / vector_seconds:>7.1f}x")
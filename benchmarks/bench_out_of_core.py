@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_folder)
+
+import pandas as pd
+from common import make_long_frame, peak_rss
+
+# Views queried on the large dataset: (label, selections, year range, aggregation, color dimension)
+views = [
+    ("1 area, 1 measure", {'REF_AREA': ['REF_AREA 7'], 'MEASURE': ['MEASURE 3']}, [1960, 2023], None, None),
+    ("5 areas, 20 years", {'REF_AREA': [f'REF_AREA {j}' for j in range(40, 45)]}, [1990, 2010], None, None),
+    ("1 measure, all areas", {'MEASURE': ['MEASURE 3'], 'SEX': ['SEX 0']}, [2000, 2005], None, None),
+    ("all values, sampled", {}, [1960, 2023], None, None),
+    ("sum of all values", {}, [1960, 2023], 'sum', 'SEX'),
+    ("mean of 1 measure", {'MEASURE': ['MEASURE 3']}, [1960, 2023], 'mean', 'UNIT_MEASURE'),
+]
+
+# Function to write a dataset of n_rows through write_dataset, as the harvest does; returns its path
+def write_large_dataset(folder, name, n_rows):
+    from dataset_store import write_dataset
+    return write_dataset(make_long_frame(n_rows, categorical=True), name, folder)
+
+# Function to check on a small dataset that the out-of-core path gives the rows, options and
+# aggregates of the in-memory path
+def check_small(folder):
+    from dataset_index import IndexedDataset
+    from dataset_rollup import RollupCube
+    from dataset_scan import ScannedDataset
+    from dataset_store import read_dataset
+
+    file_path = write_large_dataset(folder, "small", 200000)
+    in_memory = IndexedDataset(read_dataset(file_path))
+    in_memory.rollups = RollupCube(in_memory)
+    scanned = ScannedDataset(file_path)
+    as_text = lambda df: df.astype({col: str for col in df.columns if col not in ['Year', 'Value']})
+    for label, selections, year_range, aggregation, color_dimension in views:
+        if aggregation:
+            keys = [color_dimension, 'Year']
+            expected = as_text(in_memory.rollups.aggregate(aggregation, selections, year_range, color_dimension)[0])
+            result = as_text(scanned.aggregate(aggregation, selections, year_range, color_dimension)[0])
+            pd.testing.assert_frame_equal(expected.sort_values(keys, ignore_index=True), result.sort_values(keys, ignore_index=True),
+                                          check_dtype=False)
+        else:
+            pd.testing.assert_frame_equal(as_text(in_memory.select(selections, year_range)), as_text(scanned.select(selections, year_range)),
+                                          check_index_type=False)
+        assert in_memory.search_values('REF_AREA', '1', selections, year_range) == scanned.search_values('REF_AREA', '1', selections, year_range)
+    return in_memory.nbytes / len(in_memory)
+
+# Function to open the large dataset out of core and time its views (run in a fresh interpreter)
+def run_views(file_path, max_rows):
+    from dataset_scan import ScannedDataset
+    from instrumentation import metrics
+
+    results = {"rss_start": peak_rss()}
+    start_time = time.perf_counter()
+    dataset = ScannedDataset(file_path, max_rows=max_rows)
+    results["open"] = time.perf_counter() - start_time
+    results["rows"] = len(dataset)
+    results["row_groups"] = len(dataset.row_groups)
+    results["views"] = []
+    for label, selections, year_range, aggregation, color_dimension in views:
+        read_before = metrics.counters.get("scan_row_groups_read", 0)
+        start_time = time.perf_counter()
+        if aggregation:
+            df = dataset.aggregate(aggregation, selections, year_range, color_dimension)[0]
+        else:
+            df = dataset.select(selections, year_range, max_rows=dataset.max_rows)
+        seconds = time.perf_counter() - start_time
+        results["views"].append({"label": label, "seconds": seconds, "rows": len(df), "matched": df.attrs.get('matched_rows', len(df)),
+                                 "row_groups_read": metrics.counters.get("scan_row_groups_read", 0) - read_before,
+                                 "peak_rss": peak_rss()})
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Query a generated dataset several times larger than a memory limit out of "
+                                                 "core and report latency, row groups read and peak memory.")
+    parser.add_argument("--memory-limit-mb", type=int, default=512, help="Memory limit the dataset is sized against")
+    parser.add_argument("--factor", type=float, default=4, help="In-memory size of the dataset as a multiple of the limit")
+    parser.add_argument("--max-rows", type=int, default=200000, help="Row limit of a view, as OECD_DASHBOARD_SCAN_ROW_LIMIT")
+    parser.add_argument("--folder", help="Folder for the generated dataset (a temporary folder by default)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_views(args.child, args.max_rows)))
+        sys.exit(0)
+
+    folder = args.folder or tempfile.mkdtemp()
+    try:
+        os.makedirs(folder, exist_ok=True)
+        bytes_per_row = check_small(folder)
+        print("Out-of-core results match the in-memory path on a 200,000-row dataset")
+
+        n_rows = int(args.factor * args.memory_limit_mb * 1024 * 1024 / bytes_per_row)
+        start_time = time.perf_counter()
+        file_path = write_large_dataset(folder, "large", n_rows)
+        print(f"Wrote {n_rows:,} rows ({n_rows * bytes_per_row / 2**20:,.0f} MB in memory, "
+              f"{os.path.getsize(file_path) / 2**20:,.0f} MB on disk) in {time.perf_counter() - start_time:.1f} s")
+
+        env = dict(os.environ, OECD_DASHBOARD_LOG_LEVEL='WARNING')
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", file_path, "--max-rows", str(args.max_rows)],
+                                capture_output=True, text=True, env=env)
+        if output.returncode != 0:
+            print(output.stderr)
+            raise RuntimeError("Out-of-core queries failed")
+        results = json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        if not args.folder:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    print(f"Opened {results['rows']:,} rows in {results['row_groups']} row groups in {results['open'] * 1e3:.1f} ms, "
+          f"RSS after imports {results['rss_start'] / 2**20:.0f} MB")
+    print(f"\n{'view':>22} {'seconds':>8} {'matched':>10} {'rows':>10} {'row groups':>11} {'peak RSS MB':>12}")
+    for view in results["views"]:
+        print(f"{view['label']:>22} {view['seconds']:>8.2f} {view['matched']:>10,} {view['rows']:>10,} {view['row_groups_read']:>11} "
+              f"{view['peak_rss'] / 2**20:>12.0f}")
+    # The queries are held to the limit, not the interpreter and libraries loaded before them
+    peak = max(view['peak_rss'] for view in results["views"]) - results["rss_start"]
+    print(f"\nPeak RSS above the {results['rss_start'] / 2**20:.0f} MB after imports: {peak / 2**20:.0f} MB against a limit "
+          f"of {args.memory_limit_mb} MB ({'within' if peak <= args.memory_limit_mb * 2**20 else 'above'} the limit)")
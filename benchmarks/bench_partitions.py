@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import start_mock_process
+from fetch_oecd_data import get_oecd_data
+from mock_oecd_api import mock_agency
+from oecd_http import create_session
+
+# Function to sort a tidy long dataset so that datasets can be compared regardless of row order
+def sorted_frame(df):
+    key_columns = [col for col in df.columns if col != 'Value']
+    return df.sort_values(key_columns, kind='stable').reset_index(drop=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare a single request with partitioned parallel fetching of one large dataflow.")
+    parser.add_argument("--dimensions", type=int, default=4)
+    parser.add_argument("--cardinality", type=int, default=12)
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--sparsity", type=float, default=0.2)
+    parser.add_argument("--bytes-per-second", type=float, default=2e6, help="Simulated output rate of the server per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--partitions", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    # The mock API runs in its own process, so that serving the partitions does not compete with
+    # decoding them for the interpreter lock
+    server = start_mock_process(args.port, dataflows=1, dimensions=args.dimensions, cardinality=args.cardinality,
+                                years=args.years, sparsity=args.sparsity, bytes_per_second=args.bytes_per_second,
+                                fail_rate=args.fail_rate)
+    data_url = f"http://127.0.0.1:{args.port}/data"
+    get_oecd_data(mock_agency, "DF_MOCK_0", base_url=data_url)  # Generate the payload before timing
+
+    runs = [("single request", None, 1)] + [(f"{partition_by} x{n}", partition_by, n)
+                                            for partition_by in ["time", "dimension"] for n in args.partitions]
+    results = []
+    for label, partition_by, n_partitions in runs:
+        session = create_session(pool_size=n_partitions)
+        requests = []
+        session.hooks["response"].append(lambda response, *args, **kwargs: requests.append(len(response.content)))
+        start_time = time.perf_counter()
+        df = get_oecd_data(mock_agency, "DF_MOCK_0", session=session, base_url=data_url, long_format=True,
+                           partition_by=partition_by, n_partitions=n_partitions, max_workers=n_partitions)[0]
+        seconds = time.perf_counter() - start_time
+        results.append((label, seconds, len(requests), sum(requests), df))
+    server.terminate()
+
+    reference = sorted_frame(results[0][4])
+    print(f"\nPayload of {len(reference):,} observations")
+    print(f"{'run':>16} {'seconds':>8} {'speedup':>8} {'requests':>9} {'MB':>8} {'equal':>6}")
+    for label, seconds, n_requests, received, df in results:
+        print(f"{label:>16} {seconds:>8.2f} {results[0][1] / seconds:>7.1f}x {n_requests:>9} {received / 1e6:>8.2f} "
+              f"{str(sorted_frame(df).equals(reference)):>6}")
@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import make_long_frame, numbered_dimensions
+from dataset_index import IndexedDataset
+from figure_rendering import build_figure
+
+# Function to build a figure and serialize it like the Dash callback response, returning the
+# elapsed time, the payload size and the number of points sent to the browser
+def render(df, chart_type, color_dimension, budget):
+    start_time = time.perf_counter()
+    fig = build_figure(df, chart_type, color_dimension, None, "Benchmark", None, budget=budget)
+    payload = fig.to_json()
+    elapsed = time.perf_counter() - start_time
+    points = sum(len(trace.x) for trace in fig.data if trace.x is not None)
+    return elapsed, len(payload), points, fig.data[0].type
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure figure payload size and callback latency with and without the point budget.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--budget", type=int, default=20000)
+    parser.add_argument("--charts", nargs="+", default=['line', 'scatter', 'bar'])
+    parser.add_argument("--cardinality", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'chart':>8} {'full ms':>9} {'full MB':>8} {'reduced ms':>11} {'reduced MB':>11} {'points':>8} {'trace':>10}")
+    for n_rows in args.rows:
+        # Filter through the indexed dataset so that the dimensions are categorical as in the dashboard
+        df = IndexedDataset(make_long_frame(n_rows, numbered_dimensions(3, args.cardinality))).select()
+        for chart_type in args.charts:
+            full_seconds, full_bytes, full_points, _ = render(df, chart_type, 'DIM_0', 0)
+            reduced_seconds, reduced_bytes, points, trace_type = render(df, chart_type, 'DIM_0', args.budget)
+            print(f"{n_rows:>8} {chart_type:>8} {full_seconds * 1000:>9.0f} {full_bytes / 1e6:>8.2f} "
+                  f"{reduced_seconds * 1000:>11.0f} {reduced_bytes / 1e6:>11.2f} {points:>8} {trace_type:>10}")
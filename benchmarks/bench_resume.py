@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_store import list_datasets, remove_partial_files, write_dataset
+from fetch_oecd_agencies import get_dataflows
+from harvest_oecd_data import checkpoint_name, harvest_dataflows, load_checkpoint
+from mock_oecd_api import start_mock_server
+
+# Function to harvest the mock dataflows into a folder with a checkpoint, simulating a Ctrl-C after
+# interrupt_after saved datasets; returns the seconds and requests the run took
+def run_harvest(server, dataflows, folder, workers, interrupt_after=None):
+    saved = []
+
+    def save_dataset(df, df_name, dataflow=None):
+        if interrupt_after is not None and len(saved) >= interrupt_after:
+            raise KeyboardInterrupt
+        write_dataset(df, df_name, folder)
+        saved.append(df_name)
+
+    requests_before = server.request_count
+    start_time = time.perf_counter()
+    remove_partial_files(folder)
+    try:
+        harvest_dataflows(dataflows, save_dataset, max_workers=workers, base_url=f"{server.api_root}/data",
+                          checkpoint_path=os.path.join(folder, checkpoint_name), retries=2)
+    except KeyboardInterrupt:
+        pass
+    return time.perf_counter() - start_time, server.request_count - requests_before
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare a full harvest with an interrupted harvest that resumes from its checkpoint.")
+    parser.add_argument("--dataflows", type=int, default=20)
+    parser.add_argument("--cardinality", type=int, default=12)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the mock server waits before answering")
+    parser.add_argument("--interrupt-after", type=int, default=10, help="Datasets saved before the simulated Ctrl-C")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_mock_server(n_dataflows=args.dataflows, cardinality=args.cardinality, n_years=args.years,
+                               latency=args.latency)
+    dataflows = get_dataflows(url=f"{server.api_root}/dataflow/ALL")
+
+    results = []
+    with tempfile.TemporaryDirectory() as full_folder, tempfile.TemporaryDirectory() as resumed_folder:
+        results.append(("full", run_harvest(server, dataflows, full_folder, args.workers)))
+        results.append(("interrupted", run_harvest(server, dataflows, resumed_folder, args.workers, args.interrupt_after)))
+        results.append(("resumed", run_harvest(server, dataflows, resumed_folder, args.workers)))
+        results.append(("rerun", run_harvest(server, dataflows, resumed_folder, args.workers)))
+        checkpoint = load_checkpoint(os.path.join(resumed_folder, checkpoint_name))
+        same_datasets = list_datasets(full_folder) == list_datasets(resumed_folder)
+        leftovers = [f for f in os.listdir(resumed_folder) if f.endswith('.partial')]
+    server.shutdown()
+
+    print(f"\n{'run':>12} {'seconds':>8} {'requests':>9}")
+    for label, (seconds, n_requests) in results:
+        print(f"{label:>12} {seconds:>8.2f} {n_requests:>9}")
+    interrupted_and_resumed = results[1][1][1] + results[2][1][1]
+    print(f"Interrupted + resumed requests: {interrupted_and_resumed} (full harvest: {results[0][1][1]})")
+    print(f"Checkpoint: {len(checkpoint['completed'])} completed, {len(checkpoint['skipped'])} skipped, "
+          f"{len(checkpoint['failed'])} failed; same datasets as the full harvest: {same_datasets}; "
+          f"partial files left: {len(leftovers)}")
@@ -0,0 +1,54 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from common import best_time, make_long_frame, numbered_dimensions
+from dataset_index import IndexedDataset
+from dataset_rollup import RollupCube
+
+# Group-by over the selected rows that an aggregated view would cost without the cube, kept as the baseline
+def aggregate_grouped(dataset, aggregation, selections, year_range, color_dimension):
+    df = dataset.select(selections, year_range).dropna(subset=['Value'])
+    keys = ([color_dimension] if color_dimension else []) + ['Year']
+    return df.groupby(keys, observed=True, sort=True)['Value'].agg(aggregation).reset_index()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure aggregated views answered from the rollup cube against a "
+                                                 "group-by over the selected rows.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000, 4000000])
+    parser.add_argument("--dimensions", type=int, default=5)
+    parser.add_argument("--cardinality", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    year_range = (1990, 2010)
+    views = [
+        ("all values", {}, None),
+        ("color DIM_0", {}, "DIM_0"),
+        ("1 filter, color DIM_1", {"DIM_0": ["Dimension 0 value 0", "Dimension 0 value 1"]}, "DIM_1"),
+        ("2 filters, color DIM_2", {"DIM_0": ["Dimension 0 value 0"], "DIM_1": ["Dimension 1 value 2"]}, "DIM_2"),
+    ]
+    print(f"{'rows':>9} {'view':>24} {'aggregation':>11} {'group-by ms':>12} {'cube ms':>9} {'speedup':>8} {'cube build s':>13}")
+    for n_rows in args.rows:
+        dataset = IndexedDataset(make_long_frame(n_rows, numbered_dimensions(args.dimensions, args.cardinality)))
+        start_time = time.perf_counter()
+        dataset.rollups = RollupCube(dataset)
+        build_seconds = time.perf_counter() - start_time
+
+        for label, selections, color_dimension in views:
+            for aggregation in ['sum', 'mean', 'count']:
+                grouped_seconds, grouped_df = best_time(
+                    lambda: aggregate_grouped(dataset, aggregation, selections, year_range, color_dimension), args.repeat)
+                # The first lookup of a subset builds its cube; the timings are of the lookups that follow
+                dataset.rollups.aggregate(aggregation, selections, year_range, color_dimension)
+                cube_seconds, (cube_df, units) = best_time(
+                    lambda: dataset.rollups.aggregate(aggregation, selections, year_range, color_dimension), args.repeat)
+
+                pd.testing.assert_frame_equal(grouped_df, cube_df, check_dtype=False, check_categorical=False)
+                print(f"{n_rows:>9} {label:>24} {aggregation:>11} {grouped_seconds * 1000:>12.1f} {cube_seconds * 1000:>9.1f} "
+                      f"{grouped_seconds / cube_seconds:>7.1f}x {build_seconds:>13.2f}")
+        print(f"{'':>9} cube: {dataset.rollups.stats()}")
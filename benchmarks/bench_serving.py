@@ -0,0 +1,135 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_folder)
+
+import numpy as np
+import requests
+from common import dimensions, make_long_frame
+from dataset_store import write_dataset
+
+# Function to build the body of the POST the browser sends for update_graph
+def update_graph_payload(selected_file, selections, year_range, aggregation=None):
+    dropdown_ids = {dim_id: f'{dim_id}-dropdown' for dim_id in dimensions}
+    return {
+        "output": "graph-output.figure",
+        "outputs": {"id": "graph-output", "property": "figure"},
+        "inputs": [{"id": "update-button", "property": "n_clicks", "value": 1}],
+        "changedPropIds": ["update-button.n_clicks"],
+        "state": [
+            {"id": "dataset-dropdown", "property": "value", "value": selected_file},
+            {"id": "year-range-slider", "property": "value", "value": year_range},
+            {"id": "chart-type-dropdown", "property": "value", "value": "line"},
+            {"id": "color-dimension-dropdown", "property": "value", "value": "REF_AREA"},
+            {"id": "regression-checkbox", "property": "value", "value": []},
+            {"id": "aggregation-dropdown", "property": "value", "value": aggregation},
+            {"id": "dynamic-controls-data", "property": "data", "value": dropdown_ids},
+            [{"id": {"type": "dynamic-dropdown", "index": dropdown_id}, "property": "value",
+              "value": selections.get(dim_id)} for dim_id, dropdown_id in dropdown_ids.items()],
+            [{"id": {"type": "dynamic-dropdown", "index": dropdown_id}, "property": "id",
+              "value": {"type": "dynamic-dropdown", "index": dropdown_id}} for dropdown_id in dropdown_ids.values()],
+        ],
+    }
+
+# Function to draw a random selection: a few areas of one measure over a range of years
+def random_payload(rng, dataset_files):
+    areas = [dimensions['REF_AREA'][j] for j in rng.choice(len(dimensions['REF_AREA']), 5, replace=False)]
+    start = int(rng.integers(1960, 2000))
+    return update_graph_payload(dataset_files[rng.integers(len(dataset_files))],
+                                {'REF_AREA': areas, 'MEASURE': [f"MEASURE {rng.integers(20)}"]}, [start, start + 20])
+
+# Function to sum the proportional set size of the gunicorn master and its workers (Linux only):
+# pages mapped by several workers count once in total
+def total_pss(master_pid):
+    pids = [master_pid]
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            pids += [int(pid) for pid in f.read().split()]
+        total = 0
+        for pid in pids:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith('Pss:'))
+        return total
+    except (OSError, StopIteration):
+        return None
+
+# Function to send one update_graph request and return its latency
+def timed_request(session, url, payload):
+    start_time = time.perf_counter()
+    response = session.post(url, json=payload)
+    response.raise_for_status()
+    return time.perf_counter() - start_time
+
+# Function to start gunicorn, warm every worker up, drive concurrent update_graph requests and
+# measure throughput, latency and memory
+def run_server(args, data_folder, dataset_files, workers, shared):
+    env = dict(os.environ, OECD_DASHBOARD_DATA_FOLDER=data_folder, OECD_DASHBOARD_LOG_LEVEL='WARNING',
+               OECD_DASHBOARD_SHARED_STORE=os.path.join(data_folder, '.shared_store') if shared else '')
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{args.port}",
+                               "--chdir", root_folder, "--timeout", "300", "wsgi:server"], env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    url = f"{base_url}/_dash-update-component"
+    try:
+        while True:
+            try:
+                requests.get(base_url, timeout=10)
+                break
+            except requests.RequestException:
+                if server.poll() is not None:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.2)
+
+        # Warm up: enough requests that every worker has loaded every dataset
+        rng = np.random.default_rng(0)
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            sessions = [requests.Session() for _ in range(args.concurrency)]
+            warmup = [update_graph_payload(f, {}, [1960, 2023]) for f in dataset_files] * (4 * workers)
+            list(executor.map(lambda i: timed_request(sessions[i % len(sessions)], url, warmup[i]), range(len(warmup))))
+
+            payloads = [random_payload(rng, dataset_files) for _ in range(args.requests)]
+            start_time = time.perf_counter()
+            latencies = list(executor.map(lambda i: timed_request(sessions[i % len(sessions)], url, payloads[i]),
+                                          range(len(payloads))))
+            seconds = time.perf_counter() - start_time
+        return {
+            "throughput": len(latencies) / seconds,
+            "p50": statistics.median(latencies),
+            "p95": float(np.quantile(latencies, 0.95)),
+            "pss": total_pss(server.pid),
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the gunicorn serving mode with concurrent update_graph requests, "
+                                                 "with datasets held per worker and in the shared memory-mapped store.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--datasets", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=2000000, help="Rows per dataset")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    data_folder = tempfile.mkdtemp()
+    try:
+        dataset_files = [os.path.basename(write_dataset(make_long_frame(args.rows, seed=seed), f"Serving dataset {seed}", data_folder))
+                         for seed in range(args.datasets)]
+        print(f"{'workers':>8} {'store':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'PSS MB':>8}")
+        for workers in args.workers:
+            for shared in [False, True]:
+                result = run_server(args, data_folder, dataset_files, workers, shared)
+                pss = f"{result['pss'] / 1e6:.0f}" if result['pss'] is not None else '-'
+                print(f"{workers:>8} {'shared' if shared else 'per worker':>10} {result['throughput']:>8.1f} "
+                      f"{result['p50'] * 1e3:>8.1f} {result['p95'] * 1e3:>8.1f} {pss:>8}", flush=True)
+    finally:
+        shutil.rmtree(data_folder, ignore_errors=True)
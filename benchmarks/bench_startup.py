@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_folder)
+
+import numpy as np
+from bench_serving import update_graph_payload
+from common import make_long_frame
+
+# Function to measure, in a fresh interpreter, the import of the dashboard, the creation of the app,
+# the first page layout and the first update_graph requests (without and with a regression line)
+def startup_timings(data_folder, dataset_file):
+    timings = {}
+    start_time = time.perf_counter()
+    import plot_dashboard_oecd_data as dashboard
+    timings["import"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    client = dashboard.create_app().server.test_client()
+    timings["create_app"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    assert client.get('/_dash-layout').status_code == 200
+    timings["first_layout"] = time.perf_counter() - start_time
+
+    for label, chart_type, regression in [("first_graph", "line", []), ("first_regression", "scatter", ["show_regression"])]:
+        payload = update_graph_payload(dataset_file, {'MEASURE': ['MEASURE 1']}, [1960, 2023])
+        payload["state"][2]["value"] = chart_type
+        payload["state"][4]["value"] = regression
+        start_time = time.perf_counter()
+        assert client.post('/_dash-update-component', json=payload).status_code == 200
+        timings[label] = time.perf_counter() - start_time
+    return timings
+
+# Function to run a snippet in a fresh interpreter and return what it prints as JSON
+def run_child(code, env=None):
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root_folder,
+                            env=dict(os.environ, **(env or {})))
+    if output.returncode != 0:
+        print(output.stderr)
+        raise RuntimeError("Child process failed")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+# Function to time the vectorized trendlines against the statsmodels route of plotly express
+def trendline_timings(n_rows, n_groups):
+    import plotly.express as px
+    from figure_rendering import build_figure
+
+    rng = np.random.default_rng(0)
+    df = make_long_frame(n_rows)
+    df['GROUP'] = np.array([f"Group {j}" for j in range(n_groups)], dtype=object)[rng.integers(0, n_groups, n_rows)]
+    df = df[['GROUP', 'Year', 'Value']]
+    # Import statsmodels and warm both routes up outside the timings
+    build_figure(df.head(100), 'scatter', 'GROUP', 'ols', "Trendlines", None, budget=0)
+    px.scatter(df.head(100), x='Year', y='Value', color='GROUP', trendline='ols')
+
+    start_time = time.perf_counter()
+    build_figure(df, 'scatter', 'GROUP', 'ols', "Trendlines", None, budget=0)
+    vectorized = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    px.scatter(df, x='Year', y='Value', color='GROUP', trendline='ols', render_mode='webgl')
+    statsmodels = time.perf_counter() - start_time
+    return vectorized, statsmodels
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the dashboard's import time, first-request latency and the "
+                                                 "vectorized trendlines against the statsmodels route.")
+    parser.add_argument("--rows", type=int, default=200000, help="Rows of the dataset served at startup")
+    parser.add_argument("--trendline-rows", type=int, default=100000)
+    parser.add_argument("--groups", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters started per measurement")
+    args = parser.parse_args()
+
+    data_folder = tempfile.mkdtemp()
+    try:
+        from dataset_store import write_dataset
+        dataset_file = os.path.basename(write_dataset(make_long_frame(args.rows), "Startup dataset", data_folder))
+        code = (f"import json, sys; sys.path.insert(0, {os.path.join(root_folder, 'benchmarks')!r}); "
+                f"from bench_startup import startup_timings; print(json.dumps(startup_timings({data_folder!r}, {dataset_file!r})))")
+        runs = [run_child(code, {'OECD_DASHBOARD_DATA_FOLDER': data_folder, 'OECD_DASHBOARD_LOG_LEVEL': 'WARNING'})
+                for _ in range(args.repeat)]
+        statsmodels_import = [run_child("import json, time; t = time.perf_counter(); import statsmodels.api; "
+                                        "print(json.dumps(time.perf_counter() - t))") for _ in range(args.repeat)]
+    finally:
+        shutil.rmtree(data_folder, ignore_errors=True)
+
+    print(f"\n{'startup step':>18} {'median ms':>10}")
+    for step in runs[0]:
+        print(f"{step:>18} {np.median([run[step] for run in runs]) * 1e3:>10.1f}")
+    print(f"{'statsmodels.api':>18} {np.median(statsmodels_import) * 1e3:>10.1f}  (no longer imported by the dashboard)")
+
+    print(f"\n{'groups':>8} {'vectorized s':>13} {'statsmodels s':>14} {'speedup':>8}")
+    for n_groups in args.groups:
+        vectorized, statsmodels = trendline_timings(args.trendline_rows, n_groups)
+        print(f"{n_groups:>8} {vectorized:>13.3f} {statsmodels:>14.3f} {statsmodels / vectorized:>7.1f}x")
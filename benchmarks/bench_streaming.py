@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import peak_rss, start_mock_process
+from dataset_store import CsvSink
+from fetch_oecd_data import stream_oecd_data
+from mock_oecd_api import mock_agency
+
+# Function to stream the mock dataflow once in this process and print the stats as JSON
+def run_child(port, batch_size, traced):
+    with tempfile.TemporaryDirectory() as folder:
+        start_time = time.perf_counter()
+        stats = stream_oecd_data(mock_agency, "DF_MOCK_0", lambda name: CsvSink(os.path.join(folder, name + ".csv")),
+                                 batch_size=batch_size, base_url=f"http://127.0.0.1:{port}/data", track_memory=traced)
+        stats["seconds"] = time.perf_counter() - start_time
+    stats["peak_rss"] = peak_rss()
+    print(json.dumps(stats))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check that streaming memory depends on batch size, not payload size.")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[3, 4],
+                        help="Series dimensions of each synthetic payload (payload size grows with cardinality ** dimensions)")
+    parser.add_argument("--cardinality", type=int, default=20)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--traced", action="store_true", help="Also report the tracemalloc peak (much slower)")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args.port, args.child, args.traced)
+        sys.exit()
+
+    print(f"{'series':>10} {'payload MB':>11} {'batch':>7} {'seconds':>8} {'peak RSS MB':>12} {'traced MB':>10}")
+    for n_dimensions in args.dimensions:
+        server = start_mock_process(args.port, stream=True, dataflows=1, dimensions=n_dimensions, cardinality=args.cardinality,
+                                    years=args.years)
+        try:
+            for batch_size in args.batch_sizes:
+                # Every run gets a fresh process so the peak RSS belongs to that run only
+                output = subprocess.run([sys.executable, __file__, "--child", str(batch_size), "--port", str(args.port)]
+                                        + (["--traced"] if args.traced else []),
+                                        capture_output=True, text=True, check=True).stdout
+                stats = json.loads(output.strip().splitlines()[-1])
+                traced = f"{stats['peak_memory'] / 1e6:>10.1f}" if args.traced else f"{'-':>10}"
+                print(f"{stats['series']:>10} {stats['bytes'] / 1e6:>11.1f} {batch_size:>7} "
+                      f"{stats['seconds']:>8.1f} {stats['peak_rss'] / 1e6:>12.1f} {traced}")
+        finally:
+            server.terminate()
+            server.wait()
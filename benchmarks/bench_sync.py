@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_oecd_agencies import get_dataflows
+from fetch_oecd_data import get_oecd_data
+from dataset_store import read_dataset
+from mock_oecd_api import start_mock_server
+from sync_oecd_data import load_manifest, sync_dataflows
+
+# Function to sort a tidy long dataset so that datasets can be compared regardless of row order
+def sorted_frame(df):
+    key_columns = [col for col in df.columns if col != 'Value']
+    return df.sort_values(key_columns, kind='stable').reset_index(drop=True)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the bytes and requests of a full download with incremental syncs.")
+    parser.add_argument("--dataflows", type=int, default=20)
+    parser.add_argument("--dimensions", type=int, default=3)
+    parser.add_argument("--cardinality", type=int, default=15)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--changed-share", type=float, default=0.1, help="Share of dataflows revised between syncs")
+    parser.add_argument("--observations", type=int, default=50, help="Observations revised per changed dataflow")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_mock_server(n_dataflows=args.dataflows, n_dimensions=args.dimensions,
+                               cardinality=args.cardinality, n_years=args.years)
+    dataflows = get_dataflows(url=f"{server.api_root}/dataflow/ALL")
+    data_url = f"{server.api_root}/data"
+
+    with tempfile.TemporaryDirectory() as folder:
+        results = []
+        # The sync times sent as updatedAfter have a resolution of one second
+        time.sleep(1)
+        results.append(("initial (full)", sync_dataflows(dataflows, folder, max_workers=args.workers, base_url=data_url)))
+
+        time.sleep(1)
+        results.append(("no changes", sync_dataflows(dataflows, folder, max_workers=args.workers, base_url=data_url)))
+
+        changed = dataflows[:max(1, int(len(dataflows) * args.changed_share))]
+        for i, dataflow in enumerate(changed):
+            server.update_dataflow(dataflow['dataflow_identifier'], n_observations=args.observations, seed=i)
+        time.sleep(1)
+        results.append((f"{len(changed)} revised", sync_dataflows(dataflows, folder, max_workers=args.workers, base_url=data_url)))
+
+        # The merged datasets must match a fresh full download of the revised dataflows
+        manifest = load_manifest(folder)
+        mismatches = 0
+        for dataflow in changed:
+            entry = manifest[f"{dataflow['agency_identifier']},{dataflow['dataflow_identifier']}"]
+            stored_df = sorted_frame(read_dataset(os.path.join(folder, entry["file"])))
+            fresh_df = sorted_frame(get_oecd_data(dataflow['agency_identifier'], dataflow['dataflow_identifier'],
+                                                  base_url=data_url, long_format=True)[0])
+            mismatches += not stored_df.equals(fresh_df[stored_df.columns])
+
+    server.shutdown()
+    full_bytes = results[0][1]["bytes"]
+    print(f"\n{'pass':>16} {'requests':>9} {'MB':>8} {'share of full':>14} {'downloaded':>11} {'updated':>8} {'unchanged':>10}")
+    for label, stats in results:
+        print(f"{label:>16} {stats['requests']:>9} {stats['bytes'] / 1e6:>8.3f} {stats['bytes'] / full_bytes:>14.2%} "
+              f"{stats['downloaded']:>11} {stats['updated']:>8} {stats['unchanged']:>10}")
+    print(f"Merged datasets matching a full download: {len(changed) - mismatches}/{len(changed)}")
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dimensions of the synthetic dashboard datasets and their values
+dimensions = {dim_id: [f"{dim_id} {j}" for j in range(cardinality)]
+              for dim_id, cardinality in {'REF_AREA': 200, 'MEASURE': 20, 'SEX': 3, 'UNIT_MEASURE': 4}.items()}
+
+# Function to name n_dimensions generic dimensions with cardinality values each
+def numbered_dimensions(n_dimensions, cardinality):
+    return {f"DIM_{d}": [f"Dimension {d} value {j}" for j in range(cardinality)] for d in range(n_dimensions)}
+
+# Function to generate a tidy long dataset in random row order from a mapping of dimension ids to their
+# values, optionally with categorical dimensions as the decoder returns them
+def make_long_frame(n_rows, dimensions=dimensions, seed=0, categorical=False):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for dim_id, values in dimensions.items():
+        codes = rng.integers(0, len(values), n_rows)
+        if categorical:
+            columns[dim_id] = pd.Categorical.from_codes(codes.astype(np.int16), values)
+        else:
+            columns[dim_id] = np.array(values, dtype=object)[codes]
+    columns['Year'] = rng.integers(1960, 2024, n_rows)
+    columns['Value'] = rng.random(n_rows)
+    return pd.DataFrame(columns)
+
+# Function to return the best of several timings of a call, with its last result
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings), result
+
+# Function to read the peak resident memory of this process: VmHWM on Linux, which unlike ru_maxrss
+# is not carried over from the parent process through exec
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+# Function to start the mock API in its own process, so that it neither competes with the benchmark for
+# the interpreter lock nor adds its payloads to its memory; options are mock_oecd_api.py options
+# (stream=True becomes --stream, bytes_per_second=... becomes --bytes-per-second ...)
+def start_mock_process(port, **options):
+    arguments = ["--port", str(port)]
+    for option, value in options.items():
+        flag = "--" + option.replace("_", "-")
+        if value is True:
+            arguments.append(flag)
+        elif value is not False and value is not None:
+            arguments += [flag, str(value)]
+    process = subprocess.Popen([sys.executable, os.path.join(root_folder, "mock_oecd_api.py")] + arguments,
+                               stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # Wait for the "listening" line
+    return process
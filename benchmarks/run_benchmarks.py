@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+root_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_folder)
+
+from common import peak_rss, start_mock_process
+
+# Stages of the pipeline the suite measures, in pipeline order
+stages = ["fetch", "parse", "write", "load", "filter", "figure", "harvest"]
+
+# Function to read the current resident memory of the process (Linux only, None elsewhere)
+def current_rss():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+    except (OSError, StopIteration):
+        return None
+
+# Function to time run() repeat times after setup, returning the timings and what the last run returned
+def time_runs(run, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start_time)
+    return timings, result
+
+# Function to fetch the raw payload of the first mock dataflow
+def fetch_payload(data_url):
+    from fetch_oecd_data import data_formats
+    from mock_oecd_api import mock_agency
+    from oecd_http import get_with_backoff
+
+    response = get_with_backoff(f"{data_url}/{mock_agency},DF_MOCK_0/all", headers={"Accept": data_formats['json']}, cache=False)
+    response.raise_for_status()
+    return response.content
+
+# Function to decode the first mock dataflow into tidy long data
+def decoded_frame(data_url):
+    from fetch_oecd_data import decode_payload
+    return decode_payload(json.loads(fetch_payload(data_url)), long_format=True)[0]
+
+# Function to run one stage in the current process; returns its timings, the rows and bytes it
+# processed, and the memory before the timed runs
+def run_stage(stage_name, data_url, args, folder):
+    rows, n_bytes = None, None
+    if stage_name == "fetch":
+        rss_before = current_rss()
+        timings, payload = time_runs(lambda: fetch_payload(data_url), args.repeat)
+        n_bytes = len(payload)
+
+    elif stage_name == "parse":
+        from fetch_oecd_data import decode_payload
+        payload = fetch_payload(data_url)
+        rss_before = current_rss()
+        timings, df = time_runs(lambda: decode_payload(json.loads(payload), long_format=True)[0], args.repeat)
+        rows, n_bytes = len(df), len(payload)
+
+    elif stage_name == "write":
+        from dataset_store import write_dataset
+        df = decoded_frame(data_url)
+        rss_before = current_rss()
+        timings, file_path = time_runs(lambda: write_dataset(df, "benchmark", folder, csv_export=args.csv), args.repeat)
+        rows, n_bytes = len(df), os.path.getsize(file_path)
+
+    elif stage_name == "load":
+        from dataset_index import IndexedDataset
+        from dataset_store import read_dataset, write_dataset
+        file_path = write_dataset(decoded_frame(data_url), "benchmark", folder)
+        rss_before = current_rss()
+        timings, dataset = time_runs(lambda: IndexedDataset(read_dataset(file_path)), args.repeat)
+        rows, n_bytes = len(dataset.df), os.path.getsize(file_path)
+
+    elif stage_name == "filter":
+        from dataset_index import IndexedDataset
+        dataset = IndexedDataset(decoded_frame(data_url))
+        dimension_ids = [col for col in dataset.df.columns if col not in ['Year', 'Value']]
+        # One value selected on every other dimension and the middle of the year range
+        selections = {dim_id: [str(dataset.df[dim_id].iloc[0])] for dim_id in dimension_ids[::2]}
+        years = sorted(dataset.df['Year'].unique())
+        year_range = [years[len(years) // 4], years[3 * len(years) // 4]]
+        rss_before = current_rss()
+        timings, df = time_runs(lambda: dataset.select(selections, year_range), args.repeat)
+        rows = len(df)
+
+    elif stage_name == "figure":
+        from figure_rendering import build_figure
+        df = decoded_frame(data_url)
+        color_dimension = next(col for col in df.columns if col not in ['Year', 'Value'])
+        rss_before = current_rss()
+        timings, figure_json = time_runs(
+            lambda: build_figure(df, 'line', color_dimension, None, "Benchmark", None).to_json(), args.repeat)
+        rows, n_bytes = len(df), len(figure_json)
+
+    elif stage_name == "harvest":
+        from dataset_store import write_dataset
+        from fetch_oecd_agencies import get_dataflows
+        from harvest_oecd_data import harvest_dataflows
+        dataflows = get_dataflows(url=data_url.replace("/data", "/dataflow/ALL"))
+        save_dataset = lambda df, df_name, dataflow=None: write_dataset(df, df_name, folder)
+        rss_before = current_rss()
+        timings, stats = time_runs(lambda: harvest_dataflows(dataflows, save_dataset, max_workers=args.workers,
+                                                             base_url=data_url), args.repeat)
+        rows, n_bytes = len(dataflows), stats["bytes"]
+
+    else:
+        raise ValueError(f"Unknown stage {stage_name!r}")
+
+    return {
+        "seconds_min": min(timings),
+        "seconds_median": statistics.median(timings),
+        "timings": timings,
+        "rows": rows,
+        "bytes": n_bytes,
+        "rss_before": rss_before,
+        "peak_rss": peak_rss(),
+    }
+
+# Function to run one stage in a fresh interpreter, so that its peak memory is its own
+def run_stage_process(stage_name, data_url, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child-stage", stage_name, "--api-root", data_url.rsplit("/data", 1)[0],
+               "--repeat", str(args.repeat), "--workers", str(args.workers)] + (["--csv"] if args.csv else [])
+    output = subprocess.run(command, capture_output=True, text=True)
+    if output.returncode != 0:
+        print(output.stderr)
+        raise RuntimeError(f"Stage {stage_name} failed")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+# Function to describe the revision of the working tree the results belong to
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root_folder, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root_folder,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+# Function to print the results, with the ratio to a previous results file when one is given
+def print_results(results, baseline=None):
+    print(f"\n{'stage':>10} {'layout':>12} {'median s':>9} {'min s':>8} {'rows':>10} {'MB':>8} {'peak RSS MB':>12}"
+          + (f" {'vs baseline':>12}" if baseline else ""))
+    for key, result in results["results"].items():
+        stage_name, layout = key.split("/")
+        line = (f"{stage_name:>10} {layout:>12} {result['seconds_median']:>9.3f} {result['seconds_min']:>8.3f} "
+                f"{result['rows'] if result['rows'] is not None else '-':>10} "
+                f"{format(result['bytes'] / 1e6, '.2f') if result['bytes'] is not None else '-':>8} "
+                f"{result['peak_rss'] / 1e6:>12.1f}")
+        previous = (baseline or {}).get("results", {}).get(key)
+        if previous:
+            line += f" {result['seconds_median'] / previous['seconds_median']:>11.2f}x"
+        print(line)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the end-to-end benchmark suite against the local mock API and save the results as JSON.")
+    parser.add_argument("--stages", nargs="+", choices=stages, default=stages)
+    parser.add_argument("--layouts", nargs="+", choices=["series", "observations"], default=["series", "observations"],
+                        help="SDMX-JSON layouts served by the mock API")
+    parser.add_argument("--dataflows", type=int, default=10, help="Dataflows served by the mock API (harvest stage)")
+    parser.add_argument("--dimensions", type=int, default=4)
+    parser.add_argument("--cardinality", type=int, default=10)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument("--sparsity", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent dataflows in the harvest stage")
+    parser.add_argument("--csv", action="store_true", help="Also export the legacy CSV in the write stage")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare the timings with")
+    parser.add_argument("--child-stage", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--api-root", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: run one stage and print its result as JSON
+    if args.child_stage:
+        with tempfile.TemporaryDirectory() as folder:
+            result = run_stage(args.child_stage, f"{args.api_root}/data", args, folder)
+        print(json.dumps(result))
+        sys.exit(0)
+
+    commit, dirty = git_revision()
+    config = {option: getattr(args, option) for option in ["dataflows", "dimensions", "cardinality", "years", "sparsity",
+                                                            "repeat", "workers", "csv"]}
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "results": {},
+    }
+
+    for layout in args.layouts:
+        # The mock API runs in its own process, so that it neither competes with the stages for the
+        # interpreter lock nor adds its payloads to their memory
+        server = start_mock_process(args.port, dataflows=args.dataflows, dimensions=args.dimensions,
+                                    cardinality=args.cardinality, years=args.years, sparsity=args.sparsity, layout=layout)
+        try:
+            for stage_name in args.stages:
+                print(f"Running {stage_name} ({layout} layout)...", flush=True)
+                results["results"][f"{stage_name}/{layout}"] = run_stage_process(stage_name, f"http://127.0.0.1:{args.port}/data", args)
+        finally:
+            server.terminate()
+            server.wait()
+
+    output_path = args.output or os.path.join(root_folder, "benchmarks", "results", f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"\nResults saved to {output_path}")
@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Function to estimate the memory held by a cached dataset
+def dataset_nbytes(value):
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return int(getattr(value, 'nbytes', 0))
+
+# In-process LRU cache bounded in bytes, whose entries are computed from a version of a file.
+# Concurrent lookups of the same key and version share one computation; subclasses decide which
+# entries a new version of a file makes stale (validate) and which results may still be kept (is_current)
+class CoalescingCache:
+    def __init__(self, max_bytes, size_of=dataset_nbytes):
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.entries = OrderedDict()  # key -> (file path, version, value, nbytes)
+        self.loading = {}  # (key, version) -> Future shared by concurrent requests
+        self.lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Function to return the cached value of a key, computing it on a miss
+    def lookup(self, file_path, version, key, compute):
+        is_loader = False
+        with self.lock:
+            self.validate(file_path, version, key)
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                outcome = "hits"
+            else:
+                future = self.loading.get((key, version))
+                if future is not None:
+                    self.coalesced += 1
+                    outcome = "coalesced"
+                else:
+                    self.misses += 1
+                    future = Future()
+                    self.loading[(key, version)] = future
+                    is_loader = True
+                    outcome = "misses"
+        self.record(outcome)
+        if entry is not None:
+            return entry[2]
+        if not is_loader:
+            return future.result()
+
+        try:
+            value = compute()
+            nbytes = self.size_of(value)
+            with self.lock:
+                self.store(file_path, version, key, value, nbytes)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop((key, version), None)
+
+    # Function to drop the entries made stale by the version of a file (called with the lock held):
+    # by default, an entry of the key computed from another version
+    def validate(self, file_path, version, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry[1] != version:
+            self.invalidations += 1
+            self.remove(key)
+
+    # Function to check whether a result computed from a version of a file may be cached (called
+    # with the lock held)
+    def is_current(self, file_path, version):
+        return True
+
+    # Function to report the outcome of a lookup ("hits", "misses" or "coalesced")
+    def record(self, outcome):
+        pass
+
+    def store(self, file_path, version, key, value, nbytes):
+        # Values larger than the whole budget, or computed from a version that has been replaced
+        # meanwhile, are returned without being cached
+        if nbytes > self.max_bytes or not self.is_current(file_path, version):
+            return
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = (file_path, version, value, nbytes)
+        self.current_bytes += nbytes
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.remove(oldest)
+            self.evictions += 1
+
+    def remove(self, key):
+        file_path, version, value, nbytes = self.entries.pop(key)
+        self.current_bytes -= nbytes
+
+    # Function to measure a cached value again after it grew or shrank in place (e.g. a dataset whose
+    # rollup cube built another subset), evicting the least recently used entries beyond the budget
+    def resize(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return
+        nbytes = self.size_of(entry[2])
+        with self.lock:
+            if self.entries.get(key) is not entry:
+                return
+            self.entries[key] = entry[:3] + (nbytes,)
+            self.current_bytes += nbytes - entry[3]
+            while self.current_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self.remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# In-process LRU cache of parsed datasets, keyed by file path and validated against the file's
+# mtime and size so that a changed file on disk is reloaded automatically
+class DatasetCache(CoalescingCache):
+    def __init__(self, max_bytes=1024 * 1024 * 1024, size_of=dataset_nbytes):
+        super().__init__(max_bytes, size_of)
+
+    def get(self, file_path, load):
+        stat = os.stat(file_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        return self.lookup(file_path, version, file_path, lambda: load(file_path))
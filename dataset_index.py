@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# Tidy long dataset with categorical dimension columns and a prebuilt row index per dimension value,
+# so that a selection is answered by intersecting row positions and taking the rows once; the row
+# orders can be passed in precomputed ({dimension id: positions sorted by value code}), e.g. when
+# they are mapped from the shared store
+class IndexedDataset:
+    def __init__(self, df, orders=None):
+        self.dimension_ids = [col for col in df.columns if col not in ['Year', 'Value']]
+        # Only columns that are not categorical yet are cast: casting would copy the mapped categoricals
+        # of the shared store into private memory
+        casts = {dim_id: 'category' for dim_id in self.dimension_ids if not isinstance(df[dim_id].dtype, pd.CategoricalDtype)}
+        self.df = df.astype(casts) if casts else df
+        self.years = self.df['Year'].to_numpy()
+        self.indexes = {dim_id: self.build_index(self.df[dim_id], (orders or {}).get(dim_id))
+                        for dim_id in self.dimension_ids}
+        self.search_indexes = {dim_id: self.build_search_index(self.df[dim_id]) for dim_id in self.dimension_ids}
+        # Rollup cube of the dataset (see dataset_rollup.py), attached by the dashboard when it loads it
+        self.rollups = None
+
+    # Index of one dimension: the value code of every row, the row positions sorted by code, the offsets
+    # where each code's positions start, and a lookup from the value's text to its code
+    @staticmethod
+    def build_index(column, order=None):
+        # The codes of the categorical itself, not a copy, so that mapped codes stay shared
+        codes = np.asarray(column.array.codes)
+        if order is None:
+            order = np.argsort(codes, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes + 1, minlength=len(column.cat.categories) + 1))])
+        lookup = {str(value): code for code, value in enumerate(column.cat.categories)}
+        return codes, order, offsets, lookup
+
+    # Search index of one dimension: the lower-cased value texts in sorted order and their codes
+    @staticmethod
+    def build_search_index(column):
+        labels = np.array([str(value).lower() for value in column.cat.categories], dtype=str)
+        order = np.argsort(labels, kind='stable')
+        return labels[order], order
+
+    # Function to translate selected values of a dimension into their codes
+    def value_codes(self, dim_id, values):
+        lookup = self.indexes[dim_id][3]
+        return sorted({lookup[str(v).strip()] for v in values if str(v).strip() in lookup})
+
+    # Function to get the sorted row positions holding any of the given codes of a dimension
+    def positions(self, dim_id, codes):
+        order, offsets = self.indexes[dim_id][1:3]
+        slices = [order[offsets[code + 1]:offsets[code + 2]] for code in codes]
+        if len(slices) == 1:
+            return slices[0]
+        return np.sort(np.concatenate(slices)) if slices else np.empty(0, dtype=np.int64)
+
+    # Function to count the rows holding any of the given codes of a dimension
+    def count(self, dim_id, codes):
+        offsets = self.indexes[dim_id][2]
+        return sum(int(offsets[code + 2] - offsets[code + 1]) for code in codes)
+
+    # Function to select the rows matching every dimension selection ({dimension id: values}) and
+    # the inclusive year range; dimensions without selected values are not filtered
+    def select(self, selections=None, year_range=None):
+        positions = self.select_positions(selections, year_range)
+        if positions is None:
+            return self.df
+        return self.df.take(positions)
+
+    # Function to get the sorted row positions of a selection, or None when nothing is filtered
+    def select_positions(self, selections=None, year_range=None):
+        filters = [(dim_id, self.value_codes(dim_id, values)) for dim_id, values in (selections or {}).items() if values]
+
+        # Start from the rows of the most selective dimension, then keep the rows whose codes are
+        # selected in every other dimension
+        positions = None
+        for dim_id, codes in sorted(filters, key=lambda f: self.count(*f)):
+            if positions is None:
+                positions = self.positions(dim_id, codes)
+                continue
+            selected = np.zeros(len(self.df[dim_id].cat.categories) + 1, dtype=bool)
+            selected[np.asarray(codes, dtype=np.int64) + 1] = True
+            positions = positions[selected[self.indexes[dim_id][0][positions] + 1]]
+
+        if year_range is not None:
+            if positions is None:
+                positions = np.flatnonzero((self.years >= year_range[0]) & (self.years <= year_range[1]))
+            else:
+                years = self.years[positions]
+                positions = positions[(years >= year_range[0]) & (years <= year_range[1])]
+        return positions
+
+    # Function to find the values of a dimension whose text starts with (first) or contains the search
+    # text, case-insensitively and in sorted order, keeping only the values that still have rows under
+    # the selections of the other dimensions and the year range; returns at most limit values and
+    # the number of matches
+    def search_values(self, dim_id, search='', selections=None, year_range=None, limit=100):
+        other_selections = {other_id: values for other_id, values in (selections or {}).items() if other_id != dim_id}
+        positions = self.select_positions(other_selections, year_range)
+        codes, order, offsets, lookup = self.indexes[dim_id]
+        categories = self.df[dim_id].cat.categories
+        if positions is None:
+            valid = np.diff(offsets)[1:] > 0
+        else:
+            valid = np.bincount(codes[positions] + 1, minlength=len(categories) + 1)[1:] > 0
+
+        sorted_labels, order = self.search_indexes[dim_id]
+        search = str(search or '').strip().lower()
+        if search:
+            # Prefix matches are a contiguous range of the sorted texts; substring matches follow them
+            start = np.searchsorted(sorted_labels, search, side='left')
+            end = np.searchsorted(sorted_labels, search + '\U0010ffff', side='left')
+            contains = np.char.find(sorted_labels, search) >= 0
+            contains[start:end] = False
+            matches = np.concatenate([order[start:end], order[contains]])
+        else:
+            matches = order
+        matches = matches[valid[matches]]
+        return [str(categories[code]) for code in matches[:limit].tolist()], len(matches)
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def nbytes(self):
+        index_bytes = sum(order.nbytes + offsets.nbytes for codes, order, offsets, lookup in self.indexes.values())
+        rollup_bytes = self.rollups.nbytes if self.rollups is not None else 0
+        return int(self.df.memory_usage(index=True, deep=True).sum()) + index_bytes + rollup_bytes
@@ -0,0 +1,150 @@
+import json
+import os
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Version of the sidecar layout, bumped when its fields change
+metadata_format = 1
+
+# Function to get the path of the metadata sidecar that belongs to a dataset file
+def metadata_path(file_path):
+    return os.path.splitext(file_path)[0] + '.meta.json'
+
+# Function to describe the file a sidecar was built from, used to detect stale sidecars
+def source_stamp(file_path):
+    stat = os.stat(file_path)
+    return {"file": os.path.basename(file_path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+# Function to merge codelists ({dimension id: [{"id": value id, "name": value name}, ...]}), such as
+# those of the batches or revisions of a dataset; a later name of the same value id wins
+def merge_codelists(*codelists):
+    merged = {}
+    for codelist in codelists:
+        for dim_id, values in (codelist or {}).items():
+            names = merged.setdefault(dim_id, {})
+            for value in values:
+                names[value['id']] = value['name']
+    return {dim_id: [{"id": value_id, "name": name} for value_id, name in names.items()] for dim_id, names in merged.items()}
+
+# Function to read the codelists of a dataset from its sidecar ({} when it has none)
+def read_codelists(file_path):
+    try:
+        with open(metadata_path(file_path), encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {dim['id']: dim['codelist'] for dim in metadata.get("dimensions", []) if dim.get('codelist')}
+
+# Function to find the SDMX value ids of the values of a dimension with the given names, e.g. to build
+# the series key or updatedAfter request of a selection; every id of a name shared by several values
+def codelist_ids(metadata, dim_id, names):
+    names = {str(name) for name in names}
+    for dim in metadata.get("dimensions", []):
+        if dim['id'] == dim_id:
+            return [value['id'] for value in dim.get('codelist', []) if value['name'] in names]
+    return []
+
+# Accumulates the distinct values and counts of every dimension, the year bounds and the row
+# count of a tidy long dataset, batch by batch, with the codelist (SDMX value id and name) of every
+# dimension that the decoders put in attrs['codelists']
+class MetadataBuilder:
+    def __init__(self, sdmx_version=None, codelists=None):
+        self.sdmx_version = sdmx_version
+        self.codelists = codelists or {}
+        self.dimension_ids = None
+        self.value_counts = {}
+        self.year_min = None
+        self.year_max = None
+        self.row_count = 0
+
+    def update(self, df):
+        if self.dimension_ids is None:
+            self.dimension_ids = [col for col in df.columns if col not in ['Year', 'Value']]
+            self.value_counts = {dim_id: {} for dim_id in self.dimension_ids}
+
+        for dim_id in self.dimension_ids:
+            counts = self.value_counts[dim_id]
+            # Categorical columns also count the codelist values that have no rows
+            for value, count in df[dim_id].value_counts(dropna=True, sort=False).items():
+                if count:
+                    counts[value] = counts.get(value, 0) + int(count)
+
+        if df.attrs.get('codelists'):
+            self.codelists = merge_codelists(self.codelists, df.attrs['codelists'])
+        if len(df):
+            year_min, year_max = df['Year'].min(), df['Year'].max()
+            self.year_min = year_min if self.year_min is None else min(self.year_min, year_min)
+            self.year_max = year_max if self.year_max is None else max(self.year_max, year_max)
+        self.row_count += len(df)
+        return self
+
+    def result(self, file_path=None):
+        dimensions = []
+        for dim_id in self.dimension_ids or []:
+            counts = self.value_counts[dim_id]
+            values = sorted(counts)
+            dimension = {
+                "id": dim_id,
+                "values": [json_value(value) for value in values],
+                "counts": [counts[value] for value in values],
+            }
+            if self.codelists.get(dim_id):
+                dimension["codelist"] = self.codelists[dim_id]
+            dimensions.append(dimension)
+        return {
+            "format": metadata_format,
+            "source": source_stamp(file_path) if file_path else None,
+            "sdmx_version": self.sdmx_version,
+            "dimensions": dimensions,
+            "year_min": json_value(self.year_min),
+            "year_max": json_value(self.year_max),
+            "row_count": self.row_count,
+        }
+
+# Function to turn NumPy scalars into plain Python values for JSON
+def json_value(value):
+    return value.item() if hasattr(value, 'item') else value
+
+# Function to build the metadata of a complete tidy long dataset
+def build_metadata(df, file_path=None, sdmx_version=None):
+    return MetadataBuilder(sdmx_version).update(df).result(file_path)
+
+# Function to write a metadata sidecar next to its dataset file (atomically)
+def write_metadata(file_path, metadata):
+    sidecar_path = metadata_path(file_path)
+    temp_path = sidecar_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+    os.replace(temp_path, sidecar_path)
+    return sidecar_path
+
+# Function to read the sidecar of a dataset, rebuilding it from the parsed dataset with load(), which
+# returns the whole dataset or an iterable of its batches, when the sidecar is missing, unreadable
+# or older than the dataset file
+def load_metadata(file_path, load):
+    sidecar_path = metadata_path(file_path)
+    metadata = None
+    try:
+        with open(sidecar_path, encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get("format") == metadata_format and metadata.get("source") == source_stamp(file_path):
+            return metadata
+    except (OSError, ValueError):
+        pass
+
+    logger.info("Rebuilding metadata sidecar for %s", file_path)
+    # The SDMX version and the codelists do not come with the dataset file; keep those of the old sidecar
+    previous_version = metadata.get("sdmx_version") if isinstance(metadata, dict) else None
+    previous_codelists = ({dim['id']: dim['codelist'] for dim in metadata.get("dimensions", []) if dim.get('codelist')}
+                          if isinstance(metadata, dict) else {})
+    data = load(file_path)
+    builder = MetadataBuilder(previous_version, previous_codelists)
+    for df in ([data] if hasattr(data, 'columns') else data):
+        builder.update(df)
+    metadata = builder.result(file_path)
+    try:
+        write_metadata(file_path, metadata)
+    except OSError as e:
+        logger.warning("Could not write metadata sidecar %s: %s", sidecar_path, e)
+    return metadata
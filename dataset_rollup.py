@@ -0,0 +1,148 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Aggregations offered for the values of the dimensions left unselected
+aggregations = ['sum', 'mean', 'median', 'count']
+
+# Rollup cube of an indexed dataset: for a subset of its dimensions, the sum and the number of values
+# per Year and value of every dimension of the subset. A view that aggregates over the dimensions
+# outside the subset is answered by filtering the cube's cells and summing them per Year and color,
+# instead of grouping the rows of the whole dataset. The cubes of no dimension and of every single
+# dimension are built with the cube; those of larger subsets are built on first use and kept in an
+# LRU of max_subsets entries, calling on_resize (if set) so that a cache holding the dataset can
+# count the cube's new size. Medians cannot be combined from cells and are grouped from the rows.
+# No per-row arrays are kept: the year codes and the rows with a value are derived from the dataset's
+# columns whenever a cube is built
+class RollupCube:
+    def __init__(self, dataset, max_subsets=32):
+        self.dataset = dataset
+        self.max_subsets = max_subsets
+        self.years = np.unique(dataset.years)
+        # UNIT_MEASURE is kept in every cube, so the units of an aggregated view are known
+        self.unit_dimension = 'UNIT_MEASURE' if 'UNIT_MEASURE' in dataset.dimension_ids else None
+        self.cubes = OrderedDict()  # subset (sorted dimension ids) -> cells
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.on_resize = None
+        for dim_id in [None] + dataset.dimension_ids:
+            self.cube([dim_id] if dim_id else [])
+
+    # Function to get the cells of a subset of dimensions, building them on a miss: the year code and
+    # the value code of every dimension of the subset per cell, with the sum and count of its values
+    def cube(self, dim_ids):
+        subset = tuple(sorted(set(dim_ids) | ({self.unit_dimension} if self.unit_dimension else set())))
+        with self.lock:
+            cells = self.cubes.get(subset)
+            if cells is not None:
+                self.cubes.move_to_end(subset)
+                return cells
+
+        cells = self.build(subset)
+        with self.lock:
+            self.cubes[subset] = cells
+            self.builds += 1
+            while len(self.cubes) > self.max_subsets:
+                self.cubes.popitem(last=False)
+        if self.on_resize is not None:
+            self.on_resize()
+        return cells
+
+    # Function to group the rows by Year and the dimensions of a subset into cells
+    def build(self, subset):
+        # Value codes are shifted by one, so that rows with a missing dimension value (code -1) get cells of their own
+        codes = [np.searchsorted(self.years, self.dataset.years)] + [self.dataset.indexes[dim_id][0].astype(np.int64) + 1 for dim_id in subset]
+        sizes = [len(self.years)] + [len(self.dataset.df[dim_id].cat.categories) + 1 for dim_id in subset]
+        cell_ids, cells = group_ids(codes, sizes)
+        n_cells = len(cells[0])
+        values = self.dataset.df['Value'].to_numpy(dtype=np.float64)
+        has_value = ~np.isnan(values)
+        return {
+            'subset': subset,
+            'codes': dict(zip(('Year',) + subset, [cells[0]] + [c - 1 for c in cells[1:]])),
+            'sum': np.bincount(cell_ids[has_value], weights=values[has_value], minlength=n_cells),
+            'count': np.bincount(cell_ids[has_value], minlength=n_cells),
+        }
+
+    # Function to aggregate the values of a selection per Year and color dimension; returns the
+    # aggregated frame (color dimension, Year, Value) and the units of measure of the selected values
+    def aggregate(self, aggregation, selections=None, year_range=None, color_dimension=None):
+        if aggregation not in aggregations:
+            raise ValueError(f"Unknown aggregation {aggregation!r}, expected one of {aggregations}")
+        if aggregation == 'median':
+            return self.aggregate_rows(selections, year_range, color_dimension)
+        filters = {dim_id: self.dataset.value_codes(dim_id, values) for dim_id, values in (selections or {}).items() if values}
+
+        cells = self.cube(list(filters) + ([color_dimension] if color_dimension else []))
+        codes = cells['codes']
+        mask = np.ones(len(cells['sum']), dtype=bool)
+        if year_range is not None:
+            years = self.years[codes['Year']]
+            mask &= (years >= year_range[0]) & (years <= year_range[1])
+        for dim_id, selected_codes in filters.items():
+            selected = np.zeros(len(self.dataset.df[dim_id].cat.categories) + 1, dtype=bool)
+            selected[np.asarray(selected_codes, dtype=np.int64) + 1] = True
+            mask &= selected[codes[dim_id] + 1]
+        mask &= cells['count'] > 0
+
+        group_codes = [codes['Year'][mask]]
+        sizes = [len(self.years)]
+        if color_dimension:
+            group_codes.append(codes[color_dimension][mask] + 1)
+            sizes.append(len(self.dataset.df[color_dimension].cat.categories) + 1)
+        group, groups = group_ids(group_codes, sizes)
+        total = np.bincount(group, weights=cells['sum'][mask], minlength=len(groups[0]))
+        count = np.bincount(group, weights=cells['count'][mask], minlength=len(groups[0]))
+        value = {'sum': total, 'mean': total / np.maximum(count, 1), 'count': count}[aggregation]
+
+        df = pd.DataFrame({'Year': self.years[groups[0]], 'Value': value})
+        if color_dimension:
+            categories = self.dataset.df[color_dimension].cat.categories
+            df.insert(0, color_dimension, pd.Categorical.from_codes(groups[1] - 1, categories))
+            df = df.sort_values([color_dimension, 'Year'], kind='stable', ignore_index=True)
+        return df, self.units(codes, mask)
+
+    # Function to aggregate from the selected rows, for aggregations that cannot be combined from cells
+    def aggregate_rows(self, selections, year_range, color_dimension):
+        df = self.dataset.select(selections, year_range).dropna(subset=['Value'])
+        keys = ([color_dimension] if color_dimension else []) + ['Year']
+        aggregated = df.groupby(keys, observed=True, sort=True)['Value'].median().reset_index()
+        units = None
+        if self.unit_dimension:
+            units = [str(unit) for unit in pd.unique(df[self.unit_dimension].dropna())]
+        return aggregated, units
+
+    # Function to list the units of measure of the selected cells (None without a unit dimension)
+    def units(self, codes, mask):
+        if not self.unit_dimension:
+            return None
+        categories = self.dataset.df[self.unit_dimension].cat.categories
+        return [str(categories[code]) for code in np.unique(codes[self.unit_dimension][mask]) if code >= 0]
+
+    def stats(self):
+        with self.lock:
+            return {"subsets": len(self.cubes), "builds": self.builds, "bytes": self.nbytes}
+
+    @property
+    def nbytes(self):
+        return self.years.nbytes + sum(cells['sum'].nbytes + cells['count'].nbytes + sum(c.nbytes for c in cells['codes'].values())
+                   for cells in list(self.cubes.values()))
+
+# Function to number the distinct combinations of several arrays of non-negative codes, each below
+# its size; returns the group of every row and, per group in sorted order, its code in every array
+def group_ids(codes, sizes):
+    # Combinations that do not fit in one 64-bit key are numbered row-wise instead
+    if np.prod([float(size) for size in sizes]) >= 2 ** 63:
+        unique_rows, group = np.unique(np.stack([np.asarray(c, dtype=np.int64) for c in codes], axis=1), axis=0, return_inverse=True)
+        return group.reshape(-1), list(unique_rows.T)
+
+    keys = np.zeros(len(codes[0]), dtype=np.int64)
+    for column, size in zip(codes, sizes):
+        keys = keys * size + np.asarray(column, dtype=np.int64)
+    unique_keys, group = np.unique(keys, return_inverse=True)
+    groups = []
+    for size in reversed(sizes):
+        groups.append(unique_keys % size)
+        unique_keys = unique_keys // size
+    return group.reshape(-1), groups[::-1]
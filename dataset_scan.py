@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dataset_store import concat_datasets
+from instrumentation import increment
+
+# Function to list the Parquet files of a dataset: the file itself, or the part files of a dataset
+# folder in name order (the order pandas reads them in)
+def dataset_files(path):
+    if os.path.isdir(path):
+        return [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith('.parquet')]
+    return [path]
+
+# Function to get the size of a dataset on disk, summed over its part files
+def dataset_size(path):
+    return sum(os.path.getsize(f) for f in dataset_files(path))
+
+# Function to order the values matching a search text as IndexedDataset.search_values does: values
+# starting with the text first, then values containing it, case-insensitively and in sorted order
+def match_values(values, search=''):
+    labels = sorted((str(value).lower(), str(value)) for value in values)
+    search = str(search or '').strip().lower()
+    if not search:
+        return [value for label, value in labels]
+    prefix = [value for label, value in labels if label.startswith(search)]
+    return prefix + [value for label, value in labels if search in label and not label.startswith(search)]
+
+# Tidy long Parquet dataset queried out of core: nothing but the Parquet footers is read when it is
+# opened, and every query reads only the row groups whose statistics can hold the selected
+# dimension values and years, one row group at a time. The rows of those row groups are then
+# filtered exactly, so selections give the same rows (with the same index) as IndexedDataset.select.
+# Aggregations accumulate per-group sums batch by batch, in place of a rollup cube. Views of more
+# than max_rows rows (None for no limit) are sampled while they are read
+class ScannedDataset:
+    def __init__(self, path, max_searches=64, max_rows=None):
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.files = []  # (file path, Parquet metadata)
+        self.row_groups = []  # (file number, row group number, first row, rows, {column: (min, max)})
+        n_rows = 0
+        for file_number, file_path in enumerate(dataset_files(path)):
+            metadata = pq.ParquetFile(file_path).metadata
+            self.files.append((file_path, metadata))
+            for rg in range(metadata.num_row_groups):
+                row_group = metadata.row_group(rg)
+                self.row_groups.append((file_number, rg, n_rows, row_group.num_rows, row_group_bounds(row_group)))
+                n_rows += row_group.num_rows
+        self.n_rows = n_rows
+
+        self.schema = pq.read_schema(self.files[0][0]) if self.files else None
+        self.columns = [name for name in (self.schema.names if self.schema is not None else []) if not name.startswith('__index_level_')]
+        self.dimension_ids = [col for col in self.columns if col not in ['Year', 'Value']]
+        self.searches = OrderedDict()  # search state -> values with rows
+        self.max_searches = max_searches
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.rollups = self
+
+    def __len__(self):
+        return self.n_rows
+
+    # Function to find the row groups that can hold rows of a selection, from their min/max statistics
+    # (row groups without statistics for a filtered column are always read)
+    def prune(self, filters, year_range):
+        kept = []
+        for row_group in self.row_groups:
+            bounds = row_group[4]
+            if year_range is not None and 'Year' in bounds:
+                year_min, year_max = bounds['Year']
+                if not isinstance(year_min, str) and (year_max < year_range[0] or year_min > year_range[1]):
+                    continue
+            if all(dim_id not in bounds or not isinstance(bounds[dim_id][0], str)
+                   or any(bounds[dim_id][0] <= value <= bounds[dim_id][1] for value in values)
+                   for dim_id, values in filters.items()):
+                kept.append(row_group)
+        return kept
+
+    # Function to read the rows of a selection batch by batch, one row group at a time, with only the
+    # given columns (all by default); every batch keeps the row positions of the dataset as its index.
+    # With max_rows, the matching rows of every row group are sampled evenly down to the row group's
+    # share of max_rows, and attrs['matched_rows'] of each batch holds its rows before sampling
+    def scan(self, selections=None, year_range=None, columns=None, max_rows=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        filters = {dim_id: sorted({str(v).strip() for v in values}) for dim_id, values in (selections or {}).items() if values}
+        columns = list(columns or self.columns)
+        read_columns = [col for col in self.columns if col in columns or col in filters or (col == 'Year' and year_range is not None)]
+        row_groups = self.prune(filters, year_range)
+        increment("scan_row_groups_read", len(row_groups))
+        increment("scan_row_groups_skipped", len(self.row_groups) - len(row_groups))
+
+        candidates = sum(row_group[3] for row_group in row_groups)
+        sampled = bool(max_rows) and candidates > max_rows
+
+        parquet_file = None
+        current_file = None
+        for file_number, rg, first_row, n_rows, bounds in row_groups:
+            if file_number != current_file:
+                file_path, metadata = self.files[file_number]
+                parquet_file = pq.ParquetFile(file_path, metadata=metadata, read_dictionary=self.dimension_ids)
+                current_file = file_number
+            table = parquet_file.read_row_group(rg, columns=read_columns)
+
+            mask = None
+            for dim_id, values in filters.items():
+                # Values are compared as text, as IndexedDataset.value_codes does
+                column = table.column(dim_id)
+                if not is_string_type(column.type):
+                    column = pc.cast(column, 'string')
+                condition = pc.fill_null(pc.is_in(column, value_set=pa.array(values, type=pa.string())), False)
+                mask = condition if mask is None else pc.and_(mask, condition)
+            if year_range is not None:
+                years = table.column('Year')
+                condition = pc.fill_null(pc.and_(pc.greater_equal(years, year_range[0]), pc.less_equal(years, year_range[1])), False)
+                mask = condition if mask is None else pc.and_(mask, condition)
+
+            positions = np.arange(first_row, first_row + n_rows)
+            if mask is not None:
+                keep = mask.to_numpy(zero_copy_only=False)
+                if not keep.any():
+                    continue
+                table = table.filter(mask)
+                positions = positions[keep]
+            matched_rows = len(positions)
+            if sampled:
+                share = max(1, -(-max_rows * n_rows // candidates))
+                if matched_rows > share:
+                    kept = np.linspace(0, matched_rows - 1, share).astype(np.int64)
+                    table = table.take(kept)
+                    positions = positions[kept]
+            df = table.select([col for col in read_columns if col in columns]).to_pandas()
+            df.index = positions
+            df.attrs['matched_rows'] = matched_rows
+            yield df
+
+    # Function to select the rows matching every dimension selection and the inclusive year range,
+    # reading only the row groups that can hold them; with max_rows, a selection with more rows is
+    # sampled evenly in every row group (see scan), so memory stays bounded however large the
+    # selection, and attrs['matched_rows'] holds the number of rows before sampling
+    def select(self, selections=None, year_range=None, columns=None, max_rows=None):
+        frames = list(self.scan(selections, year_range, columns, max_rows))
+        if not frames:
+            df = self.empty_frame(columns)
+        elif len(frames) == 1:
+            df = frames[0]
+        else:
+            df = concat_datasets(frames)
+            df.index = np.concatenate([frame.index.to_numpy() for frame in frames])
+        df.attrs['matched_rows'] = sum(frame.attrs['matched_rows'] for frame in frames)
+        return df
+
+    # Function to build an empty frame with the dataset's columns and types
+    def empty_frame(self, columns=None):
+        if self.schema is None:
+            return pd.DataFrame(columns=list(columns or self.columns))
+        df = self.schema.empty_table().select(list(columns or self.columns)).to_pandas()
+        return df.astype({dim_id: 'category' for dim_id in self.dimension_ids if dim_id in df.columns})
+
+    # Function to find the values of a dimension matching a search text that still have rows under the
+    # selections of the other dimensions and the year range, like IndexedDataset.search_values; the
+    # values with rows are kept per state of the other controls, so typing does not scan again
+    def search_values(self, dim_id, search='', selections=None, year_range=None, limit=100):
+        other_selections = {other_id: sorted(str(v).strip() for v in values)
+                            for other_id, values in (selections or {}).items() if values and other_id != dim_id}
+        key = json.dumps([dim_id, other_selections, list(year_range) if year_range else None], sort_keys=True, default=str)
+        with self.lock:
+            values = self.searches.get(key)
+            if values is not None:
+                self.searches.move_to_end(key)
+        if values is None:
+            values = set()
+            for df in self.scan(other_selections, year_range, columns=[dim_id]):
+                values.update(str(value) for value in pd.unique(df[dim_id].dropna()))
+            with self.lock:
+                self.searches[key] = values
+                while len(self.searches) > self.max_searches:
+                    self.searches.popitem(last=False)
+        matches = match_values(values, search)
+        return matches[:limit], len(matches)
+
+    # Function to aggregate the values of a selection per Year and color dimension, as
+    # RollupCube.aggregate does: sums and counts are accumulated per row group, so memory stays
+    # bounded by the number of groups; medians need every value and are taken from the selected
+    # rows, sampled down to max_rows for larger selections
+    def aggregate(self, aggregation, selections=None, year_range=None, color_dimension=None):
+        from dataset_rollup import aggregations
+
+        if aggregation not in aggregations:
+            raise ValueError(f"Unknown aggregation {aggregation!r}, expected one of {aggregations}")
+        keys = ([color_dimension] if color_dimension else []) + ['Year']
+        unit_dimension = 'UNIT_MEASURE' if 'UNIT_MEASURE' in self.dimension_ids else None
+        columns = keys + ['Value'] + ([unit_dimension] if unit_dimension and unit_dimension not in keys else [])
+
+        if aggregation == 'median':
+            df = self.select(selections, year_range, columns, max_rows=self.max_rows).dropna(subset=['Value'])
+            aggregated = df.groupby(keys, observed=True, sort=True)['Value'].median().reset_index()
+            # One row per group: the number of rows read does not describe the aggregated frame
+            aggregated.attrs.clear()
+            units = [str(unit) for unit in pd.unique(df[unit_dimension].dropna())] if unit_dimension else None
+            return aggregated, units
+
+        partials = []
+        units = set()
+        for df in self.scan(selections, year_range, columns):
+            df = df.dropna(subset=['Value'])
+            # Batches are grouped on their categorical codes; only the small partial results are
+            # turned into plain values, since the categories of the row groups can differ
+            partial = df.groupby(keys, observed=True, dropna=False, sort=False)['Value'].agg(['sum', 'count']).reset_index()
+            if color_dimension:
+                partial[color_dimension] = partial[color_dimension].astype(object).where(partial[color_dimension].notna())
+            partials.append(partial)
+            if unit_dimension:
+                units.update(str(unit) for unit in pd.unique(df[unit_dimension].dropna()))
+        if not partials:
+            return pd.DataFrame(columns=keys + ['Value']), sorted(units) if unit_dimension else None
+
+        totals = pd.concat(partials).groupby(keys, dropna=False, sort=True)[['sum', 'count']].sum()
+        value = {'sum': totals['sum'], 'mean': totals['sum'] / totals['count'], 'count': totals['count']}[aggregation]
+        aggregated = value.rename('Value').reset_index()
+        if color_dimension:
+            aggregated[color_dimension] = aggregated[color_dimension].astype('category')
+        return aggregated, sorted(units) if unit_dimension else None
+
+    # Function to read the whole dataset batch by batch, e.g. to build its metadata sidecar
+    def batches(self):
+        return self.scan()
+
+    @property
+    def nbytes(self):
+        # Only the row-group statistics are held in memory, roughly a few hundred bytes per row group
+        return 256 * len(self.row_groups)
+
+# Function to read the min/max statistics of the columns of a row group ({column: (min, max)})
+def row_group_bounds(row_group):
+    bounds = {}
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        statistics = column.statistics
+        if statistics is not None and statistics.has_min_max:
+            bounds[column.path_in_schema] = (statistics.min, statistics.max)
+    return bounds
+
+# Function to check whether an Arrow type holds text, directly or as the values of a dictionary
+def is_string_type(arrow_type):
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
@@ -0,0 +1,307 @@
+import os
+import re
+from itertools import chain, islice
+import numpy as np
+import pandas as pd
+from dataset_metadata import MetadataBuilder, build_metadata, write_metadata
+from instrumentation import get_logger, stage
+
+logger = get_logger(__name__)
+
+# File formats the dashboard can open, in order of preference when a dataset exists in several
+dataset_extensions = ['.parquet', '.csv']
+
+# Suffix of the files a dataset is written to before it is renamed into place
+partial_suffix = '.partial'
+
+# Rows per Parquet row group; with the rows in storage order (see storage_order), the min/max
+# statistics of these row groups let out-of-core queries skip the row groups a selection cannot match
+parquet_row_group_rows = 65536
+
+# Rows a streamed Parquet file is sorted by in storage order at a time, before they are written as
+# row groups: the streamed batches arrive in the API's order, and sorting several row groups
+# together keeps the statistics of each one narrow without holding the whole dataset
+parquet_sort_rows = 16 * parquet_row_group_rows
+
+# Function to get the temporary path a file is written to before it is renamed into place, so that
+# a crash never leaves a half-written dataset under its final name
+def partial_path(file_path):
+    return file_path + partial_suffix
+
+# Function to delete the partial files a crashed run left in a folder
+def remove_partial_files(folder_name):
+    removed = []
+    if os.path.isdir(folder_name):
+        for f in os.listdir(folder_name):
+            if f.endswith(partial_suffix):
+                os.remove(os.path.join(folder_name, f))
+                removed.append(f)
+    if removed:
+        logger.info("Removed %d partial files left by an interrupted run in %s", len(removed), folder_name)
+    return removed
+
+# Function to combine tidy long datasets, such as partitions or a stored dataset and its revisions;
+# categorical dimension columns stay categorical, with the union of the categories of every frame
+def concat_datasets(frames):
+    from pandas.api.types import union_categoricals
+
+    df = pd.concat(frames, ignore_index=True)
+    for col in df.columns:
+        if (not isinstance(df[col].dtype, pd.CategoricalDtype)
+                and all(isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames)):
+            df[col] = union_categoricals([frame[col] for frame in frames])
+    return df
+
+# Function to turn tidy long data (dimensions, Year, Value) back into the legacy layout with one
+# row per series and its year -> value mapping in 'Observation Value'
+def to_legacy_frame(df):
+    dimension_ids = [col for col in df.columns if col not in ['Year', 'Value']]
+    if df.empty:
+        return pd.DataFrame(columns=dimension_ids + ['Observation Value'])
+
+    # Number the series in order of first appearance and gather the rows of each series together
+    group_ids = df.groupby(dimension_ids, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    order = np.argsort(group_ids, kind='stable')
+    counts = np.bincount(group_ids)
+    first_rows = order[np.concatenate([[0], np.cumsum(counts)[:-1]])]
+
+    legacy_df = df.iloc[first_rows][dimension_ids].reset_index(drop=True)
+    pairs = zip(df['Year'].astype(str).to_numpy()[order].tolist(), df['Value'].to_numpy()[order].tolist())
+    legacy_df['Observation Value'] = [dict(islice(pairs, count)) for count in counts.tolist()]
+    return legacy_df
+
+# Function to get the order rows are stored in: sorted by the text of every dimension in column order,
+# then by Year, so that each row group holds a narrow range of values of the leading dimensions
+def storage_order(df):
+    keys = []
+    for col in [col for col in df.columns if col not in ['Year', 'Value']]:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Rank the categories by their text once, rather than comparing the text of every row
+            ranks = np.argsort(np.argsort(np.array([str(value) for value in df[col].cat.categories], dtype=object), kind='stable'))
+            codes = df[col].cat.codes.to_numpy()
+            keys.append(np.where(codes >= 0, ranks[np.maximum(codes, 0)], len(ranks)))
+        else:
+            codes, uniques = pd.factorize(df[col].astype(str).where(df[col].notna()), sort=True)
+            keys.append(np.where(codes >= 0, codes, len(uniques)))
+    if 'Year' in df.columns:
+        keys.append(df['Year'].to_numpy())
+    return np.lexsort(keys[::-1]) if keys else np.arange(len(df))
+
+# Function to write a tidy long dataset to compressed Parquet in one pass, in storage order, with its
+# metadata sidecar, optionally with a CSV export in the legacy layout for older consumers; every file
+# is written under a temporary name and renamed into place once complete
+def write_dataset(df, df_name, folder_name, csv_export=False, sdmx_version=None):
+    os.makedirs(folder_name, exist_ok=True)
+
+    file_path = os.path.join(folder_name, df_name + '.parquet')
+    with stage("parquet_write", rows=len(df)) as timer:
+        df.take(storage_order(df)).to_parquet(partial_path(file_path), index=False, compression='zstd',
+                                              row_group_size=parquet_row_group_rows)
+        os.replace(partial_path(file_path), file_path)
+        timer.n_bytes = os.path.getsize(file_path)
+    write_metadata(file_path, build_metadata(df, file_path, sdmx_version=sdmx_version))
+    logger.info("Data saved successfully to %s", file_path)
+
+    if csv_export:
+        csv_path = os.path.join(folder_name, df_name + '.csv')
+        with stage("csv_write", rows=len(df)) as timer:
+            to_legacy_frame(df).to_csv(partial_path(csv_path), index=False, encoding='utf-8')
+            os.replace(partial_path(csv_path), csv_path)
+            timer.n_bytes = os.path.getsize(csv_path)
+        logger.info("Data saved successfully to %s", csv_path)
+    return file_path
+
+# Function to read a tidy long dataset written by write_dataset
+def read_dataset(file_path, columns=None):
+    with stage("parquet_read", n_bytes=os.path.getsize(file_path)) as timer:
+        df = pd.read_parquet(file_path, columns=columns)
+        timer.rows = len(df)
+    return df
+
+# Patterns for the year -> value mappings stored as Python dict literals in legacy CSV files
+legacy_value_pattern = r"(?:[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|nan|-?inf|None)"
+legacy_item_pattern = r"(?:'[^']*'|-?\d+)\s*:\s*" + legacy_value_pattern
+legacy_mapping_pattern = r"\{\s*(?:" + legacy_item_pattern + r"\s*(?:,\s*" + legacy_item_pattern + r"\s*)*,?\s*)?\}"
+legacy_pair_pattern = r"(?:'([^']*)'|(-?\d+))\s*:\s*(" + legacy_value_pattern + ")"
+
+# Function to explode the 'Observation Value' mappings of a legacy frame into tidy long format in bulk;
+# rows whose mapping cannot be parsed are reported and listed in the result's attrs['malformed_rows']
+def parse_legacy_frame(df):
+    dimension_ids = [col for col in df.columns if col != 'Observation Value']
+    observations = df['Observation Value'].astype(str)
+
+    # Flag the rows whose mapping is not a well-formed dict literal
+    valid = observations.str.fullmatch(legacy_mapping_pattern)
+    malformed_rows = df.index[~valid].tolist()
+    if malformed_rows:
+        logger.warning("Skipped %s malformed 'Observation Value' rows: %s%s", len(malformed_rows), malformed_rows[:10],
+                       " ..." if len(malformed_rows) > 10 else "")
+
+    # Extract the year/value pairs of every valid row and repeat each row's position once per pair
+    pair_regex = re.compile(legacy_pair_pattern)
+    matches = [pair_regex.findall(text) for text in observations[valid].tolist()]
+    counts = np.fromiter(map(len, matches), dtype=np.int64, count=len(matches))
+    row_positions = np.repeat(np.flatnonzero(valid.to_numpy()), counts)
+    pairs = list(chain.from_iterable(matches))
+
+    parsed_df = pd.DataFrame({
+        'Year': [year or year_number for year, year_number, value in pairs],
+        'Value': [value for year, year_number, value in pairs],
+    })
+    # The dimension values are encoded once per series and their codes repeated per observation
+    for col in dimension_ids:
+        column = df[col].astype('category')
+        parsed_df[col] = pd.Categorical.from_codes(column.cat.codes.to_numpy()[row_positions], column.cat.categories)
+    parsed_df['Year'] = parsed_df['Year'].astype(int)
+    parsed_df['Value'] = pd.to_numeric(parsed_df['Value'], errors='coerce')
+    parsed_df.attrs['malformed_rows'] = malformed_rows
+    return parsed_df
+
+# Function to read a legacy CSV (one row per series) into tidy long format
+def read_legacy_csv(file_path):
+    with stage("csv_read", n_bytes=os.path.getsize(file_path)) as timer:
+        legacy_df = pd.read_csv(file_path)
+        timer.rows = len(legacy_df)
+    with stage("legacy_parse", rows=len(legacy_df)):
+        return parse_legacy_frame(legacy_df)
+
+# Function to list the dataset files in a folder, keeping the preferred format of each dataset
+def list_datasets(folder_name):
+    datasets = {}
+    for f in sorted(os.listdir(folder_name)):
+        name, extension = os.path.splitext(f)
+        if extension in dataset_extensions:
+            current = datasets.get(name)
+            if current is None or dataset_extensions.index(extension) < dataset_extensions.index(os.path.splitext(current)[1]):
+                datasets[name] = f
+    return list(datasets.values())
+
+# Listings of the dataset folders: folder -> (modification time of the folder, dataset files)
+catalogue_index = {}
+
+# Function to list the datasets of a folder from the catalogue index, listing the folder again only
+# when its modification time shows that files were added, renamed or removed
+def dataset_catalogue(folder_name):
+    mtime = os.stat(folder_name).st_mtime_ns
+    entry = catalogue_index.get(folder_name)
+    if entry is None or entry[0] != mtime:
+        entry = catalogue_index[folder_name] = (mtime, list_datasets(folder_name))
+    return entry[1]
+
+# Sink that appends decoded batches to a CSV file, writing the header with the first batch;
+# with legacy=True, tidy long batches are written in the legacy one-row-per-series layout.
+# Batches go to a partial file that close() renames into place and abort() deletes
+class CsvSink:
+    def __init__(self, file_path, legacy=False):
+        self.file_path = file_path
+        self.legacy = legacy
+        self.file = None
+
+    def write(self, df):
+        with stage("csv_write", rows=len(df)):
+            if self.legacy:
+                df = to_legacy_frame(df)
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                self.file = open(partial_path(self.file_path), 'w', encoding='utf-8', newline='')
+                df.to_csv(self.file, index=False)
+            else:
+                df.to_csv(self.file, index=False, header=False)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            os.replace(partial_path(self.file_path), self.file_path)
+            logger.info("Data saved successfully to %s", self.file_path)
+
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+            os.remove(partial_path(self.file_path))
+            self.file = None
+
+# Function to give every dictionary column of an Arrow schema 32-bit indices, so that the schema of
+# a first batch also fits later batches whose categoricals have more values
+def widen_dictionaries(schema):
+    import pyarrow as pa
+
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+    return schema
+
+# Sink that appends decoded batches as row groups (of at most parquet_row_group_rows rows) of a
+# compressed Parquet file, written to a partial file that close() renames into place and abort() deletes.
+# Batches are gathered up to parquet_sort_rows rows and written in storage order, so that
+# out-of-core queries can skip row groups as they do in files written by write_dataset
+class ParquetSink:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+
+    def write(self, df):
+        self.pending.append(df)
+        self.pending_rows += len(df)
+        if self.pending_rows >= parquet_sort_rows:
+            self.flush()
+
+    # Function to write the gathered batches, sorted in storage order, as row groups
+    def flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.pending:
+            return
+        df = self.pending[0] if len(self.pending) == 1 else concat_datasets(self.pending)
+        self.pending = []
+        self.pending_rows = 0
+        with stage("parquet_write", rows=len(df)):
+            df = df.take(storage_order(df))
+            if self.writer is None:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                schema = widen_dictionaries(pa.Schema.from_pandas(df, preserve_index=False))
+                self.writer = pq.ParquetWriter(partial_path(self.file_path), schema, compression='zstd')
+            table = pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False)
+            self.writer.write_table(table, row_group_size=parquet_row_group_rows)
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(partial_path(self.file_path), self.file_path)
+            logger.info("Data saved successfully to %s", self.file_path)
+
+    def abort(self):
+        self.pending = []
+        self.pending_rows = 0
+        if self.writer is not None:
+            self.writer.close()
+            os.remove(partial_path(self.file_path))
+            self.writer = None
+
+# Sink writing a streamed dataset to Parquet, optionally with the legacy CSV export, and its
+# metadata sidecar built batch by batch
+class DatasetSink:
+    def __init__(self, df_name, folder_name, csv_export=False, sdmx_version=None):
+        self.file_path = os.path.join(folder_name, df_name + '.parquet')
+        self.sinks = [ParquetSink(self.file_path)]
+        if csv_export:
+            self.sinks.append(CsvSink(os.path.join(folder_name, df_name + '.csv'), legacy=True))
+        self.metadata = MetadataBuilder(sdmx_version)
+
+    def write(self, df):
+        for sink in self.sinks:
+            sink.write(df)
+        self.metadata.update(df)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        if self.metadata.dimension_ids is not None:
+            write_metadata(self.file_path, self.metadata.result(self.file_path))
+
+    def abort(self):
+        for sink in self.sinks:
+            sink.abort()
@@ -1,10 +1,13 @@
 import requests
 import csv
-import time
 import re
+from instrumentation import get_logger
+from oecd_http import api_root, get_with_backoff, retry_status_codes
+
+logger = get_logger(__name__)
 
 # Base URL for fetching dataflows (SDMX API version 1)
-base_url = "https://sdmx.oecd.org/public/rest/dataflow"
+base_url = f"{api_root}/dataflow"
 
 # Headers to request JSON response
 headers = {
@@ -17,48 +20,41 @@ def clean_html(raw_html):
     return clean_text
 
 # Function to get the list of dataflows including agency identifiers with retry logic
-def get_dataflows(max_retries=5):
-    retries = 0
-    while retries < max_retries:
-        try:
-            response = requests.get(f"{base_url}/ALL", headers=headers)
-            response.raise_for_status()
-            data = response.json()
+def get_dataflows(max_retries=5, session=None, rate_limiter=None, url=None):
+    try:
+        response = get_with_backoff(url or f"{base_url}/ALL", headers=headers, session=session,
+                                    rate_limiter=rate_limiter, max_retries=max_retries)
+        response.raise_for_status()
+        data = response.json()
 
-            # Extract relevant dataflows with agency identifiers
-            dataflows = []
-            for flow in data['data']['dataflows']:
-                agency_id = flow['id']
-                name = flow['name'] if flow.get('name', {}) else 'No name available'
-                raw_description = flow['description'] if flow.get('description', {}) else 'No description available'
-                description = clean_html(raw_description)
-                version = flow['version']
-                agency_identifier = flow['agencyID']
+        # Extract relevant dataflows with agency identifiers
+        dataflows = []
+        for flow in data['data']['dataflows']:
+            agency_id = flow['id']
+            name = flow['name'] if flow.get('name', {}) else 'No name available'
+            raw_description = flow['description'] if flow.get('description', {}) else 'No description available'
+            description = clean_html(raw_description)
+            version = flow['version']
+            agency_identifier = flow['agencyID']
 
-                dataflows.append({
-                    "agency_identifier": agency_identifier,
-                    "dataflow_identifier": agency_id,
-                    "dataflow_version": version,
-                    "name": name,
-                    "description": description
-                })
+            dataflows.append({
+                "agency_identifier": agency_identifier,
+                "dataflow_identifier": agency_id,
+                "dataflow_version": version,
+                "name": name,
+                "description": description
+            })
 
-            return dataflows
+        return dataflows
 
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 503:
-                retries += 1
-                wait_time = 2 ** retries  # Exponential backoff
-                print(f"Service unavailable (503). Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"HTTP error occurred: {e}")
-                break
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching dataflows: {e}")
-            break
+    except requests.exceptions.HTTPError as e:
+        if response.status_code in retry_status_codes:
+            logger.error("Failed to retrieve dataflows after multiple retries.")
+        else:
+            logger.error("HTTP error occurred: %s", e)
+    except requests.exceptions.RequestException as e:
+        logger.error("Error fetching dataflows: %s", e)
 
-    print("Failed to retrieve dataflows after multiple retries.")
     return []
 
 # Function to save dataflows to a CSV file
@@ -68,14 +64,14 @@ def save_to_csv(dataflows, filename="oecd_dataflows.csv"):
         writer = csv.DictWriter(f, fieldnames=keys)
         writer.writeheader()
         writer.writerows(dataflows)
-    print(f"Data saved to {filename}")
+    logger.info("Data saved to %s", filename)
 
 # Main function to execute the process
-def get_oecd_agencies():
-    dataflows = get_dataflows()
+def get_oecd_agencies(session=None, url=None):
+    dataflows = get_dataflows(session=session, url=url)
     
     if dataflows:
         return dataflows
         
     else:
-        print("No dataflows retrieved.")
+        logger.warning("No dataflows retrieved.")
@@ -1,118 +1,571 @@
-import requests
+import csv
+import io
 import json
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, compress, islice
+from operator import itemgetter
+import numpy as np
 import pandas as pd
+import requests
+from dataset_metadata import merge_codelists
+from dataset_store import concat_datasets, to_legacy_frame
+from instrumentation import get_logger, stage
+from oecd_http import api_root, get_with_backoff
+
+logger = get_logger(__name__)
+
+# Base URL for fetching data (SDMX API version 1)
+data_url = f"{api_root}/data"
+
+# Accept headers of the formats get_oecd_data can request the data in
+data_formats = {
+    'json': "application/vnd.sdmx.data+json; charset=utf-8; version=1.0",
+    'csv': "application/vnd.sdmx.data+csv; charset=utf-8; labels=both",
+}
+
+# Leading SDMX-CSV columns that identify the dataflow rather than a dimension
+csv_structure_columns = ['DATAFLOW', 'STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME', 'ACTION']
+
+# Function to flatten the observations of every series into period ids and values in bulk;
+# with drop_zero_series=False, series whose observations sum to zero are kept as well
+def flatten_observations(time_period, observations, drop_zero_series=True):
+    # Extract the observation dictionary of every series based on its structure
+    series_keys = list(observations.keys())
+    series_observations = [
+        obs_value[0] if isinstance(obs_value, list) and len(obs_value) > 0
+        else obs_value.get('observations') if isinstance(obs_value, dict) and 'observations' in obs_value
+        else obs_value
+        for obs_value in observations.values()
+    ]
+
+    # Map the time indices through a lookup table instead of converting them one by one
+    counts = np.fromiter(map(len, series_observations), dtype=np.int64, count=len(series_observations))
+    period_lookup = {str(i): period['id'] for i, period in enumerate(time_period[0]['values'])}
+    years = list(map(period_lookup.__getitem__, chain.from_iterable(series_observations)))
+    raw_values = list(map(itemgetter(0), chain.from_iterable(obs.values() for obs in series_observations)))
+    values = np.array(raw_values, dtype=np.float64)
+
+    # Flag the series whose observations do not sum to zero
+    if not drop_zero_series:
+        keep = np.ones(len(series_keys), dtype=bool)
+    else:
+        series_index = np.repeat(np.arange(len(series_keys)), counts)
+        keep = np.bincount(series_index, weights=values, minlength=len(series_keys)) != 0
+
+    return series_keys, counts, years, raw_values, values, keep
+
+# Function to encode the value codes of one dimension as a categorical of the value names: the rows
+# hold small integer codes into the dimension's codelist instead of repeating the names; values that
+# share a name share a category (their ids are kept in the metadata sidecar, see structure_codelists),
+# and codes without a value in the structure are named by their number
+def encode_dimension(dim, codes):
+    names = [value['name'] for value in dim.get('values', [])]
+    names += [str(code) for code in range(len(names), int(codes.max(initial=-1)) + 1)]
+    name_codes, labels = pd.factorize(pd.Index(names))
+    return pd.Categorical.from_codes(name_codes[codes], categories=labels)
+
+# Function to list the codelist of every dimension of a structure ({dimension id: [{"id", "name"}, ...]}):
+# the categoricals only hold the value names, so the SDMX value ids are kept with the dataset's metadata
+def structure_codelists(dimensions):
+    return {dim['id']: [{"id": value['id'], "name": value['name']} for value in dim.get('values', [])]
+            for dim in dimensions}
+
+# Function to decode the kept series keys into one categorical column of dimension names per dimension
+def decode_dimensions(dimensions, series_keys, keep):
+    # Split all series keys at once into an integer code matrix (one column per key position)
+    n_parts = series_keys[0].count(':') + 1 if series_keys else len(dimensions)
+    key_codes = np.array(':'.join(series_keys).split(':') if series_keys else [], dtype=np.int64)
+    key_codes = key_codes.reshape(len(series_keys), n_parts)[keep]
+
+    return {dim['id']: encode_dimension(dim, key_codes[:, i]) for i, dim in enumerate(dimensions[:n_parts])}
+
+# Function to decode SDMX-JSON series into one row per series with its year -> value mapping
+def decode_series(dimensions, time_period, observations):
+    series_keys, counts, years, raw_values, values, keep = flatten_observations(time_period, observations)
+    dimension_columns = decode_dimensions(dimensions, series_keys, keep)
+
+    # Rebuild the year -> value mapping of every kept series from the flat arrays
+    flat_observations = zip(years, raw_values)
+    observation_values = [dict(islice(flat_observations, count)) for count in counts.tolist()]
+    dimension_columns['Observation Value'] = list(compress(observation_values, keep.tolist()))
+
+    return pd.DataFrame(dimension_columns)
+
+# Function to decode SDMX-JSON series into tidy long format: one row per observation with
+# the dimension names, the Year and the numeric Value
+def decode_observations(dimensions, time_period, observations, drop_zero_series=True):
+    series_keys, counts, years, raw_values, values, keep = flatten_observations(time_period, observations, drop_zero_series)
+    dimension_columns = decode_dimensions(dimensions, series_keys, keep)
+
+    # Repeat the dimension codes of each kept series once per observation
+    kept_counts = counts[keep]
+    observation_keep = np.repeat(keep, counts)
+    long_columns = {dim_id: names.repeat(kept_counts) for dim_id, names in dimension_columns.items()}
+
+    # Store annual periods as integers and keep other period ids (quarters, months) as text
+    years = np.array(years, dtype=object)[observation_keep]
+    long_columns['Year'] = years.astype(np.int64) if all(map(str.isdigit, years)) else years
+    long_columns['Value'] = values[observation_keep]
+
+    return pd.DataFrame(long_columns)
 
-def get_oecd_data(agency_identifier, dataflow_identifier):
+# Function to drop the series whose observations sum to zero from tidy long data, as the decoders do
+# for a single payload; used once partial payloads have been combined
+def remove_zero_series(df):
+    dimension_ids = [col for col in df.columns if col not in ['Year', 'Value']]
+    if df.empty or not dimension_ids:
+        return df
+    group_ids = df.groupby(dimension_ids, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    keep = np.bincount(group_ids, weights=df['Value'].to_numpy(dtype=np.float64)) != 0
+    return df[keep[group_ids]].reset_index(drop=True)
+
+# Function to find the dimensions, time periods and name in the structure section of a payload
+def extract_structure(structure):
+    # Try different paths to find the dimensions
+    dimensions = (
+        structure.get('dimensions', {}).get('observations') or
+        structure.get('series', {}).get('dimensions') or
+        structure.get('dimensions', {}).get('series') or
+        []
+    )
+    # Try different paths to find the time periods
+    time_period = (
+        structure.get('dimensions', {}).get('observation') or
+        []
+    )
+
+    # Flat payloads (observations keyed by every dimension) list all dimensions, the time period
+    # included, at the observation level
+    if not dimensions and len(time_period) > 1:
+        time_position = flat_time_position(time_period)
+        dimensions = time_period[:time_position] + time_period[time_position + 1:]
+        time_period = [time_period[time_position]]
+
+    # Try different paths to find the name
+    data_set_name = (
+        structure.get('name', {}) or
+        []
+    )
+    return dimensions, time_period, data_set_name
+
+def get_oecd_data(agency_identifier, dataflow_identifier, session=None, rate_limiter=None, base_url=None, long_format=False,
+                  partition_by=None, n_partitions=8, max_workers=4, data_format='json'):
+
+    # Large dataflows can be fetched as several smaller requests in parallel
+    if partition_by:
+        return get_partitioned_data(agency_identifier, dataflow_identifier, partition_by, n_partitions, max_workers,
+                                    session=session, rate_limiter=rate_limiter, base_url=base_url, long_format=long_format)
+
+    # SDMX-CSV is flat, so it is read straight into a DataFrame by the CSV parser
+    if data_format == 'csv':
+        return get_oecd_csv_data(agency_identifier, dataflow_identifier, session=session, rate_limiter=rate_limiter,
+                                 base_url=base_url, long_format=long_format)
    
     # Create the OECD API URL for the dataset
-    api_url = f"https://sdmx.oecd.org/public/rest/data/{agency_identifier},{dataflow_identifier}/all"
+    api_url = f"{base_url or data_url}/{agency_identifier},{dataflow_identifier}/all"
     
     # Set headers to request data in JSON format
     headers = {
-        "Accept": "application/vnd.sdmx.data+json; charset=utf-8; version=1.0"
+        "Accept": data_formats['json']
     }
 
-     # Send the request to the OECD API
-    response = requests.get(api_url, headers=headers)
+     # Send the request to the OECD API, backing off while the service is unavailable
+    response = get_with_backoff(api_url, headers=headers, session=session, rate_limiter=rate_limiter)
     
     # Check if the request was successful
     if response.status_code == 200:
         # Parse the JSON response
-        data = response.json()
+        with stage("json_decode", n_bytes=len(response.content)):
+            data = response.json()
+        return check_decoded(decode_payload(data, long_format=long_format), agency_identifier, dataflow_identifier)
+    else:
+        raise_for_failure(response)
+        logger.error("Error %s: %s", response.status_code, response.text)
+        return None, None
+
+# Function to pass on a decoded dataflow, raising RuntimeError when a payload the API did return
+# could not be decoded: (None, None) from the fetchers only means that the dataflow has no data
+# (404 NoResultsFound), which callers such as the harvest record as skipped rather than failed
+def check_decoded(decoded, agency_identifier, dataflow_identifier):
+    if decoded[0] is None:
+        raise RuntimeError(f"Unexpected payload structure for {agency_identifier},{dataflow_identifier}")
+    return decoded
+
+# Function to raise requests.HTTPError for a response that means the request failed (server errors,
+# exhausted retries, rejected requests), as opposed to a dataflow without data, which the API answers
+# with 404 NoResultsFound; callers such as the harvest can then retry the failed dataflows
+def raise_for_failure(response):
+    if response.status_code != 404:
+        response.raise_for_status()
+
+# Function to decode a parsed SDMX-JSON data payload into (DataFrame, dimensions, dataset name),
+# or (None, None) when the payload cannot be decoded
+def decode_payload(data, long_format=False, drop_zero_series=True):
+    # Find the dimensions, time periods and name of the dataset
+    dimensions, time_period, data_set_name = extract_structure(data.get('data', {}).get('structure', {}))
+
+    # Extract observations using a similar approach
+    observations = payload_observations(data)
+
+    # Handle unexpected structures
+    if not dimensions or not observations:
+        logger.error("Unexpected JSON structure in the response (set the log level to DEBUG to see it)")
+        logger.debug("Response: %s", json.dumps(data, indent=4))
+        return None, None
+    
+    try:
+        # Decode the series keys and observations into the DataFrame (tidy long format on request)
+        with stage("frame_build") as timer:
+            if long_format:
+                df = decode_observations(dimensions, time_period, observations, drop_zero_series)
+            else:
+                df = decode_series(dimensions, time_period, observations)
+            timer.rows = len(df)
+        df.attrs['codelists'] = structure_codelists(dimensions)
         
-        # Try different paths to find the dimensions
-        dimensions = (
-            data.get('data', {}).get('structure', {}).get('dimensions', {}).get('observations') or
-            data.get('data', {}).get('structure', {}).get('series', {}).get('dimensions') or
-            data.get('data', {}).get('structure', {}).get('dimensions', {}).get('series') or
-            []
-        )
-        # Try different paths to find the time periods
-        time_period = (
-            data.get('data', {}).get('structure', {}).get('dimensions', {}).get('observation') or
-            []
-        )
+        return df, dimensions, data_set_name
 
-        # Try different paths to find the name
-        data_set_name = (
-            data.get('data', {}).get('structure', {}).get('name', {}) or
-            []
-        )
+    except KeyError as e:
+        logger.error("KeyError: %s - Check the JSON structure for expected keys.", e)
+        return None, None
+    
 
-        # Extract observations using a similar approach
-        data_sets = (data.get('data', {}).get('dataSets') 
-                     or []
-                     )
-        observations = (
-            data_sets[0].get('observations') or
-            data_sets[0].get('series')
-            if data_sets else {}
-            )
-
-        # Handle unexpected structures
-        if not dimensions or not observations:
-            print("Unexpected JSON structure. Printing the response for inspection:")
-            print(json.dumps(data, indent=4))
-            return None, None
         
-        try:
-            # Create lists for each dimension based on 'keyPosition'
-            dimension_columns = {dim['id']: [] for dim in dimensions}
-            dimension_columns['Observation Value'] = []
-            
-            # Loop through the observations to split the keys and map them to dimension values
-            for obs_key, obs_value in observations.items():                
-                # Append the actual observation value
-                    # Extract the observation value based on its structure
-                if isinstance(obs_value, list) and len(obs_value) > 0:
-                    # If obs_value is a list, use the first element (common case)
-                    observation_value = obs_value[0]
-                elif isinstance(obs_value, dict) and 'observations' in obs_value:
-                    # If obs_value is a dictionary containing 'observations', extract the value
-                    observation_value = obs_value.get('observations')
-                else:
-                    # If none of the above, use obs_value directly (fallback)
-                    observation_value = obs_value
-
-                observation_values = {}
-                    
-                # Append the extracted observation value to the list
-                for i, obs in observation_value.items():
-                   
-                    # Extract the year from the time period using the index
-                    observation_year = time_period[0]['values'][int(i)]['id']
-                    
-                    # Store the observation value for the corresponding year
-                    observation_values[observation_year] = obs[0]
-
-                obs_zero_check_sum = 0
-                for i, obs_zero_check in observation_values.items():
-                    obs_zero_check_sum = obs_zero_check_sum + obs_zero_check
-                    
-                if not obs_zero_check_sum == 0:
-                    key_parts = obs_key.split(':')
-                    # Map each part to the corresponding dimension
-                    for i, part in enumerate(key_parts):
-                        if i < len(dimensions):
-                            dimension_id = dimensions[i]['id']
-                            # Dynamically extract dimension value names or codes
-                            value_info = dimensions[i].get('values', [])
-                            dimension_value = value_info[int(part)]['name'] if value_info and int(part) < len(value_info) else part
-                            dimension_columns[dimension_id].append(dimension_value)
-                    # Append a copy of observation_values to the list
-                    dimension_columns['Observation Value'].append(observation_values.copy())
-           
-            # Construct the DataFrame
-            df = pd.DataFrame(dimension_columns)
-            
-            return df, dimensions, data_set_name
-
-        except KeyError as e:
-            print(f"KeyError: {e} - Check the JSON structure for expected keys.")
-            return None, None
+# Function to fetch a dataflow as SDMX-CSV and parse the response while it is read; the frame's
+# attrs['payload_bytes'] holds the size of the body
+def get_oecd_csv_data(agency_identifier, dataflow_identifier, session=None, rate_limiter=None, base_url=None, long_format=False):
+    api_url = f"{base_url or data_url}/{agency_identifier},{dataflow_identifier}/all"
+    headers = {
+        "Accept": data_formats['csv']
+    }
+    response = get_with_backoff(api_url, headers=headers, session=session, rate_limiter=rate_limiter, stream=True)
+    if response.status_code != 200:
+        raise_for_failure(response)
+        logger.error("Error %s: %s", response.status_code, response.text)
+        return None, None
+
+    with response, stage("csv_decode") as timer:
+        # Let urllib3 undo any Content-Encoding while the CSV parser reads the raw stream, and keep
+        # the stream open at its end, where the parser reads once more
+        if hasattr(response.raw, 'decode_content'):
+            response.raw.decode_content = True
+            response.raw.auto_close = False
+        stream = ByteCounter(response.raw)
+        decoded = check_decoded(decode_csv(io.BufferedReader(stream), dataflow_identifier, long_format=long_format),
+                                agency_identifier, dataflow_identifier)
+        timer.rows = len(decoded[0])
+        timer.n_bytes = stream.bytes
+        # The body is never held whole, so its size travels with the frame for the harvest's throughput
+        decoded[0].attrs['payload_bytes'] = stream.bytes
+        return decoded
+
+# Binary stream counting the bytes read from another stream, such as a streamed response body
+class ByteCounter(io.RawIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self.bytes += len(data)
+        return len(data)
+
+# Function to read an SDMX-CSV stream (labels=both: "id: name" headers and values) into tidy long format
+# with categorical dimension columns holding the value names, as the JSON decoders produce them;
+# returns (DataFrame, dimensions, dataset name) or (None, None)
+def decode_csv(stream, dataflow_identifier=None, long_format=True):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    header = next(csv.reader([text.readline()]), [])
+    column_ids = [column.split(': ', 1)[0] for column in header]
+    if 'TIME_PERIOD' not in column_ids or 'OBS_VALUE' not in column_ids:
+        logger.error("Unexpected SDMX-CSV header: %s", header)
+        return None, None
+
+    # The dimensions sit between the dataflow columns and TIME_PERIOD; attributes after OBS_VALUE are skipped
+    first_dimension = next(i for i, column_id in enumerate(column_ids) if column_id not in csv_structure_columns)
+    dimension_positions = range(first_dimension, column_ids.index('TIME_PERIOD'))
+    structure_ids = column_ids[:first_dimension]
+    dtypes = {column_ids[i]: 'category' for i in list(range(first_dimension)) + list(dimension_positions)}
+    dtypes.update({'TIME_PERIOD': 'category', 'OBS_VALUE': np.float64})
+    df = pd.read_csv(text, header=None, names=column_ids, usecols=list(dtypes), dtype=dtypes,
+                     keep_default_na=False, na_values={'OBS_VALUE': ['', 'NaN', 'nan']})
+
+    # Map each dimension's "code: name" values to their names through the categories only
+    long_columns = {}
+    dimensions = []
+    for i in dimension_positions:
+        column = df[column_ids[i]]
+        values = [category.split(': ', 1) for category in column.cat.categories.astype(str)]
+        label_codes, labels = pd.factorize(pd.Index([value[-1] for value in values]))
+        codes = column.cat.codes.to_numpy()
+        long_columns[column_ids[i]] = pd.Categorical.from_codes(np.where(codes >= 0, label_codes[codes], -1), categories=labels)
+        dimensions.append({
+            "id": column_ids[i],
+            "name": header[i].split(': ', 1)[-1],
+            "values": [{"id": value[0], "name": value[-1]} for value in values],
+        })
+
+    # Store annual periods as integers and keep other period ids (quarters, months) as text
+    periods = df['TIME_PERIOD'].cat.categories.astype(str)
+    period_codes = df['TIME_PERIOD'].cat.codes.to_numpy()
+    if all(map(str.isdigit, periods)):
+        long_columns['Year'] = periods.astype(np.int64).to_numpy()[period_codes]
     else:
-        print(f"Error {response.status_code}: {response.text}")
+        long_columns['Year'] = periods.to_numpy(dtype=object)[period_codes]
+    long_columns['Value'] = df['OBS_VALUE'].to_numpy()
+
+    # The dataset name comes with the dataflow column (labels=both), falling back to the dataflow id
+    data_set_name = dataflow_identifier
+    for column_id in ['STRUCTURE_NAME', 'DATAFLOW', 'STRUCTURE_ID']:
+        if column_id in structure_ids and len(df[column_id].cat.categories):
+            data_set_name = str(df[column_id].cat.categories[0]).split(': ', 1)[-1]
+            break
+
+    long_df = remove_zero_series(pd.DataFrame(long_columns))
+    for dim in dimensions:
+        long_df[dim['id']] = long_df[dim['id']].cat.remove_unused_categories()
+    if not long_format:
+        long_df = to_legacy_frame(long_df)
+    long_df.attrs['codelists'] = structure_codelists(dimensions)
+    return long_df, dimensions, data_set_name
+
+# Function to find the series of the first data set of a payload; the observations of a flat
+# payload are regrouped into series first
+def payload_observations(data):
+    data_sets = (data.get('data', {}).get('dataSets') 
+                 or []
+                 )
+    if data_sets and data_sets[0].get('observations'):
+        observation_dimensions = data['data'].get('structure', {}).get('dimensions', {}).get('observation') or []
+        return series_from_flat_observations(data_sets[0]['observations'], flat_time_position(observation_dimensions))
+    return (
+        data_sets[0].get('series')
+        if data_sets else {}
+        )
+
+# Function to find the position of the time period among the observation dimensions of a flat payload
+def flat_time_position(observation_dimensions):
+    return next((i for i, dim in enumerate(observation_dimensions) if dim.get('id') == 'TIME_PERIOD'),
+                len(observation_dimensions) - 1)
+
+# Function to regroup flat observations ({"0:1:0:5": [value, ...]}, keyed by every dimension) into
+# series keyed by the other dimensions, with their observations keyed by the time period index
+def series_from_flat_observations(observations, time_position):
+    series = {}
+    for key, observation in observations.items():
+        codes = key.split(':')
+        period = codes.pop(time_position)
+        series.setdefault(':'.join(codes), {})[period] = observation
+    return series
+
+# Function to read the structure of a dataflow (its dimensions with their values, the time periods
+# and the name) from a request for the series keys only, without the observations
+def probe_structure(agency_identifier, dataflow_identifier, session=None, rate_limiter=None, base_url=None):
+    api_url = f"{base_url or data_url}/{agency_identifier},{dataflow_identifier}/all"
+    headers = {
+        "Accept": data_formats['json']
+    }
+    response = get_with_backoff(api_url, headers=headers, session=session, rate_limiter=rate_limiter,
+                                params={"detail": "serieskeysonly"})
+    if response.status_code != 200:
+        raise_for_failure(response)
+        logger.error("Error %s: %s", response.status_code, response.text)
+        return None
+    return extract_structure(response.json().get('data', {}).get('structure', {}))
+
+# Function to split a dataflow into at most n_partitions requests, as (key, query parameters) pairs:
+# contiguous time windows with startPeriod/endPeriod, or groups of values of the leading dimension
+def partition_requests(dimensions, time_period, partition_by='time', n_partitions=8):
+    if partition_by == 'dimension':
+        values = [value['id'] for value in dimensions[0].get('values', [])]
+        if not values:
+            return [('all', None)]
+        other_dimensions = '.' * (len(dimensions) - 1)
+        return [('+'.join(group) + other_dimensions, None)
+                for group in np.array_split(np.array(values, dtype=object), min(n_partitions, len(values)))]
+    if partition_by == 'time':
+        periods = sorted(period['id'] for period in time_period[0].get('values', [])) if time_period else []
+        if not periods:
+            return [('all', None)]
+        return [('all', {"startPeriod": window[0], "endPeriod": window[-1]})
+                for window in np.array_split(np.array(periods, dtype=object), min(n_partitions, len(periods)))]
+    raise ValueError(f"Unknown partitioning {partition_by!r}, expected 'time' or 'dimension'")
+
+# Function to fetch one partition, retrying it on its own when it fails; returns the parsed payload,
+# or None when the partition holds no observations
+def fetch_partition(api_url, params, session=None, rate_limiter=None, retries=3):
+    headers = {
+        "Accept": data_formats['json']
+    }
+    error = None
+    for attempt in range(retries + 1):
+        try:
+            response = get_with_backoff(api_url, headers=headers, session=session, rate_limiter=rate_limiter, params=params)
+            if response.status_code == 200:
+                with stage("json_decode", n_bytes=len(response.content)):
+                    return response.json()
+            if response.status_code == 404 and "NoResultsFound" in response.text:
+                return None
+            error = f"Error {response.status_code}: {response.text[:200]}"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error = e
+        if attempt < retries:
+            wait_time = 2 ** attempt
+            logger.warning("Partition %s %s failed (%s). Retrying in %s seconds...", api_url, params or '', error, wait_time)
+            time.sleep(wait_time)
+    raise RuntimeError(f"Partition {api_url} {params or ''} failed after {retries + 1} attempts: {error}")
+
+# Function to fetch a dataflow as partitions in parallel and merge them into the same DataFrame a
+# single request returns (rows may come in a different order)
+def get_partitioned_data(agency_identifier, dataflow_identifier, partition_by='time', n_partitions=8, max_workers=4,
+                         session=None, rate_limiter=None, base_url=None, long_format=False, retries=3):
+    structure = probe_structure(agency_identifier, dataflow_identifier, session=session, rate_limiter=rate_limiter,
+                                base_url=base_url)
+    if structure is None:
         return None, None
-    
+    dimensions, time_period, data_set_name = structure
+
+    # A partition that still fails after its retries fails the whole dataflow (RuntimeError)
+    partitions = partition_requests(dimensions, time_period, partition_by, n_partitions)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        payloads = list(executor.map(
+            lambda partition: fetch_partition(f"{base_url or data_url}/{agency_identifier},{dataflow_identifier}/{partition[0]}",
+                                              partition[1], session=session, rate_limiter=rate_limiter, retries=retries),
+            partitions))
+
+    # Each partition is decoded against its own structure, so the dimension names stay consistent
+    # even when a response only lists the values it contains; series whose observations sum to zero
+    # are dropped once all partitions are combined, since a series can span several time windows
+    frames = []
+    for payload in payloads:
+        if payload is None or not payload_observations(payload):
+            continue
+        decoded = check_decoded(decode_payload(payload, long_format=True, drop_zero_series=False),
+                                agency_identifier, dataflow_identifier)
+        frames.append(decoded[0])
+    if not frames:
+        logger.warning("No observations found for %s,%s", agency_identifier, dataflow_identifier)
+        return None, None
+
+    df = remove_zero_series(concat_datasets(frames))
+    if not long_format:
+        df = to_legacy_frame(df)
+    df.attrs['codelists'] = merge_codelists(*[frame.attrs.get('codelists') for frame in frames])
+    return df, dimensions, data_set_name
+
+# Function to stream a dataflow into a sink in fixed-size batches of series, so that peak
+# memory depends on the batch size rather than on the size of the dataset
+def stream_oecd_data(agency_identifier, dataflow_identifier, make_sink, batch_size=10000, session=None,
+                     rate_limiter=None, base_url=None, chunk_size=1024 * 1024, track_memory=False, long_format=False):
+    import ijson
+
+    api_url = f"{base_url or data_url}/{agency_identifier},{dataflow_identifier}/all"
+    headers = {
+        "Accept": data_formats['json']
+    }
+    if track_memory:
+        tracemalloc.start()
+
+    try:
+        response = get_with_backoff(api_url, headers=headers, session=session, rate_limiter=rate_limiter, stream=True)
+        if response.status_code != 200:
+            raise_for_failure(response)
+            logger.error("Error %s: %s", response.status_code, response.text)
+            return None
+
+        stats = {"bytes": 0, "series": 0, "rows": 0, "batches": 0}
+        with response, tempfile.TemporaryFile() as spool:
+            # Spool the body to disk chunk by chunk, since the structure may come after the data sets
+            with stage("http_download") as timer:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    spool.write(chunk)
+                    stats["bytes"] += len(chunk)
+                timer.n_bytes = stats["bytes"]
+
+            # First pass: read only the structure section
+            spool.seek(0)
+            structure = next(ijson.items(spool, 'data.structure', use_float=True), {})
+            dimensions, time_period, data_set_name = extract_structure(structure)
+            if not dimensions or not time_period:
+                raise RuntimeError(f"Unexpected JSON structure in {agency_identifier},{dataflow_identifier}: no dimensions found")
+
+            # Second pass: decode the series in batches and hand each batch to the sink; a payload
+            # without series is read again in the flat observations layout
+            spool.seek(0)
+            sink = make_sink(data_set_name)
+            decode = decode_observations if long_format else decode_series
+            try:
+                for batch in stream_series(ijson.kvitems(spool, 'data.dataSets.item.series', use_float=True), batch_size):
+                    write_batch(sink, decode, dimensions, time_period, batch, stats)
+                if not stats["series"]:
+                    spool.seek(0)
+                    time_position = flat_time_position(structure.get('dimensions', {}).get('observation') or [])
+                    observations = ijson.kvitems(spool, 'data.dataSets.item.observations', use_float=True)
+                    for batch in stream_flat_series(observations, time_position, batch_size):
+                        write_batch(sink, decode, dimensions, time_period, batch, stats)
+            except BaseException:
+                # Drop the partly written output instead of leaving it under the final name
+                sink.abort()
+                raise
+            if not stats["series"]:
+                # Nothing was written: report the dataflow as not saved rather than as complete
+                sink.abort()
+                logger.warning("No observations found for %s,%s", agency_identifier, dataflow_identifier)
+                return None
+            sink.close()
+
+        stats["name"] = data_set_name
+        if track_memory:
+            stats["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        logger.info("Streamed %s series (%.1f MB) from %s,%s in %s batches%s", stats['series'], stats['bytes'] / 1e6,
+                    agency_identifier, dataflow_identifier, stats['batches'],
+                    "; peak traced memory %.1f MB" % (stats['peak_memory'] / 1e6) if track_memory else "")
+        return stats
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+
+# Function to group streamed (series key, series) pairs into batches of batch_size series
+def stream_series(items, batch_size):
+    batch = {}
+    for series_key, series in items:
+        batch[series_key] = series
+        if len(batch) >= batch_size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+# Function to regroup streamed flat observations (keyed by every dimension) into batches of series, as
+# series_from_flat_observations does; a batch is closed only between series, so a series whose
+# observations are contiguous in the payload, as the API writes them, is never split across batches
+def stream_flat_series(items, time_position, batch_size):
+    batch = {}
+    for key, observation in items:
+        codes = key.split(':')
+        period = codes.pop(time_position)
+        series_key = ':'.join(codes)
+        if series_key not in batch and len(batch) >= batch_size:
+            yield batch
+            batch = {}
+        batch.setdefault(series_key, {})[period] = observation
+    if batch:
+        yield batch
 
-        
\ No newline at end of file
+# Function to decode one batch of series, write it to the sink and update the streaming counters
+def write_batch(sink, decode, dimensions, time_period, batch, stats):
+    with stage("frame_build") as timer:
+        df = decode(dimensions, time_period, batch)
+        timer.rows = len(df)
+    df.attrs['codelists'] = structure_codelists(dimensions)
+    sink.write(df)
+    stats["series"] += len(batch)
+    stats["rows"] += len(df)
+    stats["batches"] += 1
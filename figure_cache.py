@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+from dataset_cache import CoalescingCache, dataset_nbytes
+from instrumentation import increment
+
+# Function to get the version of a dataset file the cached results were computed from
+def file_version(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Function to reduce the dimension selections to a canonical form: dimensions without selected
+# values are dropped, and the values are compared as text in sorted order
+def canonical_selections(selections):
+    return {dim_id: sorted({str(v).strip() for v in values}) for dim_id, values in (selections or {}).items() if values}
+
+# Function to hash the control state of a view into a cache key, the same for every equivalent state
+def control_key(file_path, version, selections, year_range, **controls):
+    state = {
+        "file": os.path.abspath(file_path),
+        "version": version,
+        "selections": canonical_selections(selections),
+        "year_range": [int(year) for year in year_range] if year_range else None,
+        **controls,
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+# In-process LRU cache of results computed from a dataset file, such as filtered frames and
+# serialized figures, bounded in bytes. Entries are keyed by a control_key and remember the file
+# and version they were computed from: when a file changes on disk, the entries of its older
+# versions are dropped on the next lookup
+class ResultCache(CoalescingCache):
+    def __init__(self, name, max_bytes=256 * 1024 * 1024, size_of=dataset_nbytes):
+        super().__init__(max_bytes, size_of)
+        self.name = name
+        self.versions = {}  # file path -> version of its cached entries
+
+    def get(self, file_path, version, key, compute):
+        return self.lookup(file_path, version, key, compute)
+
+    # Drop the entries computed from older versions of the file (called with the lock held)
+    def validate(self, file_path, version, key):
+        if self.versions.get(file_path, version) != version:
+            for stale_key in [stale_key for stale_key, entry in self.entries.items() if entry[0] == file_path]:
+                self.remove(stale_key)
+                self.invalidations += 1
+        self.versions[file_path] = version
+
+    def is_current(self, file_path, version):
+        return self.versions.get(file_path) == version
+
+    def record(self, outcome):
+        increment(f"{self.name}_{outcome}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        stats = super().stats()
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
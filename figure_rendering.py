@@ -0,0 +1,194 @@
+import os
+import numpy as np
+
+# Maximum number of points sent to the browser per figure (0 disables the reduction)
+point_budget = int(os.environ.get('OECD_DASHBOARD_POINT_BUDGET', '20000'))
+
+# Number of points above which line and scatter traces are drawn with WebGL
+webgl_threshold = int(os.environ.get('OECD_DASHBOARD_WEBGL_THRESHOLD', '5000'))
+
+# Function to pick the indices of n_out points that keep the visual shape of a line, using
+# Largest-Triangle-Three-Buckets; x must be sorted. Every bucket is solved at once instead of one
+# after the other: a first pass takes the average of the previous bucket as the kept point the
+# triangles start from, and a second pass starts them from the points the first pass kept
+def lttb_indices(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # The first and last points are kept; the others are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    # Average point of every bucket (and of the last point), the third corner of the triangles of
+    # the bucket before it
+    counts = np.diff(np.append(edges, n))
+    avg_x = np.add.reduceat(x, edges) / counts
+    avg_y = np.add.reduceat(y, edges) / counts
+    bucket = np.repeat(np.arange(n_out - 2), counts[:-1])
+    inner_x, inner_y = x[1:n - 1], y[1:n - 1]
+    next_x, next_y = avg_x[1:][bucket], avg_y[1:][bucket]
+
+    # Function to keep, in every bucket, the point forming the largest triangle with the bucket's
+    # starting point and the average of the next bucket
+    def largest_triangles(start_x, start_y):
+        a_x, a_y = start_x[bucket], start_y[bucket]
+        area = np.abs((a_x - next_x) * (inner_y - a_y) - (a_x - inner_x) * (next_y - a_y))
+        area = np.nan_to_num(area, nan=-1.0)
+        largest = np.flatnonzero(area == np.maximum.reduceat(area, edges[:-1] - 1)[bucket])
+        first = np.unique(bucket[largest], return_index=True)[1]
+        return largest[first] + 1
+
+    kept = largest_triangles(np.append(x[0], avg_x[:n_out - 3]), np.append(y[0], avg_y[:n_out - 3]))
+    indices[1:-1] = largest_triangles(np.append(x[0], x[kept[:-1]]), np.append(y[0], y[kept[:-1]]))
+    return indices
+
+# Function to iterate over the row positions of each color group (one group without a color dimension)
+def group_positions(df, color_dimension):
+    if not color_dimension:
+        return [np.arange(len(df))]
+    return list(df.groupby(color_dimension, sort=False, observed=True, dropna=False).indices.values())
+
+# Function to shrink the data of a figure to the point budget: LTTB per color group for line charts,
+# sums per Year and color for bar charts (what stacked bars show), and even sampling per color
+# group for scatter plots; returns the data to plot and a description of the reduction
+def reduce_points(df, chart_type, color_dimension, budget=None):
+    budget = point_budget if budget is None else budget
+    if not budget or len(df) <= budget:
+        return df, None
+
+    if chart_type == 'bar':
+        keys = ['Year'] + ([color_dimension] if color_dimension else [])
+        reduced = df.groupby(keys, sort=False, observed=True, dropna=False)['Value'].sum(min_count=1).reset_index()
+        return reduced, f"bars summed per Year{' and ' + color_dimension if color_dimension else ''}"
+
+    if chart_type == 'line':
+        df = df.dropna(subset=['Value']).sort_values('Year', kind='stable')
+    kept = []
+    for positions in group_positions(df, color_dimension):
+        share = max(3, int(budget * len(positions) / len(df)))
+        if len(positions) <= share:
+            kept.append(positions)
+        elif chart_type == 'line':
+            kept.append(positions[lttb_indices(df['Year'].to_numpy()[positions], df['Value'].to_numpy()[positions], share)])
+        else:
+            kept.append(positions[np.linspace(0, len(positions) - 1, share).astype(np.int64)])
+    kept = np.sort(np.concatenate(kept))
+    method = "LTTB downsampling per group" if chart_type == 'line' else "even sampling per group"
+    return df.take(kept), method
+
+# Function to fit a least-squares line of Value on Year to every color group at once from per-group
+# sums of the centered values, instead of one statsmodels fit per group; returns the group labels and
+# per group the Year range, slope, intercept, R² and number of points (NaN slopes for single years)
+def ols_trendlines(df, color_dimension):
+    df = df.dropna(subset=['Year', 'Value'])
+    x = df['Year'].to_numpy(dtype=np.float64)
+    y = df['Value'].to_numpy(dtype=np.float64)
+    if color_dimension:
+        codes, labels = df[color_dimension].factorize()
+        labels = [str(label) for label in labels]
+        x, y, codes = x[codes >= 0], y[codes >= 0], codes[codes >= 0]
+    else:
+        codes, labels = np.zeros(len(df), dtype=np.int64), [None]
+
+    n_groups = len(labels)
+    counts = np.bincount(codes, minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(codes, weights=x, minlength=n_groups) / counts
+        mean_y = np.bincount(codes, weights=y, minlength=n_groups) / counts
+        dx, dy = x - mean_x[codes], y - mean_y[codes]
+        sxx = np.bincount(codes, weights=dx * dx, minlength=n_groups)
+        sxy = np.bincount(codes, weights=dx * dy, minlength=n_groups)
+        syy = np.bincount(codes, weights=dy * dy, minlength=n_groups)
+        slope = np.where(sxx > 0, sxy / sxx, np.nan)
+        intercept = mean_y - slope * mean_x
+        r_squared = np.where(syy > 0, sxy * sxy / (sxx * syy), 1.0)
+
+    x_min = np.full(n_groups, np.inf)
+    x_max = np.full(n_groups, -np.inf)
+    np.minimum.at(x_min, codes, x)
+    np.maximum.at(x_max, codes, x)
+    return labels, x_min, x_max, slope, intercept, r_squared, counts
+
+# Function to add the least-squares line of every color group to a scatter figure, in the color and
+# legend group of the group's markers
+def add_trendlines(fig, df, color_dimension):
+    import plotly.graph_objects as go
+
+    labels, x_min, x_max, slope, intercept, r_squared, counts = ols_trendlines(df, color_dimension)
+    traces = {trace.name: trace for trace in fig.data} if color_dimension else {None: fig.data[0]}
+    for i, label in enumerate(labels):
+        trace = traces.get(label)
+        if trace is None or np.isnan(slope[i]):
+            continue
+        fig.add_trace(go.Scatter(
+            x=[x_min[i], x_max[i]], y=[intercept[i] + slope[i] * x_min[i], intercept[i] + slope[i] * x_max[i]],
+            mode='lines', line=dict(color=trace.marker.color), name=label, legendgroup=trace.legendgroup,
+            showlegend=False, hovertemplate=(f"<b>OLS trendline</b><br>Value = {slope[i]:.4g} * Year + {intercept[i]:.4g}"
+                                             f"<br>R<sup>2</sup>={r_squared[i]:.4f} ({counts[i]:,} points)<extra></extra>"),
+        ))
+
+# Function to build the dashboard figure for the filtered data, reduced to the point budget; 'ols'
+# trendlines are fitted to all the filtered points, not only to the points that are drawn. Data
+# sampled while it was read from disk carries its number of rows before sampling in attrs['matched_rows']
+def build_figure(df, chart_type, color_dimension, trendline, plot_title, yaxis_title, budget=None):
+    import plotly.express as px
+
+    n_points = df.attrs.get('matched_rows', len(df))
+    fit_df = df
+    df, reduction = reduce_points(df, chart_type, color_dimension, budget)
+    if n_points > len(fit_df):
+        reduction = "rows sampled evenly on disk" + (f", then {reduction}" if reduction else "")
+    render_mode = 'webgl' if len(df) > webgl_threshold else 'auto'
+
+    annotations = []
+    # Title
+    annotations.append(dict(xref='paper', yref='paper', x=0.5, y=1.05,
+                              xanchor='center', yanchor='bottom',
+                              text=f"{plot_title}",
+                              font=dict(family='Bebas Neue',
+                                        size=30,
+                                        color='rgb(0,0,0)'),
+                              showarrow=False))
+    # Note how much the data was reduced
+    if reduction:
+        annotations.append(dict(xref='paper', yref='paper', x=1, y=1.0,
+                                xanchor='right', yanchor='bottom',
+                                text=f"Showing {len(df):,} of {n_points:,} points ({reduction})",
+                                font=dict(family='Quicksand', size=12, color='rgb(110,110,110)'),
+                                showarrow=False))
+
+    # Create the chart
+    if chart_type == 'scatter':
+        fig = px.scatter(
+            df, x='Year', y='Value', color=color_dimension,
+            trendline=None if trendline == 'ols' else trendline, render_mode=render_mode,
+        )
+    elif chart_type == 'line':
+        fig = px.line(
+            df, x='Year', y='Value', color=color_dimension, markers = True, render_mode=render_mode,
+        )
+    elif chart_type == 'bar':
+        fig = px.bar(
+            df, x='Year', y='Value', color=color_dimension,
+        )
+    else:
+        fig = px.scatter(
+            df, x='Year', y='Value', color=color_dimension,
+            trendline=None if trendline == 'ols' else trendline, render_mode=render_mode,
+        )
+    if trendline == 'ols' and chart_type not in ('line', 'bar') and np.issubdtype(fit_df['Year'].dtype, np.number):
+        add_trendlines(fig, fit_df, color_dimension)
+
+    fig.update_layout(
+        xaxis_title="Year",
+        yaxis_title=yaxis_title,
+        legend_title=color_dimension,
+        template='plotly_white',
+        annotations=annotations
+    )
+
+    return fig
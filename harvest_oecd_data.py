@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+from fetch_oecd_data import get_oecd_data, stream_oecd_data
+from instrumentation import get_logger, increment
+from oecd_http import create_session, HostRateLimiter
+
+logger = get_logger(__name__)
+
+# Function to fetch a single dataflow in tidy long format (optionally as parallel partitions) and hand
+# it to save_dataset, or stream it into a sink from make_sink; returns the number of streamed bytes,
+# or None when nothing was saved
+def harvest_dataflow(dataflow, save_dataset, session=None, rate_limiter=None, base_url=None, make_sink=None, batch_size=10000,
+                     partition_by=None, n_partitions=8, data_format='json'):
+    if make_sink is not None:
+        stream_stats = stream_oecd_data(dataflow['agency_identifier'], dataflow['dataflow_identifier'],
+                                        partial(make_sink, dataflow=dataflow),
+                                        batch_size=batch_size, session=session, rate_limiter=rate_limiter, base_url=base_url,
+                                        long_format=True)
+        return stream_stats["bytes"] if stream_stats is not None else None
+
+    oecd_data = get_oecd_data(dataflow['agency_identifier'], dataflow['dataflow_identifier'],
+                              session=session, rate_limiter=rate_limiter, base_url=base_url, long_format=True,
+                              partition_by=partition_by, n_partitions=n_partitions, max_workers=n_partitions,
+                              data_format=data_format)
+    if oecd_data[0] is None:
+        return None
+
+    df, dimensions, df_name = oecd_data
+    save_dataset(df, df_name, dataflow=dataflow)
+    # Streamed SDMX-CSV bodies are counted while they are parsed; other responses by the session hook
+    return df.attrs.get('payload_bytes', 0)
+
+# Name of the checkpoint that records the progress of a harvest in the datasets folder
+checkpoint_name = "harvest_checkpoint.json"
+
+# Function to read a harvest checkpoint (an empty one when there is none yet)
+def load_checkpoint(checkpoint_path):
+    checkpoint = {}
+    try:
+        with open(checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        pass
+    for status in ("completed", "skipped", "failed"):
+        checkpoint.setdefault(status, {})
+    return checkpoint
+
+# Function to write a harvest checkpoint (atomically, so that a crash never leaves it half-written)
+def save_checkpoint(checkpoint_path, checkpoint):
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(temp_path, checkpoint_path)
+
+# Function to identify a dataflow in the checkpoint
+def dataflow_key(dataflow):
+    return f"{dataflow['agency_identifier']},{dataflow['dataflow_identifier']}"
+
+# Function to pick the dataflows a harvest still has to do: dataflows completed or skipped (no data)
+# in the same version are left out, and the ones that failed before are queued after the new ones
+def pending_dataflows(dataflows, checkpoint):
+    pending, retry = [], []
+    for dataflow in dataflows:
+        key = dataflow_key(dataflow)
+        done = checkpoint["completed"].get(key) or checkpoint["skipped"].get(key)
+        if done is not None and done.get("version") == dataflow['dataflow_version']:
+            continue
+        (retry if key in checkpoint["failed"] else pending).append(dataflow)
+    return pending + retry
+
+# Function to record the outcome of one dataflow in the checkpoint
+def record_outcome(checkpoint, dataflow, status, error=None):
+    key = dataflow_key(dataflow)
+    entry = {"version": dataflow['dataflow_version'],
+             "finished_at": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+    if status == "failed":
+        entry["error"] = f"{type(error).__name__}: {error}"
+        entry["attempts"] = checkpoint["failed"].get(key, {}).get("attempts", 0) + 1
+    for other in ("completed", "skipped", "failed"):
+        checkpoint[other].pop(key, None)
+    checkpoint[status][key] = entry
+
+# Function to harvest many dataflows concurrently over one pooled session. With a checkpoint_path the
+# outcome of every dataflow is recorded as it finishes, so that an interrupted harvest resumes where it
+# stopped; dataflows that fail are retried up to retries more times at the end of the run
+def harvest_dataflows(dataflows, save_dataset, max_workers=8, requests_per_second=None, base_url=None, session=None,
+                      make_sink=None, batch_size=10000, partition_by=None, n_partitions=8, data_format='json',
+                      checkpoint_path=None, retries=0):
+    if make_sink is not None and (data_format != 'json' or partition_by):
+        raise ValueError("Streaming into make_sink reads one SDMX-JSON response per dataflow; "
+                         "it cannot be combined with data_format='csv' or partition_by")
+    session = session or create_session(pool_size=max_workers * (n_partitions if partition_by else 1))
+    rate_limiter = HostRateLimiter(requests_per_second)
+    checkpoint = load_checkpoint(checkpoint_path) if checkpoint_path else {"completed": {}, "skipped": {}, "failed": {}}
+    pending = pending_dataflows(dataflows, checkpoint)
+    stats = {"dataflows": len(dataflows), "resumed": len(dataflows) - len(pending), "saved": 0, "empty": 0, "failed": 0,
+             "retried": 0, "bytes": 0}
+    lock = threading.Lock()
+    if stats["resumed"]:
+        logger.info("Resuming from %s: %d dataflows already done, %d to go", checkpoint_path, stats['resumed'], len(pending))
+
+    # Count the payload bytes of every response that goes through the shared session
+    # (streamed responses are counted while they are read, by stream_oecd_data and get_oecd_csv_data)
+    def count_bytes(response, *args, **kwargs):
+        if kwargs.get("stream"):
+            return
+        with lock:
+            stats["bytes"] += len(response.content)
+
+    session.hooks["response"].append(count_bytes)
+    start_time = time.perf_counter()
+    try:
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            if attempt:
+                stats["retried"] += len(pending)
+                stats["failed"] -= len(pending)
+                logger.info("Retrying %d failed dataflows (attempt %d of %d)", len(pending), attempt + 1, retries + 1)
+            failed = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(harvest_dataflow, dataflow, save_dataset, session, rate_limiter, base_url,
+                                    make_sink, batch_size, partition_by, n_partitions, data_format): dataflow
+                    for dataflow in pending
+                }
+                try:
+                    for future in tqdm(as_completed(futures), total=len(futures), desc="Harvesting", unit="dataflows"):
+                        dataflow = futures[future]
+                        try:
+                            streamed_bytes = future.result()
+                            stats["saved" if streamed_bytes is not None else "empty"] += 1
+                            with lock:
+                                stats["bytes"] += streamed_bytes or 0
+                            record_outcome(checkpoint, dataflow, "completed" if streamed_bytes is not None else "skipped")
+                            increment("dataflows_saved" if streamed_bytes is not None else "dataflows_empty")
+                        except Exception as e:
+                            stats["failed"] += 1
+                            failed.append(dataflow)
+                            record_outcome(checkpoint, dataflow, "failed", e)
+                            increment("dataflows_failed")
+                            logger.error("Error harvesting %s: %s", dataflow_key(dataflow), e)
+                        if checkpoint_path:
+                            save_checkpoint(checkpoint_path, checkpoint)
+                except KeyboardInterrupt:
+                    # Drop the queued dataflows; the ones already running finish (or abort) their partial files
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    if checkpoint_path:
+                        logger.warning("Interrupted: progress saved in %s, run again to resume", checkpoint_path)
+                    raise
+            pending = failed
+    finally:
+        session.hooks["response"].remove(count_bytes)
+
+    stats["seconds"] = time.perf_counter() - start_time
+    stats["dataflows_per_second"] = (stats["dataflows"] - stats["resumed"]) / stats["seconds"] if stats["seconds"] else 0.0
+    stats["bytes_per_second"] = stats["bytes"] / stats["seconds"] if stats["seconds"] else 0.0
+    logger.info("Harvested %s dataflows in %.1fs (%.2f dataflows/s, %.2f MB/s); saved %s, empty %s, failed %s%s",
+                stats['dataflows'] - stats['resumed'], stats['seconds'], stats['dataflows_per_second'],
+                stats['bytes_per_second'] / 1e6, stats['saved'], stats['empty'], stats['failed'],
+                ", %s already done" % stats['resumed'] if stats["resumed"] else "")
+    return stats
@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Set OECD_DASHBOARD_METRICS=0 to switch the instrumentation off; stages then cost one function call
+enabled = os.environ.get('OECD_DASHBOARD_METRICS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+# Number of recent durations kept per stage to compute the percentiles from
+sample_size = int(os.environ.get('OECD_DASHBOARD_METRICS_SAMPLES', '2048'))
+
+# Percentiles reported for every stage
+quantiles = [0.5, 0.9, 0.99]
+
+# Prefix of the exported metric names and root of the loggers of every module
+metric_prefix = "oecd_dashboard"
+
+# Function to get the logger of a module, below the shared oecd_dashboard logger
+def get_logger(name):
+    return logging.getLogger(f"{metric_prefix}.{name}")
+
+logger = get_logger(__name__)
+
+# Function to send the log records of every module to stderr as timestamped key=value lines
+# (called by the scripts; the modules only log)
+def configure_logging(level=None):
+    level = level or os.environ.get('OECD_DASHBOARD_LOG_LEVEL', 'INFO')
+    logging.basicConfig(level=level.upper() if isinstance(level, str) else level,
+                        format="time=%(asctime)s level=%(levelname)s logger=%(name)s msg=%(message)s")
+
+# Aggregated measurements of the stages and counters, shared by all threads
+class MetricsRegistry:
+    def __init__(self, sample_size=2048):
+        self.sample_size = sample_size
+        self.lock = threading.Lock()
+        self.stages = {}  # stage name -> {count, errors, seconds, rows, bytes, samples}
+        self.counters = {}  # counter name -> value
+
+    def observe(self, name, seconds, rows=None, n_bytes=None, failed=False):
+        with self.lock:
+            stage_stats = self.stages.get(name)
+            if stage_stats is None:
+                stage_stats = self.stages[name] = {"count": 0, "errors": 0, "seconds": 0.0, "rows": 0, "bytes": 0,
+                                                   "samples": deque(maxlen=self.sample_size)}
+            stage_stats["count"] += 1
+            stage_stats["errors"] += failed
+            stage_stats["seconds"] += seconds
+            stage_stats["rows"] += rows or 0
+            stage_stats["bytes"] += n_bytes or 0
+            stage_stats["samples"].append(seconds)
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Function to summarize every stage (totals and percentiles of the recent durations) and counter
+    def snapshot(self):
+        with self.lock:
+            stages = {name: dict(stage_stats, samples=list(stage_stats["samples"]))
+                      for name, stage_stats in self.stages.items()}
+            counters = dict(self.counters)
+        for stage_stats in stages.values():
+            samples = stage_stats.pop("samples")
+            stage_stats["quantiles"] = dict(zip(quantiles, np.quantile(samples, quantiles).tolist()))
+        return {"stages": stages, "counters": counters}
+
+    # Function to render the snapshot in the Prometheus text exposition format
+    def render_prometheus(self):
+        snapshot = self.snapshot()
+        lines = [f"# HELP {metric_prefix}_stage_seconds Duration of each stage (percentiles over the recent calls)",
+                 f"# TYPE {metric_prefix}_stage_seconds summary"]
+        for name, stage_stats in sorted(snapshot["stages"].items()):
+            for quantile, seconds in stage_stats["quantiles"].items():
+                lines.append(f'{metric_prefix}_stage_seconds{{stage="{name}",quantile="{quantile}"}} {seconds:.6g}')
+            lines.append(f'{metric_prefix}_stage_seconds_sum{{stage="{name}"}} {stage_stats["seconds"]:.6g}')
+            lines.append(f'{metric_prefix}_stage_seconds_count{{stage="{name}"}} {stage_stats["count"]}')
+        for field, help_text in [("rows", "Rows processed by each stage"), ("bytes", "Bytes processed by each stage"),
+                                 ("errors", "Calls of each stage that raised")]:
+            lines += [f"# HELP {metric_prefix}_stage_{field}_total {help_text}",
+                      f"# TYPE {metric_prefix}_stage_{field}_total counter"]
+            lines += [f'{metric_prefix}_stage_{field}_total{{stage="{name}"}} {stage_stats[field]}'
+                      for name, stage_stats in sorted(snapshot["stages"].items())]
+        for name, value in sorted(snapshot["counters"].items()):
+            metric_name = f"{metric_prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+            lines += [f"# TYPE {metric_name} counter", f"{metric_name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+# Registry the stages of every module report to
+metrics = MetricsRegistry(sample_size)
+
+# Timer of one run of a stage; rows and n_bytes can be set inside the with block once they are known
+class Stage:
+    __slots__ = ('name', 'rows', 'n_bytes', 'start')
+
+    def __init__(self, name, rows=None, n_bytes=None):
+        self.name = name
+        self.rows = rows
+        self.n_bytes = n_bytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        metrics.observe(self.name, seconds, self.rows, self.n_bytes, failed=exc_type is not None)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("stage=%s seconds=%.4f rows=%s bytes=%s failed=%s",
+                         self.name, seconds, self.rows, self.n_bytes, exc_type is not None)
+        return False
+
+# Stand-in for Stage while the instrumentation is off: it measures nothing, and rows and n_bytes
+# set on it are never read
+class NullStage:
+    __slots__ = ('rows', 'n_bytes')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+null_stage = NullStage()
+
+# Function to time a stage: with stage("filter") as timer: ...; timer.rows = len(df)
+def stage(name, rows=None, n_bytes=None):
+    if not enabled:
+        return null_stage
+    return Stage(name, rows, n_bytes)
+
+# Function to add to a counter
+def increment(name, value=1):
+    if enabled:
+        metrics.increment(name, value)
+
+# Function to expose the metrics on a Prometheus-style route of a Flask server (the Dash app.server)
+# and time every request it serves; nothing is registered while the instrumentation is off
+def register_metrics_route(server, path='/metrics'):
+    if not enabled:
+        return
+    from flask import Response, g, request
+
+    @server.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    # Dash callbacks are served by /_dash-update-component, so this stage covers the callback and
+    # the serialization of its output, and its bytes are the size of the serialized response
+    @server.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None and request.path != path:
+            name = "callback_request" if request.path.endswith('_dash-update-component') else "http_request"
+            metrics.observe(name, time.perf_counter() - start,
+                            n_bytes=None if response.direct_passthrough else response.calculate_content_length(),
+                            failed=response.status_code >= 500)
+        return response
+
+    server.add_url_rule(path, 'metrics', lambda: Response(metrics.render_prometheus(),
+                                                          mimetype='text/plain; version=0.0.4'))
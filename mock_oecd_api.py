@@ -0,0 +1,430 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Agency identifier used for every synthetic dataflow
+mock_agency = "OECD.MOCK"
+
+# Function to build a synthetic dataflow catalogue in the /dataflow/ALL format
+def make_dataflows(n_dataflows):
+    return {
+        "data": {
+            "dataflows": [
+                {
+                    "id": f"DF_MOCK_{i}",
+                    "agencyID": mock_agency,
+                    "version": "1.0",
+                    "name": f"Mock dataset {i}",
+                    "description": f"<p>Synthetic dataflow number {i}</p>"
+                }
+                for i in range(n_dataflows)
+            ]
+        }
+    }
+
+# Function to build the structure section of a synthetic SDMX-JSON payload
+def make_structure(name, n_dimensions=3, cardinality=5, n_years=20):
+    dimensions = [
+        {
+            "id": f"DIM_{d}",
+            "name": f"Dimension {d}",
+            "keyPosition": d,
+            "values": [{"id": f"C{d}_{j}", "name": f"Dimension {d} value {j}"} for j in range(cardinality)]
+        }
+        for d in range(n_dimensions)
+    ]
+    time_period = [
+        {
+            "id": "TIME_PERIOD",
+            "name": "Time period",
+            "values": [{"id": str(2000 + t), "name": str(2000 + t)} for t in range(n_years)]
+        }
+    ]
+    return {"name": name, "dimensions": {"dataSet": [], "series": dimensions, "observation": time_period}}
+
+# Function to generate the synthetic series one by one as (series key, series) pairs; overrides
+# ({series key: {observation index: value}}) replace or add observations that were revised
+def iter_series(n_dimensions=3, cardinality=5, n_years=20, sparsity=0.0, seed=0, overrides=None):
+    rng = random.Random(seed)
+    for position in range(cardinality ** n_dimensions):
+        codes = []
+        for _ in range(n_dimensions):
+            position, code = divmod(position, cardinality)
+            codes.append(str(code))
+        observations = {
+            str(t): [round(rng.uniform(0, 1000), 3), None]
+            for t in range(n_years)
+            if rng.random() >= sparsity
+        }
+        key = ":".join(reversed(codes))
+        if overrides and key in overrides:
+            observations.update({str(t): [value, None] for t, value in overrides[key].items()})
+        yield key, {"attributes": [], "observations": observations}
+
+# Function to build a synthetic SDMX-JSON data payload using the series layout, or the flat
+# observations layout with layout='observations'
+def make_sdmx_json(name, n_dimensions=3, cardinality=5, n_years=20, sparsity=0.0, seed=0, overrides=None, layout='series'):
+    payload = {
+        "meta": {"schema": "https://json.sdmx.org/2.0.0/sdmx-json-data-schema.json"},
+        "data": {
+            "dataSets": [{"action": "Information",
+                          "series": dict(iter_series(n_dimensions, cardinality, n_years, sparsity, seed, overrides))}],
+            "structure": make_structure(name, n_dimensions, cardinality, n_years)
+        }
+    }
+    return to_observations_layout(payload) if layout == 'observations' else payload
+
+# Function to turn a series-layout payload into the flat observations layout: one entry per
+# observation keyed by every dimension and the time period ("0:1:0:5"), and every dimension listed
+# at the observation level
+def to_observations_layout(payload):
+    structure = payload["data"]["structure"]
+    dimensions = structure["dimensions"]
+    observations = {
+        f"{series_key}:{t}": observation
+        for series_key, series in payload["data"]["dataSets"][0]["series"].items()
+        for t, observation in series["observations"].items()
+    }
+    flat_dimensions = [dict(dim, keyPosition=position)
+                       for position, dim in enumerate(dimensions["series"] + dimensions["observation"])]
+    return {
+        "meta": payload["meta"],
+        "data": {
+            "dataSets": [{"action": payload["data"]["dataSets"][0]["action"], "observations": observations}],
+            "structure": dict(structure, dimensions={"dataSet": [], "series": [], "observation": flat_dimensions})
+        }
+    }
+
+# Function to serialize the same payload incrementally, so payloads larger than memory can be served
+def iter_sdmx_json_chunks(name, n_dimensions=3, cardinality=5, n_years=20, sparsity=0.0, seed=0, overrides=None,
+                          series_per_chunk=1000):
+    yield b'{"meta": {"schema": "https://json.sdmx.org/2.0.0/sdmx-json-data-schema.json"}, ' \
+          b'"data": {"dataSets": [{"action": "Information", "series": {'
+    chunk = []
+    separator = ""
+    for key, series in iter_series(n_dimensions, cardinality, n_years, sparsity, seed, overrides):
+        chunk.append(f"{json.dumps(key)}: {json.dumps(series)}")
+        if len(chunk) >= series_per_chunk:
+            yield (separator + ", ".join(chunk)).encode("utf-8")
+            chunk = []
+            separator = ", "
+    if chunk:
+        yield (separator + ", ".join(chunk)).encode("utf-8")
+    structure = make_structure(name, n_dimensions, cardinality, n_years)
+    yield b'}}], "structure": ' + json.dumps(structure).encode("utf-8") + b"}}"
+
+# Function to write a synthetic SDMX-JSON payload as SDMX-CSV with labels=both: one row per
+# observation, with "id: name" headers and dimension values
+def make_sdmx_csv(payload, dataflow_reference):
+    structure = payload["data"]["structure"]
+    dimensions = structure["dimensions"]["series"]
+    periods = [value["id"] for value in structure["dimensions"]["observation"][0]["values"]]
+    labels = [[f"{value['id']}: {value['name']}" for value in dim["values"]] for dim in dimensions]
+    dataflow = f"{dataflow_reference}: {structure['name']}"
+
+    lines = [",".join(["DATAFLOW"] + [f"{dim['id']}: {dim['name']}" for dim in dimensions]
+                      + ["TIME_PERIOD: Time period", "OBS_VALUE", "OBS_STATUS"])]
+    for series_key, series in payload["data"]["dataSets"][0]["series"].items():
+        prefix = ",".join([dataflow] + [labels[d][int(code)] for d, code in enumerate(series_key.split(":"))])
+        for t, observation in series["observations"].items():
+            value = "" if observation[0] is None else repr(observation[0])
+            lines.append(f"{prefix},{periods[int(t)]},{value},A")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+# Request handler serving the /dataflow and /data endpoints from synthetic content
+class MockOECDHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_rate and server.rng.random() < server.fail_rate:
+            self.send_body(503, b"Service Unavailable", "text/plain")
+            return
+
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        if path.endswith("/dataflow/ALL"):
+            self.send_body(200, server.catalogue, "application/vnd.sdmx.structure+json; charset=utf-8")
+            return
+
+        parts = path.split("/")
+        if len(parts) >= 3 and parts[-3] == "data" and "," in parts[-2]:
+            dataflow_identifier = parts[-2].split(",")[1]
+            validators = server.get_validators(dataflow_identifier)
+            if validators is not None:
+                self.send_data(dataflow_identifier, parts[-1], validators, parse_qs(url.query))
+                return
+
+        self.send_body(404, b"NoResultsFound", "text/plain")
+
+    # Answer a data request: 304 when the client's ETag is current, only the observations revised
+    # since updatedAfter when it is given, the series and periods selected by the key, startPeriod,
+    # endPeriod and detail when they are given, and the whole dataflow otherwise
+    def send_data(self, dataflow_identifier, key, validators, query):
+        server = self.server
+        if self.headers.get("If-None-Match") == validators["ETag"]:
+            with server.lock:
+                server.not_modified_count += 1
+            self.send_response(304)
+            for header, value in validators.items():
+                self.send_header(header, value)
+            self.end_headers()
+            return
+
+        content_type = "application/vnd.sdmx.data+json; charset=utf-8"
+        if "csv" in self.headers.get("Accept", "") and key == "all" and not query:
+            self.send_body(200, server.get_csv_payload(dataflow_identifier),
+                           "application/vnd.sdmx.data+csv; charset=utf-8; labels=both", validators)
+        elif "updatedAfter" in query:
+            updated_after = datetime.fromisoformat(query["updatedAfter"][0]).timestamp()
+            body = server.get_delta_payload(dataflow_identifier, updated_after)
+            if body is None:
+                self.send_body(404, b"NoResultsFound", "text/plain", validators)
+            else:
+                self.send_body(200, body, content_type, validators)
+        elif key != "all" or any(option in query for option in ("startPeriod", "endPeriod", "detail")):
+            body = server.get_filtered_payload(dataflow_identifier, key, query)
+            if body is None:
+                self.send_body(404, b"NoResultsFound", "text/plain", validators)
+            else:
+                self.send_body(200, body, content_type, validators)
+        elif server.stream_payloads:
+            self.send_chunked(200, server.iter_payload_chunks(dataflow_identifier), content_type, validators)
+        else:
+            self.send_body(200, server.get_payload(dataflow_identifier), content_type, validators)
+
+    def send_body(self, status, body, content_type, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for header, value in (extra_headers or {}).items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.throttle(len(body))
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def send_chunked(self, status, chunks, content_type, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        for header, value in (extra_headers or {}).items():
+            self.send_header(header, value)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.throttle(len(chunk))
+                self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+                with self.server.lock:
+                    self.server.bytes_sent += len(chunk)
+        self.wfile.write(b"0\r\n\r\n")
+
+    # Wait as long as a server producing bytes_per_second would need for n_bytes
+    def throttle(self, n_bytes):
+        if self.server.bytes_per_second:
+            time.sleep(n_bytes / self.server.bytes_per_second)
+
+    def log_message(self, format, *args):
+        pass
+
+# Threaded HTTP server holding the synthetic catalogue, payloads and request counters
+class MockOECDServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, n_dataflows=20, fail_rate=0.0, latency=0.0, seed=0, stream_payloads=False,
+                 bytes_per_second=None, layout='series', **payload_options):
+        super().__init__(address, MockOECDHandler)
+        self.dataflows = make_dataflows(n_dataflows)["data"]["dataflows"]
+        self.catalogue = json.dumps({"data": {"dataflows": self.dataflows}}).encode("utf-8")
+        self.payload_options = payload_options
+        self.payloads = {}
+        self.payload_dicts = {}
+        self.csv_payloads = {}
+        self.stream_payloads = stream_payloads
+        self.layout = layout
+        self.bytes_per_second = bytes_per_second
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.bytes_sent = 0
+        # Revised observations per dataflow: {dataflow id: {series key: {observation index: (value, time)}}}
+        self.created_at = time.time()
+        self.updates = {}
+        self.revisions = {}
+
+    @property
+    def api_root(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def find_dataflow(self, dataflow_identifier):
+        return next((i for i, flow in enumerate(self.dataflows) if flow["id"] == dataflow_identifier), None)
+
+    def get_overrides(self, dataflow_identifier):
+        return {key: {t: value for t, (value, updated_at) in observations.items()}
+                for key, observations in self.updates.get(dataflow_identifier, {}).items()}
+
+    def get_payload_dict(self, dataflow_identifier):
+        with self.lock:
+            if dataflow_identifier not in self.payload_dicts:
+                index = self.find_dataflow(dataflow_identifier)
+                if index is None:
+                    return None
+                self.payload_dicts[dataflow_identifier] = make_sdmx_json(
+                    self.dataflows[index]["name"], seed=index, overrides=self.get_overrides(dataflow_identifier),
+                    **self.payload_options)
+            return self.payload_dicts[dataflow_identifier]
+
+    def get_payload(self, dataflow_identifier):
+        payload = self.get_payload_dict(dataflow_identifier)
+        if payload is None:
+            return None
+        with self.lock:
+            if dataflow_identifier not in self.payloads:
+                if self.layout == 'observations':
+                    payload = to_observations_layout(payload)
+                self.payloads[dataflow_identifier] = json.dumps(payload).encode("utf-8")
+            return self.payloads[dataflow_identifier]
+
+    def get_csv_payload(self, dataflow_identifier):
+        payload = self.get_payload_dict(dataflow_identifier)
+        with self.lock:
+            if dataflow_identifier not in self.csv_payloads:
+                reference = f"{mock_agency}:{dataflow_identifier}(1.0)"
+                self.csv_payloads[dataflow_identifier] = make_sdmx_csv(payload, reference)
+            return self.csv_payloads[dataflow_identifier]
+
+    # Payload restricted to the series matching an SDMX key (dimension values joined by "+", dimensions
+    # separated by ".", empty for all values) and to the periods between startPeriod and endPeriod;
+    # detail=serieskeysonly leaves the observations out; None when nothing matches
+    def get_filtered_payload(self, dataflow_identifier, key, query):
+        payload = self.get_payload_dict(dataflow_identifier)
+        structure = payload["data"]["structure"]
+        selected = []
+        if key != "all":
+            for dim, part in zip(structure["dimensions"]["series"], key.split(".")):
+                positions = {value["id"]: str(j) for j, value in enumerate(dim["values"])}
+                selected.append({positions[value] for value in part.split("+") if value in positions} if part else None)
+
+        periods = [value["id"] for value in structure["dimensions"]["observation"][0]["values"]]
+        start_period = query.get("startPeriod", [periods[0]])[0]
+        end_period = query.get("endPeriod", [periods[-1]])[0]
+        kept_periods = {str(t) for t, period in enumerate(periods) if start_period <= period <= end_period}
+        keys_only = query.get("detail", [""])[0] == "serieskeysonly"
+
+        series = {}
+        for series_key, values in payload["data"]["dataSets"][0]["series"].items():
+            if any(codes is not None and code not in codes for codes, code in zip(selected, series_key.split(":"))):
+                continue
+            observations = {} if keys_only else {t: obs for t, obs in values["observations"].items() if t in kept_periods}
+            if observations or keys_only:
+                series[series_key] = {"attributes": [], "observations": observations}
+        if not series:
+            return None
+        return json.dumps({"meta": payload["meta"],
+                           "data": {"dataSets": [{"action": "Information", "series": series}], "structure": structure}}).encode("utf-8")
+
+    def iter_payload_chunks(self, dataflow_identifier):
+        index = self.find_dataflow(dataflow_identifier)
+        if index is None:
+            return None
+        with self.lock:
+            overrides = self.get_overrides(dataflow_identifier)
+        return iter_sdmx_json_chunks(self.dataflows[index]["name"], seed=index, overrides=overrides, **self.payload_options)
+
+    # Payload holding only the observations revised after the given time (the whole dataflow when
+    # the time precedes the server's data), or None when nothing changed
+    def get_delta_payload(self, dataflow_identifier, updated_after):
+        if updated_after < self.created_at:
+            return self.get_payload(dataflow_identifier)
+        index = self.find_dataflow(dataflow_identifier)
+        with self.lock:
+            series = {
+                key: {"attributes": [], "observations": {str(t): [value, None] for t, (value, updated_at) in observations.items()
+                                                         if updated_at > updated_after}}
+                for key, observations in self.updates.get(dataflow_identifier, {}).items()
+            }
+        series = {key: value for key, value in series.items() if value["observations"]}
+        if not series:
+            return None
+        options = {option: self.payload_options[option] for option in ("n_dimensions", "cardinality", "n_years")
+                   if option in self.payload_options}
+        payload = {
+            "meta": {"schema": "https://json.sdmx.org/2.0.0/sdmx-json-data-schema.json"},
+            "data": {
+                "dataSets": [{"action": "Replace", "series": series}],
+                "structure": make_structure(self.dataflows[index]["name"], **options)
+            }
+        }
+        return json.dumps(payload).encode("utf-8")
+
+    # Validators of a dataflow's current data, which change with every revision
+    def get_validators(self, dataflow_identifier):
+        if self.find_dataflow(dataflow_identifier) is None:
+            return None
+        with self.lock:
+            revision = self.revisions.get(dataflow_identifier, (0, self.created_at))
+        return {"ETag": f'"{dataflow_identifier}-{revision[0]}"', "Last-Modified": formatdate(revision[1], usegmt=True)}
+
+    # Function to revise random observations of a dataflow, as a nightly data release would
+    def update_dataflow(self, dataflow_identifier, n_observations=1, seed=None):
+        rng = random.Random(seed)
+        n_dimensions = self.payload_options.get("n_dimensions", 3)
+        cardinality = self.payload_options.get("cardinality", 5)
+        n_years = self.payload_options.get("n_years", 20)
+        with self.lock:
+            updated_at = time.time()
+            updates = self.updates.setdefault(dataflow_identifier, {})
+            for _ in range(n_observations):
+                key = ":".join(str(rng.randrange(cardinality)) for _ in range(n_dimensions))
+                updates.setdefault(key, {})[rng.randrange(n_years)] = (round(rng.uniform(0, 1000), 3), updated_at)
+            revision = self.revisions.get(dataflow_identifier, (0, self.created_at))[0] + 1
+            self.revisions[dataflow_identifier] = (revision, updated_at)
+            self.payloads.pop(dataflow_identifier, None)
+            self.payload_dicts.pop(dataflow_identifier, None)
+            self.csv_payloads.pop(dataflow_identifier, None)
+
+# Function to start the mock API on a background thread (port 0 picks a free port)
+def start_mock_server(host="127.0.0.1", port=0, **options):
+    server = MockOECDServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OECD SDMX API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dataflows", type=int, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--bytes-per-second", type=float, default=None, help="Simulated output rate of the server per response")
+    parser.add_argument("--dimensions", type=int, default=3, help="Number of series dimensions per dataflow")
+    parser.add_argument("--cardinality", type=int, default=5, help="Number of values per dimension")
+    parser.add_argument("--years", type=int, default=20, help="Number of time periods per series")
+    parser.add_argument("--sparsity", type=float, default=0.0, help="Share of missing observations")
+    parser.add_argument("--layout", choices=["series", "observations"], default="series",
+                        help="SDMX-JSON layout of the full data payloads (streamed payloads use the series layout)")
+    parser.add_argument("--stream", action="store_true", help="Generate data payloads on the fly with chunked encoding")
+    args = parser.parse_args()
+
+    server = MockOECDServer(("127.0.0.1", args.port), n_dataflows=args.dataflows,
+                            fail_rate=args.fail_rate, latency=args.latency, stream_payloads=args.stream,
+                            bytes_per_second=args.bytes_per_second, layout=args.layout,
+                            n_dimensions=args.dimensions, cardinality=args.cardinality, n_years=args.years,
+                            sparsity=args.sparsity)
+    print(f"Mock OECD API listening on {server.api_root}", flush=True)
+    server.serve_forever()
@@ -0,0 +1,84 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import get_logger, increment, stage
+
+logger = get_logger(__name__)
+
+# Root of the OECD SDMX REST API (dataflow and data endpoints live below it)
+api_root = "https://sdmx.oecd.org/public/rest"
+
+# Status codes that are worth retrying with exponential backoff
+retry_status_codes = (429, 503)
+
+# On-disk response cache used by every request when enabled (see enable_response_cache)
+response_cache = None
+
+# Function to put a shared on-disk response cache under all API requests
+def enable_response_cache(folder_name, max_bytes=2 * 1024 * 1024 * 1024, ttl=24 * 3600):
+    global response_cache
+    from response_cache import ResponseCache
+
+    response_cache = ResponseCache(folder_name, max_bytes=max_bytes, ttl=ttl)
+    return response_cache
+
+# Function to create a shared HTTP session with a connection pool sized for the worker count
+def create_session(pool_size=10):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Rate limiter that spaces out requests to the same host across all threads
+class HostRateLimiter:
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+# Function to GET a URL, retrying 503/429 responses with exponential backoff; responses go through
+# the shared response cache when one is enabled (cache=False bypasses it)
+def get_with_backoff(url, headers=None, session=None, rate_limiter=None, max_retries=5, backoff_factor=1, cache=None, **kwargs):
+    cache = response_cache if cache is None else cache
+    if cache and cache.is_cacheable(headers):
+        return cache.fetch(url, headers,
+                           lambda request_headers: get_with_backoff(url, request_headers, session, rate_limiter, max_retries,
+                                                                    backoff_factor, cache=False, **kwargs),
+                           params=kwargs.get("params"), stream=kwargs.get("stream", False))
+
+    http = session or requests
+    retries = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        with stage("http_fetch") as timer:
+            response = http.get(url, headers=headers, **kwargs)
+            # Streamed bodies are counted by the code that reads them
+            if not kwargs.get("stream"):
+                timer.n_bytes = len(response.content)
+        if response.status_code not in retry_status_codes or retries >= max_retries:
+            return response
+
+        retries += 1
+        retry_after = response.headers.get("Retry-After", "")
+        wait_time = int(retry_after) if retry_after.isdigit() else backoff_factor * 2 ** retries  # Exponential backoff
+        increment("http_retries")
+        logger.warning("Service unavailable (%s) for %s. Retrying in %s seconds...", response.status_code, url, wait_time)
+        response.close()
+        time.sleep(wait_time)
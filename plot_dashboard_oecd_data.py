@@ -1,104 +1,190 @@
+import json
 import os
+from functools import partial
 import dash
 from dash import dcc, html, Input, Output, State, MATCH, ALL
 import pandas as pd
-import plotly.express as px
-import statsmodels
+from dataset_cache import DatasetCache
+from dataset_index import IndexedDataset
+from dataset_metadata import load_metadata
+from dataset_rollup import RollupCube
+from dataset_scan import ScannedDataset, dataset_size
+from dataset_store import dataset_catalogue, read_dataset, read_legacy_csv
+from figure_cache import ResultCache, control_key, file_version
+from figure_rendering import build_figure
+from instrumentation import configure_logging, get_logger, register_metrics_route, stage
+from shared_store import open_shared_dataset
+
+logger = get_logger(__name__)
 
 # Folder where the data files are stored
-data_folder = r'[PATH]/01 - Datasets'
+data_folder = os.environ.get('OECD_DASHBOARD_DATA_FOLDER', r'[PATH]/01 - Datasets')
 
-# Initialize the Dash app with suppress_callback_exceptions=True
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+# Folder of the shared memory-mapped store (None keeps the parsed datasets in each process only)
+shared_store_folder = os.environ.get('OECD_DASHBOARD_SHARED_STORE') or None
 
-# Function to load a CSV file and parse it into a DataFrame
+# Memory budget of the parsed-dataset cache shared by the callbacks (in MB)
+cache_memory_budget = int(os.environ.get('OECD_DASHBOARD_CACHE_MB', '1024'))
+
+# Memory budgets of the caches of serialized figures and of filtered frames (in MB)
+figure_cache_memory_budget = int(os.environ.get('OECD_DASHBOARD_FIGURE_CACHE_MB', '128'))
+frame_cache_memory_budget = int(os.environ.get('OECD_DASHBOARD_FRAME_CACHE_MB', '256'))
+
+# Maximum number of options a dimension dropdown receives per search
+option_limit = int(os.environ.get('OECD_DASHBOARD_OPTION_LIMIT', '100'))
+
+# Maximum number of dimension subsets whose rollups are kept per dataset
+rollup_subsets = int(os.environ.get('OECD_DASHBOARD_ROLLUP_SUBSETS', '32'))
+
+# Size on disk (in MB) above which Parquet datasets are queried out of core (0 keeps every dataset in memory)
+out_of_core_threshold = int(os.environ.get('OECD_DASHBOARD_OUT_OF_CORE_MB', '0'))
+
+# Maximum number of rows a view of a dataset queried out of core reads into memory; larger
+# selections are sampled evenly while they are read
+scan_row_limit = int(os.environ.get('OECD_DASHBOARD_SCAN_ROW_LIMIT', '200000'))
+
+# Function to load a dataset file and parse it into a DataFrame
 def load_and_parse_data(file_path):
-    df = pd.read_csv(file_path)
-    print(f"Loaded dataset from {file_path} with columns: {df.columns}")
-
-    def parse_observation_values(row):
-        import ast
-        try:
-            observations = ast.literal_eval(row['Observation Value'])
-            obs_df = pd.DataFrame(list(observations.items()), columns=['Year', 'Value'])
-            for col in row.index:
-                if col != 'Observation Value':
-                    obs_df[col] = row[col]
-            return obs_df
-        except (ValueError, SyntaxError):
-            return pd.DataFrame()
-
-    parsed_df = pd.concat(df.apply(parse_observation_values, axis=1).tolist(), ignore_index=True)
-    parsed_df['Year'] = parsed_df['Year'].astype(int)
-    parsed_df['Value'] = pd.to_numeric(parsed_df['Value'], errors='coerce')
-    print(f"Parsed data shape: {parsed_df.shape}, with columns: {parsed_df.columns}")
+    # Parquet datasets are already stored in tidy long format
+    if file_path.endswith('.parquet'):
+        parsed_df = read_dataset(file_path)
+        logger.debug("Loaded dataset from %s with shape: %s, with columns: %s", file_path, parsed_df.shape, list(parsed_df.columns))
+        return parsed_df
 
-    return parsed_df
+    # Legacy CSV datasets hold one row per series with a year -> value mapping, exploded in bulk
+    parsed_df = read_legacy_csv(file_path)
+    logger.debug("Parsed data shape: %s, with columns: %s", parsed_df.shape, list(parsed_df.columns))
 
-# Define the layout of the app
-app.layout = html.Div([
-    html.H1("OECD Data Dashboard", 
-            style={
-                'textAlign': 'center',
-                    'font-family': 'Bebas Neue'
-            }
-    ),
+    return parsed_df
 
-    # Dropdown to select the dataset file
-    html.Label("Select Dataset:",
+# Function to check whether a dataset is queried out of core rather than loaded into memory
+def is_out_of_core(file_path):
+    return (out_of_core_threshold > 0 and file_path.endswith('.parquet')
+            and dataset_size(file_path) > out_of_core_threshold * 1024 * 1024)
+
+# Function to load a dataset and build its per-dimension indexes and rollup cube; with a shared store
+# the dataset is parsed once into the store and every worker maps it from there. Datasets above the
+# out-of-core threshold are only opened, and every view reads the row groups it needs from disk
+def load_indexed_dataset(file_path):
+    if is_out_of_core(file_path):
+        with stage("scan_open") as timer:
+            dataset = ScannedDataset(file_path, max_rows=scan_row_limit)
+            timer.rows = len(dataset)
+        return dataset
+
+    with stage("load", n_bytes=os.path.getsize(file_path)) as timer:
+        if shared_store_folder:
+            dataset = open_shared_dataset(file_path, shared_store_folder, load_and_parse_data)
+        else:
+            dataset = IndexedDataset(load_and_parse_data(file_path))
+        timer.rows = len(dataset)
+    with stage("rollup", rows=len(dataset)):
+        dataset.rollups = RollupCube(dataset, max_subsets=rollup_subsets)
+    # Subset cubes built later make the cached dataset larger; the dataset cache counts them as they come
+    dataset.rollups.on_resize = partial(dataset_cache.resize, file_path)
+    return dataset
+
+# Cache of indexed datasets; a file that changes on disk is reloaded on its next use
+dataset_cache = DatasetCache(max_bytes=cache_memory_budget * 1024 * 1024)
+
+# Function to get an indexed dataset from the cache, loading it on a miss
+def get_dataset(file_path):
+    dataset = dataset_cache.get(file_path, load_indexed_dataset)
+    logger.debug("Dataset cache: %s", dataset_cache.stats())
+    return dataset
+
+# Caches of the views built by update_graph, keyed on the dataset version and the control state
+figure_cache = ResultCache("figure_cache", max_bytes=figure_cache_memory_budget * 1024 * 1024, size_of=len)
+frame_cache = ResultCache("frame_cache", max_bytes=frame_cache_memory_budget * 1024 * 1024)
+
+# Function to get a dataset for its metadata sidecar: the whole frame, or the batches of a dataset
+# queried out of core
+def dataset_frames(file_path):
+    dataset = get_dataset(file_path)
+    return dataset.batches() if isinstance(dataset, ScannedDataset) else dataset.df
+
+# Function to build the layout of the app; Dash calls it on every page load, so the dataset list
+# shows the datasets present at that time
+def build_layout():
+    return html.Div([
+        html.H1("OECD Data Dashboard", 
                 style={
-                    'font-family': 'Quicksand',  # Set the font to Quicksand
-                    'font-size': '16px'  # Adjust font size as needed
+                    'textAlign': 'center',
+                        'font-family': 'Bebas Neue'
                 }
-    ),
+        ),
+
+        # Dropdown to select the dataset file
+        html.Label("Select Dataset:",
+                    style={
+                        'font-family': 'Quicksand',  # Set the font to Quicksand
+                        'font-size': '16px'  # Adjust font size as needed
+                    }
+        ),
     
-    dcc.Dropdown(
-        id='dataset-dropdown',
-        options=[{'label': os.path.splitext(f)[0], 'value': f} for f in os.listdir(data_folder) if f.endswith('.csv')],
-        placeholder='Select a dataset',
-        value=None,
-        clearable=False,
-        style={
-            'font-family': 'Quicksand',  # Set the font to Quicksand
-            'font-size': '16px'  # Adjust font size as needed
-        }
-    ),
-
-    # Loading spinner for dynamic controls (dropdowns)
-    dcc.Loading(
-        id="loading-dynamic-controls",
-        type="circle",  # You can choose 'dot', 'circle', or 'cube' for the spinner
-        children=[
-            html.Div(id='dynamic-controls')  # This is where the dynamic dropdowns will appear
-        ]
-    ),
-
-    # Placeholder for dynamic controls and hidden data
-    dcc.Store(id='dynamic-controls-data'),
-
-    # Update button to manually refresh the graph
-    html.Button('Update Plot', 
-                id='update-button', 
-                n_clicks=0, 
-                style={
-                    'margin-top': '20px',
-                    'font-family': 'Quicksand',  # Set the font to Quicksand
-                    'font-size': '16px'  # Adjust font size as needed
-                }
-    ),
-
-    # Loading spinner for the graph
-    dcc.Loading(
-        id="loading-icon",
-        type="circle",  # Choose the type of loading spinner: 'circle', 'dot', or 'cube'
-        children=[
-            dcc.Graph(id='graph-output')
-        ]
-    ),
-])
+        dcc.Dropdown(
+            id='dataset-dropdown',
+            options=[{'label': os.path.splitext(f)[0], 'value': f} for f in dataset_catalogue(data_folder)],
+            placeholder='Select a dataset',
+            value=None,
+            clearable=False,
+            style={
+                'font-family': 'Quicksand',  # Set the font to Quicksand
+                'font-size': '16px'  # Adjust font size as needed
+            }
+        ),
+
+        # Loading spinner for dynamic controls (dropdowns)
+        dcc.Loading(
+            id="loading-dynamic-controls",
+            type="circle",  # You can choose 'dot', 'circle', or 'cube' for the spinner
+            children=[
+                html.Div(id='dynamic-controls')  # This is where the dynamic dropdowns will appear
+            ]
+        ),
+
+        # Placeholder for dynamic controls and hidden data
+        dcc.Store(id='dynamic-controls-data'),
+
+        # Update button to manually refresh the graph
+        html.Button('Update Plot', 
+                    id='update-button', 
+                    n_clicks=0, 
+                    style={
+                        'margin-top': '20px',
+                        'font-family': 'Quicksand',  # Set the font to Quicksand
+                        'font-size': '16px'  # Adjust font size as needed
+                    }
+        ),
+
+        # Loading spinner for the graph
+        dcc.Loading(
+            id="loading-icon",
+            type="circle",  # Choose the type of loading spinner: 'circle', 'dot', or 'cube'
+            children=[
+                dcc.Graph(id='graph-output')
+            ]
+        ),
+    ])
+
+# Function to create the Dash app, e.g. once per worker of a WSGI server (see wsgi.py); shared_store
+# overrides OECD_DASHBOARD_SHARED_STORE (an empty string disables the shared store)
+def create_app(shared_store=None):
+    global shared_store_folder
+    if shared_store is not None:
+        shared_store_folder = shared_store or None
+
+    # Initialize the Dash app with suppress_callback_exceptions=True; the callbacks below are
+    # registered with dash.callback and attach to it
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+    app.layout = build_layout
+
+    # Expose the stage timings and counters on /metrics (unless OECD_DASHBOARD_METRICS=0)
+    register_metrics_route(app.server)
+    return app
 
 # Callback to generate dynamic controls based on the selected dataset
-@app.callback(
+@dash.callback(
     [Output('dynamic-controls', 'children'),
      Output('dynamic-controls-data', 'data')
     ],
@@ -108,42 +194,46 @@ def generate_controls(selected_file):
     if selected_file is None:
         return [], {}
 
-    # Load the data
+    # Load the metadata sidecar (rebuilt from the dataset only when it is missing or stale)
     file_path = os.path.join(data_folder, selected_file)
-    df = load_and_parse_data(file_path)
+    metadata = load_metadata(file_path, dataset_frames)
+    year_min, year_max = int(metadata['year_min']), int(metadata['year_max'])
 
-    # Generate dynamic dropdowns for each column except Year and Value
+    # Generate dynamic dropdowns for each dimension
     controls = []
     dropdown_ids = {}
 
-    for col in df.columns:
-        if col not in ['Year', 'Value']:
-            unique_values = sorted(df[col].dropna().unique())
-            if len(unique_values) > 1:
-                dropdown_id = f'{col}-dropdown'
-                dropdown_ids[col] = dropdown_id
-
-                controls.append(html.Label(f"Select {col.replace('_', ' ').title()}:",
-                                           style={
-                                                'font-family': 'Quicksand',  # Set the font to Quicksand
-                                                'font-size': '16px'  # Adjust font size as needed
-                                            }
-                                )
-                )
-
-                controls.append(
-                    dcc.Dropdown(
-                        id={'type': 'dynamic-dropdown', 'index': dropdown_id},
-                        options=[{'label': str(v), 'value': str(v)} for v in unique_values],
-                        value=None,
-                        clearable=True,
-                        multi=True,
-                        style={
-                            'font-family': 'Quicksand',  # Set the font to Quicksand
-                            'font-size': '16px'  # Adjust font size as needed
-                        }
-                    )
+    for dimension in metadata['dimensions']:
+        col = dimension['id']
+        unique_values = dimension['values']
+        if len(unique_values) > 1:
+            dropdown_id = f'{col}-dropdown'
+            dropdown_ids[col] = dropdown_id
+
+            controls.append(html.Label(f"Select {col.replace('_', ' ').title()}:",
+                                       style={
+                                            'font-family': 'Quicksand',  # Set the font to Quicksand
+                                            'font-size': '16px'  # Adjust font size as needed
+                                        }
+                            )
+            )
+
+            # The options are loaded on demand by update_dropdown_options, so the layout does not
+            # grow with the number of values
+            controls.append(
+                dcc.Dropdown(
+                    id={'type': 'dynamic-dropdown', 'index': dropdown_id},
+                    options=[],
+                    placeholder=f"Type to search {len(unique_values):,} values",
+                    value=None,
+                    clearable=True,
+                    multi=True,
+                    style={
+                        'font-family': 'Quicksand',  # Set the font to Quicksand
+                        'font-size': '16px'  # Adjust font size as needed
+                    }
                 )
+            )
 
     # Add a range slider for selecting the year range
     controls.append(html.Label("Select Year Range:",
@@ -157,11 +247,11 @@ def generate_controls(selected_file):
     controls.append(
         dcc.RangeSlider(
             id='year-range-slider',
-            min=int(df['Year'].min()),
-            max=int(df['Year'].max()),
+            min=year_min,
+            max=year_max,
             step=1,
-            marks={year: str(year) for year in range(int(df['Year'].min()), int(df['Year'].max()) + 1, 5)},
-            value=[int(df['Year'].min()), int(df['Year'].max())],
+            marks={year: str(year) for year in range(year_min, year_max + 1, 5)},
+            value=[year_min, year_max],
         )
     )
 
@@ -203,7 +293,7 @@ def generate_controls(selected_file):
     controls.append(
         dcc.Dropdown(
             id='color-dimension-dropdown',
-            options=[{'label': col, 'value': col} for col in df.columns if col not in ['Year', 'Value']],
+            options=[{'label': dimension['id'], 'value': dimension['id']} for dimension in metadata['dimensions']],
             placeholder='Select a column for color coding',
             value=None,
             clearable=True,
@@ -214,6 +304,34 @@ def generate_controls(selected_file):
         )
     )
 
+    # Dropdown for aggregating the values of the dimensions left unselected per year and color
+    controls.append(html.Label("Aggregate Unselected Values:",
+                               style={
+                                    'font-family': 'Quicksand',  # Set the font to Quicksand
+                                    'font-size': '16px'  # Adjust font size as needed
+                                }
+                    )
+    )
+
+    controls.append(
+        dcc.Dropdown(
+            id='aggregation-dropdown',
+            options=[
+                {'label': 'Sum', 'value': 'sum'},
+                {'label': 'Mean', 'value': 'mean'},
+                {'label': 'Median', 'value': 'median'},
+                {'label': 'Count', 'value': 'count'}
+            ],
+            placeholder='Show every series',
+            value=None,
+            clearable=True,
+            style={
+                'font-family': 'Quicksand',  # Set the font to Quicksand
+                'font-size': '16px'  # Adjust font size as needed
+            }
+        )
+    )
+
     # Checkbox for adding regression line in scatter plot
     controls.append(html.Label("Add Linear Regression Line (Scatter Only):",
                                style={
@@ -236,7 +354,46 @@ def generate_controls(selected_file):
 
     return controls, dropdown_ids
 
-@app.callback(
+# Callback to load the options of a dimension dropdown from the server: the values matching the
+# search text that still have data under the other dropdowns and the year range, at most option_limit
+@dash.callback(
+    Output({'type': 'dynamic-dropdown', 'index': MATCH}, 'options'),
+    [Input({'type': 'dynamic-dropdown', 'index': MATCH}, 'search_value'),
+     Input({'type': 'dynamic-dropdown', 'index': ALL}, 'value'),
+     Input('year-range-slider', 'value'),
+     State({'type': 'dynamic-dropdown', 'index': MATCH}, 'id'),
+     State({'type': 'dynamic-dropdown', 'index': MATCH}, 'value'),
+     State({'type': 'dynamic-dropdown', 'index': ALL}, 'id'),
+     State('dataset-dropdown', 'value'),
+     State('dynamic-controls-data', 'data')]
+)
+def update_dropdown_options(search_value, all_values, year_range, dropdown, selected_value, all_dropdowns, selected_file, dropdown_ids):
+    if not selected_file or not dropdown_ids:
+        return dash.no_update
+
+    # Collect the selected values per column, as update_graph does
+    columns = {dropdown_id: col for col, dropdown_id in dropdown_ids.items()}
+    selections = {columns[d['index']]: values for d, values in zip(all_dropdowns, all_values)
+                  if values and d['index'] in columns}
+    col = columns.get(dropdown['index'])
+    if col is None:
+        return dash.no_update
+
+    dataset = get_dataset(os.path.join(data_folder, selected_file))
+    with stage("option_search") as timer:
+        values, n_matches = dataset.search_values(col, search_value, selections, year_range, limit=option_limit)
+        timer.rows = n_matches
+
+    # Selected values stay in the options, or the dropdown would drop them from its display
+    selected = [str(v) for v in (selected_value or [])]
+    options = [{'label': v, 'value': v} for v in selected]
+    options += [{'label': v, 'value': v} for v in values if v not in selected]
+    if n_matches > len(values):
+        options.append({'label': f"... {n_matches - len(values):,} more, type to narrow the list",
+                        'value': '__more__', 'disabled': True})
+    return options
+
+@dash.callback(
     Output('graph-output', 'figure'),
     [Input('update-button', 'n_clicks'),
      State('dataset-dropdown', 'value'),
@@ -244,96 +401,106 @@ def generate_controls(selected_file):
      State('chart-type-dropdown', 'value'),
      State('color-dimension-dropdown', 'value'),
      State('regression-checkbox', 'value'),
+     State('aggregation-dropdown', 'value'),
      State('dynamic-controls-data', 'data')] +
-    [State({'type': 'dynamic-dropdown', 'index': ALL}, 'value')],
+    [State({'type': 'dynamic-dropdown', 'index': ALL}, 'value'),
+     State({'type': 'dynamic-dropdown', 'index': ALL}, 'id')],
     prevent_initial_call=True
 )
-def update_graph(n_clicks, selected_file, year_range, chart_type, color_dimension, regression_checkbox, dropdown_ids, *selected_values):
+def update_graph(n_clicks, selected_file, year_range, chart_type, color_dimension, regression_checkbox, aggregation, dropdown_ids, selected_values, dropdowns):
     if not n_clicks or not selected_file:
         return dash.no_update
 
-    # Load the data
     file_path = os.path.join(data_folder, selected_file)
-    df = load_and_parse_data(file_path)
     plot_title = os.path.splitext(selected_file)[0]
 
-    # Debugging: Check the loaded dataframe shape and columns
-    print(f"Loaded DataFrame shape: {df.shape}")
-    print(f"DataFrame columns: {df.columns.tolist()}")
-
-    # Apply the filters based on selected dropdown values
-    if dropdown_ids:
-        for (col, dropdown_id), selected_value in zip(dropdown_ids.items(), selected_values[0]):
-            if selected_value:
-                print(f"Filtering on column: {col} with selected value(s): {selected_value}")
-                df = df[df[col].astype(str).isin([str(v).strip() for v in selected_value])]
-                print(f"Filtered DataFrame shape after {col} filtering: {df.shape}")
-    
-    UNIT_MEASURE_elements = []
-    if 'UNIT_MEASURE' in df.columns and not df['UNIT_MEASURE'].empty:
-        for m in df['UNIT_MEASURE']:
-            if m not in UNIT_MEASURE_elements:
-                UNIT_MEASURE_elements.append(m)
-        if len(UNIT_MEASURE_elements) <2:
-            UNIT_MEASURE_Title = UNIT_MEASURE_elements[0]
-        else:
-            UNIT_MEASURE_Title = UNIT_MEASURE_elements[0]
-            for m in UNIT_MEASURE_Title[1:]:
-                UNIT_MEASURE_Title += 'vs. ' + UNIT_MEASURE_elements[m]
-        
-
-    # Filter by the selected year range
-    df = df[(df['Year'] >= year_range[0]) & (df['Year'] <= year_range[1])]
-    print(f"DataFrame shape after year range filtering: {df.shape}")
-
-    # Check if the dataframe is empty after filtering
-    if df.empty:
-        print("Warning: DataFrame is empty after applying all filters.")
-        return px.scatter(title="No data available for the selected filters")
+    # Collect the selected dropdown values per column, matched through the dropdown ids (the keys of
+    # the stored dropdown_ids do not keep the order of the dropdowns)
+    columns = {dropdown_id: col for col, dropdown_id in (dropdown_ids or {}).items()}
+    selections = {}
+    for dropdown, selected_value in zip(dropdowns, selected_values):
+        col = columns.get(dropdown['index'])
+        if col and selected_value:
+            logger.debug("Filtering on column: %s with selected value(s): %s", col, selected_value)
+            selections[col] = selected_value
 
     # Define the trendline option for scatter plot
     trendline = 'ols' if 'show_regression' in regression_checkbox and chart_type == 'scatter' else None
 
-    annotations = []
-    # Title
-    annotations.append(dict(xref='paper', yref='paper', x=0.5, y=1.05,
-                              xanchor='center', yanchor='bottom',
-                              text=f"{plot_title}",
-                              font=dict(family='Bebas Neue',
-                                        size=30,
-                                        color='rgb(0,0,0)'),
-                              showarrow=False))
-
-    # Create the chart
-    if chart_type == 'scatter':
-        fig = px.scatter(
-            df, x='Year', y='Value', color=color_dimension,
-            trendline=trendline,
-        )
-    elif chart_type == 'line':
-        fig = px.line(
-            df, x='Year', y='Value', color=color_dimension, markers = True,
-        )
-    elif chart_type == 'bar':
-        fig = px.bar(
-            df, x='Year', y='Value', color=color_dimension,
-        )
+    # Views already built from the same version of the dataset with the same controls are served
+    # from the figure cache, without loading, filtering or rendering anything
+    version = file_version(file_path)
+    figure_key = control_key(file_path, version, selections, year_range, chart_type=chart_type,
+                             color_dimension=color_dimension, trendline=trendline, aggregation=aggregation)
+    figure_json = figure_cache.get(file_path, version, figure_key,
+                                   lambda: render_graph(file_path, version, selections, year_range, chart_type,
+                                                        color_dimension, trendline, plot_title, aggregation))
+    logger.debug("Figure cache: %s", figure_cache.stats())
+    return json.loads(figure_json)
+
+# Function to filter a dataset and build the serialized figure of a view
+def render_graph(file_path, version, selections, year_range, chart_type, color_dimension, trendline, plot_title, aggregation=None):
+    if aggregation:
+        # Aggregated views are looked up in the dataset's rollup cube, per color dimension
+        frame_key = control_key(file_path, version, selections, year_range, color_dimension=color_dimension, aggregation=aggregation)
+        df = frame_cache.get(file_path, version, frame_key,
+                             lambda: aggregate_dataset(file_path, aggregation, selections, year_range, color_dimension))
+        units = df.attrs.get('units')
+        plot_title = f"{plot_title} ({aggregation.title()} of Unselected Values)"
     else:
-        fig = px.scatter(
-            df, x='Year', y='Value', color=color_dimension,
-            trendline=trendline, 
-        )
+        # Apply the dimension filters and the selected year range through the dataset's indexes; the
+        # filtered frame is cached too, for the other chart types and colors of the same selection.
+        # Views of datasets queried out of core are read again rather than cached
+        if is_out_of_core(file_path):
+            df = filter_dataset(file_path, selections, year_range)
+        else:
+            frame_key = control_key(file_path, version, selections, year_range)
+            df = frame_cache.get(file_path, version, frame_key, lambda: filter_dataset(file_path, selections, year_range))
+        units = None
+        if 'UNIT_MEASURE' in df.columns and not df['UNIT_MEASURE'].empty:
+            units = [str(m) for m in pd.unique(df['UNIT_MEASURE'].dropna())]
+    logger.debug("DataFrame shape after filtering: %s", df.shape)
 
-    fig.update_layout(
-        xaxis_title="Year",
-        yaxis_title=UNIT_MEASURE_Title,
-        legend_title=color_dimension,
-        template='plotly_white',
-        annotations=annotations
-    )
+    # Label the y axis with the units of measure of the filtered data
+    UNIT_MEASURE_Title = ' vs. '.join(units or []) or None
 
-    return fig
+    # Check if the dataframe is empty after filtering
+    if df.empty:
+        import plotly.express as px
+        logger.warning("DataFrame is empty after applying all filters.")
+        return px.scatter(title="No data available for the selected filters").to_json()
+
+    # Create the chart, reduced to the point budget for large selections
+    with stage("figure_build", rows=len(df)) as timer:
+        figure_json = build_figure(df, chart_type, color_dimension, trendline, plot_title, UNIT_MEASURE_Title).to_json()
+        timer.n_bytes = len(figure_json)
+
+    return figure_json
+
+# Function to load a dataset and select the rows of a view
+def filter_dataset(file_path, selections, year_range):
+    dataset = get_dataset(file_path)
+
+    # Debugging: Check the loaded dataset size and dimensions
+    logger.debug("Loaded dataset rows: %s", len(dataset))
+    logger.debug("Dataset dimensions: %s", dataset.dimension_ids)
+
+    with stage("filter", rows=len(dataset)):
+        if isinstance(dataset, ScannedDataset):
+            return dataset.select(selections, year_range, max_rows=dataset.max_rows)
+        return dataset.select(selections, year_range)
+
+# Function to aggregate the values of a view per year and color from the dataset's rollup cube; the
+# units of measure of the aggregated values are kept in the frame's attrs
+def aggregate_dataset(file_path, aggregation, selections, year_range, color_dimension):
+    dataset = get_dataset(file_path)
+    with stage("aggregate", rows=len(dataset)):
+        df, units = dataset.rollups.aggregate(aggregation, selections, year_range, color_dimension)
+    df.attrs['units'] = units
+    return df
 
 # Run the app
 if __name__ == '__main__':
+    configure_logging()
+    app = create_app()
     app.run_server(debug=True)
@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Response headers kept with a cached body (the body is stored decoded, so transfer headers are dropped)
+cached_headers = ["Content-Type", "ETag", "Last-Modified", "Date"]
+
+# On-disk HTTP response cache: gzip-compressed bodies stored once per content hash, and an sqlite
+# index of the responses keyed by URL and Accept header with their validators and access times.
+# Fresh entries are served without a request, stale ones are revalidated with If-None-Match /
+# If-Modified-Since, and the least recently used entries are evicted beyond max_bytes on disk
+class ResponseCache:
+    def __init__(self, folder_name, max_bytes=2 * 1024 * 1024 * 1024, ttl=24 * 3600):
+        self.folder_name = folder_name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(os.path.join(folder_name, 'bodies'), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(folder_name, 'index.sqlite'), check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, url TEXT, accept TEXT, digest TEXT, headers TEXT,
+                etag TEXT, last_modified TEXT, stored_at REAL, last_access REAL);
+            CREATE TABLE IF NOT EXISTS bodies (digest TEXT PRIMARY KEY, size INTEGER, stored_bytes INTEGER);
+            CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+        """)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    # Requests carrying their own validators manage freshness themselves and bypass the cache
+    @staticmethod
+    def is_cacheable(headers):
+        return not any(header.lower() in ('if-none-match', 'if-modified-since') for header in (headers or {}))
+
+    def body_path(self, digest):
+        return os.path.join(self.folder_name, 'bodies', digest[:2], digest + '.gz')
+
+    # Function to answer a GET from the cache, calling download(request_headers) on a miss or to
+    # revalidate a stale entry; streamed responses are written to disk chunk by chunk and read back
+    def fetch(self, url, headers, download, params=None, stream=False):
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        accept = (headers or {}).get('Accept', '')
+        key = hashlib.sha256(f"{full_url}\n{accept}".encode('utf-8')).hexdigest()
+
+        entry = self.lookup(key)
+        if entry is not None and time.time() - entry['stored_at'] < self.ttl:
+            return self.cached_response(key, entry, full_url, stream, 'hits')
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        response = download(request_headers)
+
+        if entry is not None and response.status_code == 304:
+            response.close()
+            return self.cached_response(key, entry, full_url, stream, 'revalidated')
+        with self.lock:
+            self.misses += 1
+        if response.status_code != 200:
+            return response
+
+        entry = self.store(key, full_url, accept, response, stream)
+        return self.cached_response(key, entry, full_url, stream, None) if stream else response
+
+    def lookup(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT digest, headers, etag, last_modified, stored_at FROM entries WHERE key = ?",
+                                  (key,)).fetchone()
+        if row is None or not os.path.exists(self.body_path(row[0])):
+            return None
+        return dict(zip(['digest', 'headers', 'etag', 'last_modified', 'stored_at'], row))
+
+    # Function to write a response body to the content-addressed store and index it under its key
+    def store(self, key, url, accept, response, stream):
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.folder_name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw_file, gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=3) as f:
+                chunks = response.iter_content(chunk_size=1024 * 1024) if stream else [response.content]
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            digest = digest.hexdigest()
+            stored_bytes = os.path.getsize(temp_path)
+            os.makedirs(os.path.dirname(self.body_path(digest)), exist_ok=True)
+            os.replace(temp_path, self.body_path(digest))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if stream:
+                response.close()
+
+        headers = {header: response.headers[header] for header in cached_headers if header in response.headers}
+        now = time.time()
+        entry = {'digest': digest, 'headers': json.dumps(headers), 'etag': headers.get('ETag'),
+                 'last_modified': headers.get('Last-Modified'), 'stored_at': now}
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO bodies VALUES (?, ?, ?)", (digest, size, stored_bytes))
+            self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (key, url, accept, digest, entry['headers'], entry['etag'], entry['last_modified'], now, now))
+            self.stores += 1
+            self.evict()
+        return entry
+
+    # Function to build a requests.Response from a cached body, read lazily from disk when streamed
+    def cached_response(self, key, entry, url, stream, counter):
+        path = self.body_path(entry['digest'])
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(entry['headers']))
+        response.encoding = get_encoding_from_headers(response.headers)
+        if stream:
+            response.raw = gzip.open(path, 'rb')
+        else:
+            with gzip.open(path, 'rb') as f:
+                response._content = f.read()
+            response._content_consumed = True
+
+        now = time.time()
+        with self.lock, self.db:
+            if counter == 'revalidated':
+                self.db.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+            else:
+                self.db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            if counter is not None:
+                setattr(self, counter, getattr(self, counter) + 1)
+                size = self.db.execute("SELECT size FROM bodies WHERE digest = ?", (entry['digest'],)).fetchone()
+                self.bytes_saved += size[0] if size else 0
+        return response
+
+    # Drop the least recently used entries, and the bodies no entry refers to, until the bodies fit
+    # in max_bytes (called with the lock held)
+    def evict(self):
+        while True:
+            total = self.db.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM bodies").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            oldest = self.db.execute("SELECT key FROM entries ORDER BY last_access LIMIT 1").fetchone()
+            if oldest is None:
+                return
+            self.db.execute("DELETE FROM entries WHERE key = ?", oldest)
+            self.evictions += 1
+            orphans = self.db.execute("SELECT digest FROM bodies WHERE digest NOT IN (SELECT digest FROM entries)").fetchall()
+            for (digest,) in orphans:
+                self.db.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+                if os.path.exists(self.body_path(digest)):
+                    os.remove(self.body_path(digest))
+
+    def clear(self):
+        with self.lock, self.db:
+            for (digest,) in self.db.execute("SELECT digest FROM bodies").fetchall():
+                if os.path.exists(self.body_path(digest)):
+                    os.remove(self.body_path(digest))
+            self.db.execute("DELETE FROM entries")
+            self.db.execute("DELETE FROM bodies")
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size, stored_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0), COALESCE(SUM(stored_bytes), 0) FROM bodies").fetchone()
+            lookups = self.hits + self.revalidated + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "stored_bytes": stored_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.revalidated) / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
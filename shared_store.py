@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from dataset_index import IndexedDataset
+from dataset_metadata import json_value, source_stamp
+from instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+# Prefix of the columns holding the precomputed row order of each dimension
+order_prefix = "__order__"
+
+# Function to get the path of the store file of a dataset file; the name carries a digest of the
+# dataset file's modification time and size, so a changed dataset gets a new store file and a file
+# that workers have mapped is never overwritten
+def store_path(file_path, store_folder):
+    stamp = source_stamp(file_path)
+    digest = hashlib.sha256(json.dumps(stamp, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(store_folder, f"{os.path.splitext(stamp['file'])[0]}.{digest}.arrow")
+
+# Lock held while a store file is written, so that workers opening the same dataset at the same
+# time convert it once (no locking where fcntl is unavailable: each writer then uses its own
+# temporary file and the last rename wins)
+@contextmanager
+def store_lock(path):
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Function to write an indexed dataset to an uncompressed Arrow IPC file: the value codes of every
+# dimension (their categories go in the schema metadata), Year, Value and the row order of every
+# dimension, each as one contiguous buffer that can be mapped without copying
+def write_store_file(dataset, path):
+    import pyarrow as pa
+
+    columns = {}
+    categories = {}
+    for dim_id in dataset.dimension_ids:
+        columns[dim_id] = pa.array(dataset.indexes[dim_id][0])
+        categories[dim_id] = [json_value(value) for value in dataset.df[dim_id].cat.categories]
+    columns['Year'] = pa.array(dataset.df['Year'].to_numpy())
+    # NaN values are kept as NaN rather than turned into nulls, so that the column maps as floats
+    columns['Value'] = pa.array(dataset.df['Value'].to_numpy(dtype=np.float64), from_pandas=False)
+    for dim_id in dataset.dimension_ids:
+        columns[order_prefix + dim_id] = pa.array(dataset.indexes[dim_id][1])
+
+    table = pa.table(columns).replace_schema_metadata({"categories": json.dumps(categories)})
+    temp_path = f"{path}.{os.getpid()}.partial"
+    with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp_path, path)
+
+# Function to map a store file read-only and wrap its buffers in an IndexedDataset without copying
+# the codes, years, values or row orders; the pages are shared by every process mapping the file
+def open_store_file(path):
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    categories = json.loads(table.schema.metadata[b'categories'])
+    columns = {}
+    orders = {}
+    for name in table.column_names:
+        column = table.column(name)
+        values = (column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()).to_numpy(zero_copy_only=False)
+        if name.startswith(order_prefix):
+            orders[name[len(order_prefix):]] = values
+        elif name in categories:
+            columns[name] = pd.Categorical.from_codes(values, categories[name])
+        else:
+            columns[name] = values
+    return IndexedDataset(pd.DataFrame(columns, copy=False), orders=orders)
+
+# Function to delete the store files of older versions of a dataset (files still mapped by a worker
+# cannot be deleted on Windows and are left for a later call)
+def remove_stale_files(path):
+    folder, name = os.path.split(path)
+    stem = name.rsplit('.', 2)[0]
+    pattern = re.compile(re.escape(stem) + r'\.[0-9a-f]{16}\.arrow$')
+    for f in os.listdir(folder):
+        if f != name and pattern.match(f):
+            try:
+                os.remove(os.path.join(folder, f))
+            except OSError:
+                pass
+
+# Function to open a dataset through the shared store: the first process to need it parses the
+# dataset file with load() and writes the store file, and every process then maps that file
+def open_shared_dataset(file_path, store_folder, load):
+    path = store_path(file_path, store_folder)
+    if not os.path.exists(path):
+        os.makedirs(store_folder, exist_ok=True)
+        with store_lock(path):
+            if not os.path.exists(path):
+                logger.info("Writing %s to the shared store %s", file_path, path)
+                write_store_file(IndexedDataset(load(file_path)), path)
+                remove_stale_files(path)
+    return open_store_file(path)
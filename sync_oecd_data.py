@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+from fetch_oecd_data import data_url, decode_payload, remove_zero_series
+from dataset_metadata import merge_codelists, read_codelists
+from dataset_store import concat_datasets, read_dataset, write_dataset
+from instrumentation import get_logger
+from oecd_http import create_session, get_with_backoff, HostRateLimiter
+
+logger = get_logger(__name__)
+
+# Name of the manifest that records the state of every mirrored dataflow
+manifest_name = "sync_manifest.json"
+
+# Function to read the sync manifest of a datasets folder ({} when there is none yet)
+def load_manifest(folder_name):
+    try:
+        with open(os.path.join(folder_name, manifest_name), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Function to write the sync manifest of a datasets folder (atomically)
+def save_manifest(folder_name, manifest):
+    os.makedirs(folder_name, exist_ok=True)
+    manifest_path = os.path.join(folder_name, manifest_name)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+# Function to merge revised observations into a stored tidy long dataset: observations with the
+# same dimensions and Year are replaced, new ones are appended
+def merge_delta(stored_df, delta_df):
+    key_columns = [col for col in stored_df.columns if col != 'Value']
+    merged = concat_datasets([stored_df, delta_df[stored_df.columns]])
+    merged = merged.drop_duplicates(subset=key_columns, keep='last')
+    return remove_zero_series(merged)
+
+# Function to format a sync time for the SDMX updatedAfter parameter (rounded down to the second,
+# so that observations revised while the previous sync ran are fetched again)
+def format_sync_time(timestamp):
+    return datetime.fromtimestamp(int(timestamp), tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# Function to bring one dataflow of the mirror up to date: a full download when it is new or its
+# version changed, otherwise a conditional request for the observations updated since the last sync;
+# returns the action taken and the new manifest entry. A dataflow without data (404 NoResultsFound on
+# a full download) is recorded as skipped, like the harvest does, and is unchanged while it stays empty
+def sync_dataflow(dataflow, entry, folder_name, session=None, rate_limiter=None, base_url=None, csv_export=False):
+    api_url = f"{base_url or data_url}/{dataflow['agency_identifier']},{dataflow['dataflow_identifier']}/all"
+    headers = {
+        "Accept": "application/vnd.sdmx.data+json; charset=utf-8; version=1.0"
+    }
+    params = None
+    incremental = (entry is not None and entry.get("version") == dataflow['dataflow_version']
+                   and entry.get("file") and os.path.exists(os.path.join(folder_name, entry["file"])))
+    if incremental:
+        params = {"updatedAfter": entry["last_sync"]}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    sync_time = format_sync_time(time.time())
+    # The sync tracks freshness itself, so its requests bypass the response cache
+    response = get_with_backoff(api_url, headers=headers, session=session, rate_limiter=rate_limiter, params=params,
+                                cache=False)
+
+    new_entry = dict(entry or {}, version=dataflow['dataflow_version'], last_sync=sync_time)
+    for field, header in [("etag", "ETag"), ("last_modified", "Last-Modified")]:
+        if response.headers.get(header):
+            new_entry[field] = response.headers[header]
+
+    # Nothing changed since the last sync (the API answers 404 NoResultsFound to an empty delta)
+    no_results = response.status_code == 404 and "NoResultsFound" in response.text
+    if incremental and (response.status_code == 304 or no_results):
+        return "unchanged", new_entry
+    if no_results:
+        skipped = entry is not None and entry.get("status") == "skipped" and entry.get("version") == dataflow['dataflow_version']
+        new_entry.pop("file", None)
+        new_entry["status"] = "skipped"
+        return "unchanged" if skipped else "skipped", new_entry
+    if response.status_code != 200:
+        raise RuntimeError(f"Error {response.status_code}: {response.text[:200]}")
+
+    decoded = decode_payload(response.json(), long_format=True, drop_zero_series=not incremental)
+    if decoded[0] is None:
+        raise RuntimeError("Unexpected JSON structure in the response")
+    df, dimensions, df_name = decoded
+
+    if incremental:
+        file_path = os.path.join(folder_name, entry["file"])
+        # A delta only lists the values it holds; the codelists of the stored dataset are kept
+        codelists = merge_codelists(read_codelists(file_path), df.attrs.get('codelists'))
+        df = merge_delta(read_dataset(file_path), df)
+        df.attrs['codelists'] = codelists
+        df_name = os.path.splitext(entry["file"])[0]
+        action = "updated"
+    else:
+        action = "downloaded"
+    file_path = write_dataset(df, df_name, folder_name, csv_export=csv_export, sdmx_version=dataflow['dataflow_version'])
+    new_entry.pop("status", None)
+    new_entry["file"] = os.path.basename(file_path)
+    return action, new_entry
+
+# Function to refresh the local mirror of many dataflows, skipping the ones that did not change,
+# and record the state of each in the manifest
+def sync_dataflows(dataflows, folder_name, max_workers=8, requests_per_second=None, base_url=None, session=None,
+                   csv_export=False):
+    session = session or create_session(pool_size=max_workers)
+    rate_limiter = HostRateLimiter(requests_per_second)
+    manifest = load_manifest(folder_name)
+    stats = {"dataflows": len(dataflows), "downloaded": 0, "updated": 0, "unchanged": 0, "skipped": 0, "failed": 0,
+             "requests": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    # Count the requests and payload bytes that go through the shared session
+    def count_bytes(response, *args, **kwargs):
+        with lock:
+            stats["requests"] += 1
+            stats["bytes"] += len(response.content)
+
+    session.hooks["response"].append(count_bytes)
+    start_time = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(sync_dataflow, dataflow,
+                                manifest.get(f"{dataflow['agency_identifier']},{dataflow['dataflow_identifier']}"),
+                                folder_name, session, rate_limiter, base_url, csv_export): dataflow
+                for dataflow in dataflows
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Syncing", unit="dataflows"):
+                dataflow = futures[future]
+                try:
+                    action, entry = future.result()
+                    stats[action] += 1
+                    manifest[f"{dataflow['agency_identifier']},{dataflow['dataflow_identifier']}"] = entry
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error("Error syncing %s,%s: %s", dataflow['agency_identifier'], dataflow['dataflow_identifier'], e)
+    finally:
+        session.hooks["response"].remove(count_bytes)
+        save_manifest(folder_name, manifest)
+
+    stats["seconds"] = time.perf_counter() - start_time
+    logger.info("Synced %s dataflows in %.1fs with %s requests (%.2f MB); downloaded %s, updated %s, unchanged %s, "
+                "skipped %s, failed %s", stats['dataflows'], stats['seconds'], stats['requests'], stats['bytes'] / 1e6,
+                stats['downloaded'], stats['updated'], stats['unchanged'], stats['skipped'], stats['failed'])
+    return stats
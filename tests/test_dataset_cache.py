@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from dataset_cache import DatasetCache
+from dataset_index import IndexedDataset
+from dataset_rollup import RollupCube
+
+# Function to build an indexed dataset with its rollup cube over four dimensions of 20 values
+def make_dataset(n_rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {f"DIM_{d}": pd.Categorical.from_codes(rng.integers(0, 20, n_rows), [f"Value {j}" for j in range(20)])
+               for d in range(4)}
+    columns['Year'] = rng.integers(1990, 2020, n_rows)
+    columns['Value'] = rng.random(n_rows)
+    dataset = IndexedDataset(pd.DataFrame(columns))
+    dataset.rollups = RollupCube(dataset)
+    return dataset
+
+def test_cache_counts_subset_cubes_built_after_loading(tmp_path):
+    file_path = tmp_path / "dataset.parquet"
+    file_path.write_bytes(b"")
+    cache = DatasetCache()
+    dataset = cache.get(str(file_path), lambda path: make_dataset())
+    dataset.rollups.on_resize = lambda: cache.resize(str(file_path))
+    loaded_bytes = cache.stats()["bytes"]
+
+    dataset.rollups.aggregate('sum', {'DIM_0': ["Value 1"], 'DIM_1': ["Value 2"]}, None, 'DIM_2')
+    assert cache.stats()["bytes"] == dataset.nbytes > loaded_bytes
+
+def test_growing_entries_are_evicted_beyond_the_budget(tmp_path):
+    cache = DatasetCache()
+    datasets = []
+    for name in ["first", "second"]:
+        file_path = tmp_path / f"{name}.parquet"
+        file_path.write_bytes(b"")
+        dataset = cache.get(str(file_path), lambda path: make_dataset())
+        dataset.rollups.on_resize = lambda file_path=file_path: cache.resize(str(file_path))
+        datasets.append(dataset)
+    # Room for both datasets as loaded, but not once the second one builds larger cubes
+    cache.max_bytes = cache.stats()["bytes"] + 1000
+    datasets[1].rollups.aggregate('sum', {'DIM_0': ["Value 1"], 'DIM_1': ["Value 2"]}, None, 'DIM_2')
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["evictions"] == 1
+    assert stats["bytes"] == datasets[1].nbytes
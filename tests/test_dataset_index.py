@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+from dataset_index import IndexedDataset
+
+def test_categorical_columns_are_not_copied():
+    df = pd.DataFrame({
+        'REF_AREA': pd.Categorical(["A", "B", "C"] * 10),
+        'MEASURE': ["X", "Y"] * 15,
+        'Year': np.arange(30),
+        'Value': np.arange(30, dtype=np.float64),
+    })
+    dataset = IndexedDataset(df)
+    # Categorical columns, as mapped from the shared store, keep their memory; others are cast
+    assert np.shares_memory(dataset.df['REF_AREA'].array.codes, df['REF_AREA'].array.codes)
+    assert np.shares_memory(dataset.indexes['REF_AREA'][0], df['REF_AREA'].array.codes)
+    assert isinstance(dataset.df['MEASURE'].dtype, pd.CategoricalDtype)
+    assert dataset.select({'MEASURE': ["Y"]})['Value'].tolist() == list(range(1, 30, 2))
@@ -0,0 +1,34 @@
+import json
+import os
+from dataset_metadata import codelist_ids, load_metadata, metadata_path
+from dataset_store import read_dataset, write_dataset
+from fetch_oecd_data import decode_payload
+from mock_oecd_api import make_sdmx_json
+
+# Function to decode a synthetic payload in which two values of DIM_0 share a name
+def decode_shared_names():
+    payload = make_sdmx_json("Codelists", n_dimensions=2, cardinality=3, n_years=5)
+    values = payload['data']['structure']['dimensions']['series'][0]['values']
+    values[2]['name'] = values[1]['name']
+    return decode_payload(payload, long_format=True)[0]
+
+def test_sidecar_keeps_the_codelists(tmp_path):
+    file_path = write_dataset(decode_shared_names(), "codelists", str(tmp_path))
+    with open(metadata_path(file_path), encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    dimension = metadata['dimensions'][0]
+    assert dimension['codelist'] == [{"id": "C0_0", "name": "Dimension 0 value 0"},
+                                     {"id": "C0_1", "name": "Dimension 0 value 1"},
+                                     {"id": "C0_2", "name": "Dimension 0 value 1"}]
+    # The values sharing a name are one category, whose SDMX ids can still be found
+    assert dimension['values'] == ["Dimension 0 value 0", "Dimension 0 value 1"]
+    assert codelist_ids(metadata, 'DIM_0', ["Dimension 0 value 1"]) == ["C0_1", "C0_2"]
+
+def test_rebuilt_sidecar_keeps_the_codelists(tmp_path):
+    file_path = write_dataset(decode_shared_names(), "codelists", str(tmp_path))
+    # Make the sidecar stale, as a rewritten dataset file would
+    os.utime(file_path, ns=(0, 0))
+    metadata = load_metadata(file_path, read_dataset)
+    assert metadata['source']['mtime_ns'] == 0
+    assert codelist_ids(metadata, 'DIM_1', ["Dimension 1 value 2"]) == ["C1_2"]
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import dataset_store
+from dataset_scan import ScannedDataset
+from dataset_store import ParquetSink, read_dataset
+
+# Function to build a tidy long batch whose REF_AREA categorical has n_categories values
+def make_batch(n_categories):
+    categories = [f"Area {j}" for j in range(n_categories)]
+    return pd.DataFrame({
+        'REF_AREA': pd.Categorical(categories, categories=categories),
+        'Year': 2000,
+        'Value': range(n_categories),
+    }).astype({'Value': float})
+
+def test_parquet_sink_accepts_batches_with_more_categories(tmp_path, monkeypatch):
+    # Every batch is written on its own, so the second one must fit the schema of the first
+    monkeypatch.setattr(dataset_store, 'parquet_sort_rows', 1)
+    file_path = str(tmp_path / "dataset.parquet")
+    sink = ParquetSink(file_path)
+    sink.write(make_batch(10))
+    sink.write(make_batch(300))
+    sink.close()
+
+    df = read_dataset(file_path)
+    assert len(df) == 310
+    assert sorted(df['REF_AREA'].astype(str)) == sorted([f"Area {j}" for j in range(10)] + [f"Area {j}" for j in range(300)])
+
+def test_streamed_parquet_row_groups_can_be_pruned(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, 'parquet_row_group_rows', 1000)
+    monkeypatch.setattr(dataset_store, 'parquet_sort_rows', 16000)
+    rng = np.random.default_rng(0)
+    areas = [f"Area {j:02d}" for j in range(40)]
+    file_path = str(tmp_path / "dataset.parquet")
+    sink = ParquetSink(file_path)
+    # Batches in arrival order, each holding rows of every area
+    for _ in range(32):
+        sink.write(pd.DataFrame({
+            'REF_AREA': pd.Categorical.from_codes(rng.integers(0, len(areas), 1000), areas),
+            'Year': rng.integers(1960, 2024, 1000),
+            'Value': rng.random(1000),
+        }))
+    sink.close()
+
+    dataset = ScannedDataset(file_path)
+    assert len(dataset.row_groups) == 32
+    kept = dataset.prune({'REF_AREA': ["Area 07"]}, None)
+    assert len(kept) <= 4
+    assert len(dataset.select({'REF_AREA': ["Area 07"]})) == (read_dataset(file_path)['REF_AREA'] == "Area 07").sum()
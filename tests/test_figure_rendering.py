@@ -0,0 +1,61 @@
+import time
+import numpy as np
+import pandas as pd
+from figure_rendering import build_figure, lttb_indices
+
+# Function to build a tidy long frame of n_rows random-walk values over 64 years in n_groups color groups
+def make_frame(n_rows, n_groups=5, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'DIM_0': pd.Categorical.from_codes(rng.integers(0, n_groups, n_rows), [f"Group {j}" for j in range(n_groups)]),
+        'Year': rng.integers(1960, 2024, n_rows),
+        'Value': np.cumsum(rng.normal(size=n_rows)),
+    })
+
+# Function to count the points a figure sends to the browser
+def figure_points(fig):
+    return sum(len(trace.x) for trace in fig.data if trace.x is not None)
+
+def test_reduced_figures_stay_within_the_point_budget():
+    df = make_frame(50000)
+    for chart_type in ['line', 'scatter', 'bar']:
+        fig = build_figure(df, chart_type, 'DIM_0', None, "Test", None, budget=2000)
+        assert figure_points(fig) <= 2000
+
+def test_reduction_shrinks_the_serialized_payload():
+    df = make_frame(50000)
+    for chart_type in ['line', 'scatter', 'bar']:
+        full = build_figure(df, chart_type, 'DIM_0', None, "Test", None, budget=0).to_json()
+        reduced = build_figure(df, chart_type, 'DIM_0', None, "Test", None, budget=2000).to_json()
+        assert len(reduced) < len(full) / 5
+
+# Function to time the best of a few builds and serializations of a figure
+def render_seconds(df, chart_type, budget, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        build_figure(df, chart_type, 'DIM_0', None, "Test", None, budget=budget).to_json()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+def test_reduction_adds_little_latency_to_a_line_chart():
+    df = make_frame(100000)
+    render_seconds(df, 'line', 0, repeat=1)
+    # With the default budget of 20,000 points, LTTB solves its buckets together rather than in a loop
+    assert render_seconds(df, 'line', 20000) < 1.5 * render_seconds(df, 'line', 0)
+
+def test_lttb_keeps_the_first_and_last_points():
+    rng = np.random.default_rng(1)
+    x = np.sort(rng.random(10000))
+    y = rng.normal(size=10000)
+    for n_out in [3, 100, 9999]:
+        indices = lttb_indices(x, y, n_out)
+        assert len(indices) == n_out
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert np.all(np.diff(indices) > 0)
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb_indices(x, y, 50)
@@ -0,0 +1,30 @@
+import os
+import pytest
+from fetch_oecd_agencies import get_dataflows
+from dataset_store import CsvSink
+from harvest_oecd_data import harvest_dataflows, load_checkpoint
+from mock_oecd_api import mock_agency, start_mock_server
+
+@pytest.fixture
+def server():
+    server = start_mock_server(n_dataflows=2)
+    # DF_MOCK_1 answers with a payload that cannot be decoded
+    server.get_payload_dict("DF_MOCK_1")
+    server.payloads["DF_MOCK_1"] = b'{"data": {"structure": {}, "dataSets": []}}'
+    yield server
+    server.shutdown()
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_undecodable_payloads_fail_and_missing_data_is_skipped(server, tmp_path, stream):
+    dataflows = get_dataflows(url=f"{server.api_root}/dataflow/ALL")
+    dataflows.append(dict(dataflows[0], dataflow_identifier="DF_EMPTY"))
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    make_sink = (lambda name, dataflow: CsvSink(os.path.join(tmp_path, name + ".csv"))) if stream else None
+    stats = harvest_dataflows(dataflows, lambda *args, **kwargs: None, max_workers=2, base_url=f"{server.api_root}/data",
+                              make_sink=make_sink, checkpoint_path=checkpoint_path)
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    assert list(checkpoint["completed"]) == [f"{mock_agency},DF_MOCK_0"]
+    assert list(checkpoint["failed"]) == [f"{mock_agency},DF_MOCK_1"]
+    assert list(checkpoint["skipped"]) == [f"{mock_agency},DF_EMPTY"]
+    assert (stats["saved"], stats["empty"], stats["failed"]) == (1, 1, 1)
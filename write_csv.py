@@ -1,41 +1,83 @@
-
-import pandas as pd
+import argparse
 import os
-from tqdm import tqdm
-from fetch_oecd_data import get_oecd_data
+from functools import partial
 from fetch_oecd_agencies import get_oecd_agencies
+from harvest_oecd_data import checkpoint_name, harvest_dataflows
+from sync_oecd_data import sync_dataflows
+from dataset_store import DatasetSink, remove_partial_files, write_dataset
+from oecd_http import enable_response_cache
+from instrumentation import configure_logging, get_logger
+
+logger = get_logger(__name__)
 
-#try:
-for dataflow in get_oecd_agencies():
-    oecd_data = get_oecd_data(dataflow['agency_identifier'], dataflow['dataflow_identifier'])
-    df = oecd_data[0]
-    df_name = oecd_data[2]
-    #df = get_oecd_data(dataflow['agency_identifier'], dataflow['dataflow_identifier'])[0]
+# Define the folder name you want to save the datasets in
+folder_name = "01 - Datasets"
 
-    # Define the folder name you want to save the CSV in
-    folder_name = "01 - Datasets"
+# Function to save a fetched dataset as Parquet (plus the optional legacy CSV) inside the datasets folder,
+# together with the metadata sidecar the dashboard builds its controls from
+def save_dataset(df, df_name, dataflow=None, csv_export=False):
+    if df is not None:
+        write_dataset(df, df_name, folder_name, csv_export=csv_export,
+                      sdmx_version=dataflow['dataflow_version'] if dataflow else None)
 
-    # Check if the folder exists; if not, create it
-    if not os.path.exists(folder_name):
-        os.makedirs(folder_name)
+# Function to create the sink a streamed dataset is written into
+def make_dataset_sink(df_name, dataflow=None, csv_export=False):
+    return DatasetSink(df_name, folder_name, csv_export=csv_export,
+                       sdmx_version=dataflow['dataflow_version'] if dataflow else None)
 
-    # Define the path for the CSV file inside the folder
-    file_path = os.path.join(folder_name, df_name+ '.csv')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Download every OECD dataflow into the datasets folder.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of dataflows fetched concurrently")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second to the API host")
+    parser.add_argument("--api-root", default=None, help="Alternative SDMX API root, e.g. a local mock server")
+    parser.add_argument("--stream", action="store_true", help="Parse responses incrementally with bounded memory")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Series per batch written in streaming mode")
+    parser.add_argument("--csv", action="store_true", help="Also export each dataset as a CSV in the legacy layout")
+    parser.add_argument("--format", choices=["json", "csv"], default="json",
+                        help="Format the data is requested in (SDMX-JSON or the faster SDMX-CSV)")
+    parser.add_argument("--partition-by", choices=["time", "dimension"], default=None,
+                        help="Fetch each dataflow as parallel requests split by time window or by leading dimension value")
+    parser.add_argument("--partitions", type=int, default=8, help="Number of partitions per dataflow")
+    parser.add_argument("--sync", action="store_true",
+                        help="Refresh the existing datasets incrementally, fetching only what changed since the last sync")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint of a previous harvest and fetch every dataflow again")
+    parser.add_argument("--retries", type=int, default=1, help="Extra attempts for dataflows that fail during the harvest")
+    parser.add_argument("--cache-dir", default=None, help="Keep API responses in an on-disk cache in this folder")
+    parser.add_argument("--cache-ttl", type=float, default=24, help="Hours a cached response is used without revalidation")
+    parser.add_argument("--cache-max-mb", type=int, default=2048, help="Disk budget of the response cache (in MB)")
+    args = parser.parse_args()
+    # Streaming reads each dataflow as one SDMX-JSON response
+    if args.stream and (args.format != 'json' or args.partition_by):
+        parser.error("--stream cannot be combined with --format csv or --partition-by")
+    configure_logging()
 
-    if df is not None:
-        # Drop the last column using iloc (select all rows and all columns except the last one)
-        #df_without_last_column = df.iloc[:, :-1]
-
-        # Create the CSV file using tqdm to show the progress bar
-        with open(file_path, 'w', encoding='utf-8', newline='') as f:
-            # Write the header first
-            df.head(0).to_csv(f, index=False)
-        
-            # Write the data rows with a progress bar
-            for i in tqdm(range(0, len(df)), desc="Saving CSV", unit="rows"):
-                df.iloc[[i]].to_csv(f, index=False, header=False)
-    
-        print(f"Data saved successfully to {file_path}")
-
-#except:
-#    print(f"Error in data retrieval")
\ No newline at end of file
+    cache = None
+    if args.cache_dir:
+        cache = enable_response_cache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024, ttl=args.cache_ttl * 3600)
+
+    dataflow_url = f"{args.api_root}/dataflow/ALL" if args.api_root else None
+    data_url = f"{args.api_root}/data" if args.api_root else None
+
+    # Partial files are what an interrupted run was writing; the checkpoint lets the harvest resume
+    remove_partial_files(folder_name)
+    checkpoint_path = os.path.join(folder_name, checkpoint_name)
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    if args.sync:
+        sync_dataflows(get_oecd_agencies(url=dataflow_url) or [], folder_name,
+                       max_workers=args.workers, requests_per_second=args.rate, base_url=data_url, csv_export=args.csv)
+    else:
+        harvest_dataflows(get_oecd_agencies(url=dataflow_url) or [],
+                          partial(save_dataset, csv_export=args.csv),
+                          max_workers=args.workers, requests_per_second=args.rate, base_url=data_url,
+                          make_sink=partial(make_dataset_sink, csv_export=args.csv) if args.stream else None,
+                          batch_size=args.batch_size, partition_by=args.partition_by, n_partitions=args.partitions,
+                          data_format=args.format, checkpoint_path=checkpoint_path, retries=args.retries)
+
+    if cache is not None:
+        cache_stats = cache.stats()
+        logger.info("Response cache: hit ratio %.0f%% (%s hits, %s revalidated, %s misses), %.1f MB saved, %.1f MB on disk",
+                    cache_stats['hit_ratio'] * 100, cache_stats['hits'], cache_stats['revalidated'], cache_stats['misses'],
+                    cache_stats['bytes_saved'] / 1e6, cache_stats['stored_bytes'] / 1e6)
@@ -0,0 +1,12 @@
+import os
+from instrumentation import configure_logging
+from plot_dashboard_oecd_data import create_app, data_folder
+
+# Entry point of the production serving mode, for a multi-process WSGI server, e.g.
+#   gunicorn --workers 4 --bind 0.0.0.0:8050 wsgi:server
+# Every worker maps the datasets from the shared store (OECD_DASHBOARD_SHARED_STORE, by default the
+# .shared_store folder of the data folder; set it to an empty string to disable it), so resident
+# memory does not grow with the number of workers. /metrics reports the worker that answers it.
+configure_logging()
+app = create_app(shared_store=os.environ.get('OECD_DASHBOARD_SHARED_STORE', os.path.join(data_folder, '.shared_store')))
+server = app.server